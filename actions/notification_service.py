@@ -0,0 +1,337 @@
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from loguru import logger
+from twilio.base.exceptions import TwilioRestException
+from actions.sms_service import SmsNotConfigured, deliver_sms, get_booking_message, get_sms_sender
+from core.store_resolver import get_store_by_id, DEFAULT_STORE
+from database.call_logs import log_call_event
+from utils.twilio_utils import get_callback_url
+from utils.logger import set_call_context
+from utils.cluster import per_worker_path
+from utils.concurrency import run_blocking
+
+# Paths
+BASE_DIR = Path(__file__).resolve().parents[1]
+SPOOL_DIR = BASE_DIR / "data" / "spool"
+# Each api.workers worker replays only its own spool
+SPOOL_FILE = per_worker_path(SPOOL_DIR / "outbound_sms.jsonl")
+
+# Tuning (overridable via environment)
+WORKER_COUNT = int(os.getenv("OUTBOUND_SMS_WORKERS", "4"))
+# Twilio long codes accept about one message per second per sender number
+SENDER_MESSAGES_PER_SECOND = float(os.getenv("OUTBOUND_SMS_PER_SENDER_MPS", "1"))
+MAX_ATTEMPTS = int(os.getenv("OUTBOUND_SMS_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOUND_SMS_BACKOFF_BASE", "2"))
+BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOUND_SMS_BACKOFF_MAX", "60"))
+DEDUP_WINDOW_SECONDS = int(os.getenv("OUTBOUND_SMS_DEDUP_WINDOW", str(24 * 3600)))
+FEED_SIZE = 1000
+
+FINAL_STATUSES = ("sent", "delivered", "undelivered", "failed", "duplicate")
+
+# Caller data kept out of get_status
+PRIVATE_JOB_FIELDS = ("to", "body")
+
+
+def _is_retryable(error: Exception) -> bool:
+    """
+    Throttling, Twilio-side errors and network problems are retried;
+    other 4xx responses (bad number, opted out) never succeed on retry.
+    """
+    if isinstance(error, SmsNotConfigured):
+        return False
+    if isinstance(error, TwilioRestException):
+        return error.status == 429 or error.status >= 500
+    return True
+
+
+class OutboundSmsQueue:
+    """
+    Asynchronous outbound SMS pipeline.
+
+    Jobs are appended to a JSONL spool before they are acknowledged, so a
+    restart replays anything not yet delivered. Workers pace each sender
+    number to SENDER_MESSAGES_PER_SECOND, retry transient failures with
+    exponential backoff and jitter, and drop repeat requests for the same
+    (CallSid, recipient). Every state change is recorded in a bounded
+    delivery-status feed, which Twilio's message status callbacks extend.
+    """
+
+    def __init__(
+        self,
+        spool_file: Path = SPOOL_FILE,
+        workers: int = WORKER_COUNT,
+        sender_rate: float = SENDER_MESSAGES_PER_SECOND,
+        max_attempts: int = MAX_ATTEMPTS,
+    ):
+        self.spool_file = Path(spool_file)
+        self.worker_count = workers
+        self.sender_interval = 1.0 / sender_rate if sender_rate > 0 else 0.0
+        self.max_attempts = max_attempts
+
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.feed: deque = deque(maxlen=FEED_SIZE)
+        # (call_sid, to) -> (job id, created_at), oldest first so expiry pops from the front
+        self._dedup: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # Requests still being spooled, so a repeat arriving meanwhile waits for the same job
+        self._enqueuing: Dict[tuple, asyncio.Future] = {}
+        self._by_message_sid: Dict[str, str] = {}
+        self._next_send_at: Dict[str, float] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._timers = set()
+
+    # Spool
+
+    def _spool(self, record: Dict[str, Any]):
+        self.spool_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spool_file, "a") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def _replay_spool(self) -> List[Dict[str, Any]]:
+        """
+        Rebuilds pending jobs and the dedup index, then compacts the spool to
+        just the jobs that still need sending.
+        """
+        if not self.spool_file.exists():
+            return []
+
+        pending: Dict[str, Dict[str, Any]] = {}
+        with open(self.spool_file, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn tail from a crash
+                if record["op"] == "enqueue":
+                    job = record["job"]
+                    pending[job["id"]] = job
+                    self._remember((job["call_sid"], job["to"]), job["id"], job["created_at"])
+                elif record["op"] == "done":
+                    pending.pop(record["id"], None)
+
+        tmp = self.spool_file.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            for job in pending.values():
+                f.write(json.dumps({"op": "enqueue", "job": job}, separators=(",", ":")) + "\n")
+        os.replace(tmp, self.spool_file)
+        return list(pending.values())
+
+    # Lifecycle
+
+    async def start(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        for job in self._replay_spool():
+            job["status"] = "queued"
+            self.jobs[job["id"]] = job
+            self._queue.put_nowait(job["id"])
+        if self.jobs:
+            logger.info(f"Replayed {len(self.jobs)} spooled SMS jobs")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def stop(self):
+        for task in list(self._timers) + self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._timers, return_exceptions=True)
+        self._workers = []
+        self._timers = set()
+        self._queue = None
+
+    # Producer side
+
+    def _remember(self, key: tuple, job_id: str, created_at: float):
+        self._dedup[key] = (job_id, created_at)
+        self._dedup.move_to_end(key)
+
+    def _prune_dedup(self, now: float):
+        cutoff = now - DEDUP_WINDOW_SECONDS
+        while self._dedup:
+            oldest = next(iter(self._dedup.values()))
+            if oldest[1] >= cutoff:
+                break
+            self._dedup.popitem(last=False)
+
+    async def enqueue(self, call_sid: str, to_number: str, body: str, store: Dict[str, Any]) -> str:
+        """
+        Spools and queues an SMS. Returns the job id; a repeat request for the
+        same call and recipient returns the original job's id instead.
+        """
+        await self.start()
+        now = time.time()
+        key = (call_sid, to_number)
+        existing = self._dedup.get(key)
+        if existing and now - existing[1] < DEDUP_WINDOW_SECONDS:
+            self._record(existing[0], "duplicate", detail="suppressed repeat request")
+            return existing[0]
+        pending = self._enqueuing.get(key)
+        if pending is not None:
+            job_id = await asyncio.shield(pending)
+            self._record(job_id, "duplicate", detail="suppressed repeat request")
+            return job_id
+        self._prune_dedup(now)
+        # Reserved before the spool write below yields to the loop
+        pending = self._enqueuing[key] = asyncio.get_running_loop().create_future()
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "call_sid": call_sid,
+            "to": to_number,
+            "body": body,
+            "store_id": store.get("store_id", "default"),
+            "attempts": 0,
+            "created_at": now,
+        }
+        # The job must be on disk before it is acknowledged; the append runs off the loop
+        try:
+            await run_blocking(self._spool, {"op": "enqueue", "job": job})
+        except BaseException as e:
+            # Nothing was queued; repeats waiting on this request fail with it
+            if isinstance(e, Exception):
+                pending.set_exception(e)
+                pending.exception()
+            else:
+                pending.cancel()
+            raise
+        finally:
+            self._enqueuing.pop(key, None)
+        self._remember(key, job["id"], now)
+        pending.set_result(job["id"])
+        self.jobs[job["id"]] = dict(job, status="queued")
+        self._record(job["id"], "queued")
+        self._queue.put_nowait(job["id"])
+        return job["id"]
+
+    # Worker side
+
+    async def _wait_for_sender(self, sender: str):
+        """
+        Reserves the next send slot for a sender number and sleeps until it.
+        """
+        now = time.monotonic()
+        slot = max(now, self._next_send_at.get(sender, 0.0))
+        self._next_send_at[sender] = slot + self.sender_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._process(self.jobs[job_id])
+            except Exception as e:
+                logger.error(f"SMS job {job_id} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job: Dict[str, Any]):
+        set_call_context(job["call_sid"], job["store_id"])
+        store = get_store_by_id(job["store_id"]) or DEFAULT_STORE
+        sender = get_sms_sender(store) or "unknown"
+        await self._wait_for_sender(sender)
+
+        job["attempts"] += 1
+        try:
+            message_sid = await deliver_sms(job["to"], job["body"], store, get_callback_url("/webhooks/status/sms"))
+        except Exception as e:
+            if _is_retryable(e) and job["attempts"] < self.max_attempts:
+                delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (job["attempts"] - 1))
+                delay *= random.uniform(0.5, 1.0)
+                self._record(job["id"], "retrying", detail=f"{e} (attempt {job['attempts']}, retry in {delay:.1f}s)")
+                self._schedule_retry(job["id"], delay)
+            else:
+                await self._finish(job, "failed", detail=str(e))
+            return
+
+        job["message_sid"] = message_sid
+        self._by_message_sid[message_sid] = job["id"]
+        await self._finish(job, "sent")
+
+    def _schedule_retry(self, job_id: str, delay: float):
+        async def requeue():
+            await asyncio.sleep(delay)
+            self._queue.put_nowait(job_id)
+
+        task = asyncio.create_task(requeue())
+        self._timers.add(task)
+        task.add_done_callback(self._timers.discard)
+
+    async def _finish(self, job: Dict[str, Any], status: str, detail: Optional[str] = None):
+        await run_blocking(self._spool, {"op": "done", "id": job["id"], "status": status})
+        self._record(job["id"], status, detail=detail)
+        log_call_event({
+            "call_sid": job["call_sid"],
+            "store_id": job["store_id"],
+            "intent": "sms_consent",
+            "response_type": "sms_sent" if status == "sent" else "sms_failed",
+            "sms_sent": status == "sent"
+        })
+        if status == "sent":
+            logger.success(f"SMS job {job['id']} sent for {job['store_id']}: {job.get('message_sid')}")
+        else:
+            logger.error(f"SMS job {job['id']} failed for {job['store_id']}: {detail}")
+
+    # Delivery-status feed
+
+    def _record(self, job_id: str, status: str, detail: Optional[str] = None):
+        job = self.jobs.get(job_id)
+        if job is not None and status != "duplicate":
+            job["status"] = status
+        self.feed.append({"job_id": job_id, "status": status, "detail": detail, "at": time.time()})
+        while len(self.jobs) > FEED_SIZE:
+            oldest_id, oldest = next(iter(self.jobs.items()))
+            if oldest["status"] not in FINAL_STATUSES:
+                break
+            self.jobs.popitem(last=False)
+            self._by_message_sid.pop(oldest.get("message_sid"), None)
+
+    def update_message_status(self, message_sid: str, status: str):
+        """
+        Applies a Twilio message status callback (sent/delivered/undelivered/failed).
+        """
+        job_id = self._by_message_sid.get(message_sid)
+        if job_id:
+            self._record(job_id, status)
+            if status in ("delivered", "undelivered", "failed"):
+                # Twilio sends nothing after a final delivery status
+                self._by_message_sid.pop(message_sid, None)
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        A job's delivery state, without the recipient's number or the message
+        text (the admin endpoints serving it are not authenticated).
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        return {key: value for key, value in job.items() if key not in PRIVATE_JOB_FIELDS}
+
+    def get_feed(self, limit: int = 100) -> List[Dict[str, Any]]:
+        return list(self.feed)[-limit:]
+
+    def pending_count(self) -> int:
+        return sum(1 for job in self.jobs.values() if job["status"] in ("queued", "retrying"))
+
+
+_queue: Optional[OutboundSmsQueue] = None
+
+
+def get_outbound_queue() -> OutboundSmsQueue:
+    global _queue
+    if _queue is None:
+        _queue = OutboundSmsQueue()
+    return _queue
+
+
+async def enqueue_booking_sms(call_sid: str, to_number: str, booking_url: str, store: Dict[str, Any]) -> str:
+    """
+    Queues the booking-link SMS without waiting on Twilio.
+    """
+    return await get_outbound_queue().enqueue(call_sid, to_number, get_booking_message(booking_url), store)
@@ -1,27 +1,42 @@
-from typing import Dict, Any
-from utils.twilio_utils import get_twilio_client, get_twilio_credentials
-from loguru import logger
+from typing import Dict, Any, Optional
+from utils.twilio_utils import get_async_twilio_client, get_twilio_credentials, account_slot
+from utils.metrics import timed
 
-def send_booking_sms(to_number: str, booking_url: str, store: Dict[str, Any]):
+
+class SmsNotConfigured(Exception):
+    """Raised when a store has no usable Twilio credentials or sender number."""
+
+
+def get_booking_message(booking_url: str) -> str:
+    return f"You can book your appointment here: {booking_url}"
+
+
+def get_sms_sender(store: Dict[str, Any]) -> Optional[str]:
     """
-    Sends a booking link to the customer via store-specific Twilio SMS.
+    The store's Twilio sender number, used to key per-number rate limits.
     """
-    client = get_twilio_client(store)
-    creds = get_twilio_credentials(store)
-    from_number = creds.get("from_number")
+    return get_twilio_credentials(store).get("from_number")
 
-    if not client or not from_number:
-        logger.error(f"Cannot send SMS: Twilio credentials missing for {store.get('name')}")
-        return
 
-    message_body = f"You can book your appointment here: {booking_url}"
+@timed("deliver_sms")
+async def deliver_sms(to_number: str, body: str, store: Dict[str, Any], status_callback: Optional[str] = None) -> str:
+    """
+    Sends one SMS via the store's Twilio account and returns the message SID.
+    Raises on failure so callers can decide whether to retry.
+    """
+    client = get_async_twilio_client(store)
+    from_number = get_sms_sender(store)
 
-    try:
-        message = client.messages.create(
-            body=message_body,
+    if not client or not from_number:
+        raise SmsNotConfigured(f"Twilio credentials missing for {store.get('name')}")
+
+    options = {"status_callback": status_callback} if status_callback else {}
+    async with account_slot(store):
+        message = await client.messages.create_async(
+            body=body,
             from_=from_number,
-            to=to_number
+            to=to_number,
+            **options
         )
-        logger.success(f"SMS Sent successfully for {store.get('name')}: {message.sid}")
-    except Exception as e:
-        logger.error(f"Failed to send SMS for {store.get('name')}: {e}")
+    return message.sid
+
@@ -1,61 +1,418 @@
+import asyncio
+import threading
 import time
-from typing import Dict, Any
-from utils.twilio_utils import get_twilio_client, get_twilio_credentials
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from utils.twilio_utils import get_async_twilio_client, get_twilio_credentials, get_callback_url, account_slot
+from business_logic.transfer_routing import get_transfer_plan, DEFAULT_RING_TIMEOUT
+from core import prompt_manager
+from core.twiml_renderer import render
+from core.orchestrator import set_pending_offer, OFFER_BOOKING_SMS
+from core.staff_availability import get_staff_availability
+from database.call_logs import log_call_event
 from loguru import logger
+from utils.logger import set_call_context
+from utils.metrics import timed, record_stage
 
-def initiate_warm_transfer(customer_call_sid: str, store_phone_number: str, briefing_text: str, store: Dict[str, Any]):
+# Staff must answer within this many seconds (stores can override it in transfer_routing)
+STAFF_RING_TIMEOUT = DEFAULT_RING_TIMEOUT
+
+# Extra grace before the watchdog checks a leg whose callback never arrived
+CALLBACK_GRACE_SECONDS = 5
+
+ANSWERED_STATUSES = ("in-progress", "completed")
+FAILED_STATUSES = ("failed", "busy", "no-answer", "canceled")
+
+# Transfers waiting for a staff outcome, keyed by the customer call SID,
+# and the customer call SID of every staff leg they have ringing
+_pending_transfers: Dict[str, Dict[str, Any]] = {}
+_legs: Dict[str, str] = {}
+_pending_lock = threading.Lock()
+
+# Staff legs of recently decided transfers, so their late callbacks (cancelled
+# legs, the winner hanging up) are told apart from legs this process never placed
+_resolved_legs: "OrderedDict[str, str]" = OrderedDict()
+RESOLVED_LEGS_KEPT = 10000
+
+# Strong references so watchdog and stage tasks are not garbage collected mid-sleep
+_watch_tasks = set()
+
+
+def _spawn(coro):
+    task = asyncio.get_running_loop().create_task(coro)
+    _watch_tasks.add(task)
+    task.add_done_callback(_watch_tasks.discard)
+
+
+@timed("initiate_warm_transfer")
+async def initiate_warm_transfer(customer_call_sid: str, store_phone_number: str, briefing_text: str, store: Dict[str, Any],
+                                 target_store: Optional[Dict[str, Any]] = None) -> Optional[str]:
     """
-    Executes a warm transfer using store-specific Twilio credentials:
+    Starts a warm transfer using store-specific Twilio credentials:
     1. Puts customer on hold (Twilio hold music).
-    2. Dials store_phone_number.
-    3. Plays briefing_text to staff when they answer.
+    2. Rings staff following the store's transfer routing (see
+       get_transfer_plan): one line at a time, all at once, or overflowing
+       to a sister store's lines. With target_store (a sister store picked
+       because this store's staff are unavailable) only its lines ring.
+    3. Plays briefing_text to whoever answers first and cancels the other legs.
     4. Bridges customer and staff together in a conference.
+
+    Returns the first staff call SID as soon as the first legs are queued.
+    The outcome arrives later through the transfer status callbacks
+    (see resolve_transfer); nothing here waits for staff to pick up.
+    Returns None if the transfer could not be started. A call that already
+    has a transfer ringing gets that transfer's staff call SID back rather
+    than a second set of legs.
     """
     try:
-        client = get_twilio_client(store)
+        client = get_async_twilio_client(store)
         creds = get_twilio_credentials(store)
         from_number = creds.get("from_number")
 
         if not client or not from_number:
             logger.error(f"Cannot initiate transfer: Twilio credentials missing for {store.get('name')}")
-            return False
+            return None
 
         conference_name = f"conf_{customer_call_sid}"
-        
-        # 1. Update customer call to join conference with hold music
-        logger.info(f"Moving customer {customer_call_sid} to conference {conference_name} via {store.get('name')} account")
-        client.calls(customer_call_sid).update(
-            twiml=f'<Response><Dial><Conference waitUrl="http://twimlets.com/holdmusic?Bucket=com.twilio.music.classical">{conference_name}</Conference></Dial></Response>'
-        )
-        
-        # 2. Call the store staff
-        logger.info(f"Calling store {store.get('name')} staff at {store_phone_number} with briefing: {briefing_text}")
-        staff_call = client.calls.create(
-            to=store_phone_number,
-            from_=from_number,
-            timeout=20,  # Staff must answer within 20 seconds
-            twiml=f'<Response><Say voice="alice">{briefing_text}</Say><Dial><Conference>{conference_name}</Conference></Dial></Response>'
-        )
-        
-        # 3. Simple polling to detect if the call was answered or failed immediately
-        start_time = time.time()
-        while time.time() - start_time < 22:
-            try:
-                updated_call = client.calls(staff_call.sid).fetch()
-                if updated_call.status in ['in-progress', 'completed']:
-                    logger.success(f"Staff call for {store.get('name')} answered.")
-                    return True
-                if updated_call.status in ['failed', 'busy', 'no-answer', 'canceled']:
-                    logger.warning(f"Staff call for {store.get('name')} failed with status: {updated_call.status}")
-                    return False
-            except Exception as poll_err:
-                logger.error(f"Polling error for {store.get('name')}: {poll_err}")
-            
-            time.sleep(1)
-            
-        logger.warning(f"Staff call for {store.get('name')} timed out or remained in queued/ringing state.")
-        return False
-        
+        plan = get_transfer_plan(store, store_phone_number, target_store)
+        transfer = {
+            "customer_call_sid": customer_call_sid,
+            "store": store,
+            "started_at": time.time(),
+            "conference": conference_name,
+            "briefing": briefing_text,
+            "from_number": from_number,
+            "policy": plan["policy"],
+            "ring_timeout": plan["ring_timeout"],
+            "stages": plan["stages"],
+            "next_stage": 0,
+            "legs": {},
+            # Set once the first legs are placed (or could not be)
+            "placed": asyncio.Event(),
+        }
+
+        # Checked and registered without yielding, so concurrent requests for the call can't both dial
+        with _pending_lock:
+            existing = _pending_transfers.get(customer_call_sid)
+            if existing is None:
+                _pending_transfers[customer_call_sid] = transfer
+        if existing is not None:
+            logger.info(f"Transfer already ringing for {customer_call_sid}; not dialing staff again")
+            await existing["placed"].wait()
+            return next(iter(existing["legs"]), None)
+
+        staff_call_sids = []
+        try:
+            # 1. Update customer call to join conference with hold music
+            logger.info(f"Moving customer {customer_call_sid} to conference {conference_name} via {store.get('name')} account")
+            async with account_slot(store):
+                await client.calls(customer_call_sid).update_async(
+                    twiml=render("transfer_hold", conference=conference_name,
+                                 callback=get_callback_url("/webhooks/status/conference") or "/webhooks/status/conference"
+                                 ).decode("utf-8")
+                )
+
+            # 2. Ring staff; Twilio reports each leg's outcome to the status callback
+            if get_callback_url("/webhooks/status/transfer") is None:
+                logger.warning("PUBLIC_BASE_URL not set; transfer outcome will only be checked by the watchdog.")
+            staff_call_sids = await _ring_next_stage(transfer)
+        finally:
+            if not staff_call_sids:
+                with _pending_lock:
+                    transfer["outcome"] = "failed"
+                    if _pending_transfers.get(customer_call_sid) is transfer:
+                        del _pending_transfers[customer_call_sid]
+            transfer["placed"].set()
+        return staff_call_sids[0] if staff_call_sids else None
+
     except Exception as e:
         logger.error(f"Transfer Error for {store.get('name')}: {e}")
+        return None
+
+
+async def _ring_next_stage(transfer: Dict[str, Any], stage_index: Optional[int] = None) -> List[str]:
+    """
+    Rings the transfer's next stage (only if it is still stage_index, when
+    given), moving on to the one after if none of its legs could be placed.
+    Returns the staff call SIDs placed; empty once every stage is used up.
+    """
+    while True:
+        with _pending_lock:
+            index = transfer["next_stage"]
+            if "outcome" in transfer or index >= len(transfer["stages"]):
+                return []
+            if stage_index is not None and index != stage_index:
+                return []
+            transfer["next_stage"] = stage_index = index + 1
+        stage = transfer["stages"][index]
+
+        # A timed stage after this one starts on its own unless the transfer is decided first
+        if index + 1 < len(transfer["stages"]):
+            start_after = transfer["stages"][index + 1]["start_after"]
+            if start_after is not None:
+                delay = max(0.0, transfer["started_at"] + start_after - time.time())
+                _spawn(_ring_stage_later(transfer, index + 1, delay))
+
+        results = await asyncio.gather(*(_dial_leg(transfer, target) for target in stage["targets"]))
+        placed = [sid for sid in results if sid]
+        if placed:
+            return placed
+
+
+async def _ring_stage_later(transfer: Dict[str, Any], stage_index: int, delay: float):
+    await asyncio.sleep(delay)
+    if not await _ring_next_stage(transfer, stage_index):
+        with _pending_lock:
+            exhausted = _legs_finished(transfer) and transfer["next_stage"] >= len(transfer["stages"])
+        if exhausted:
+            await _finish_transfer(transfer, None, "failed")
+
+
+async def _dial_leg(transfer: Dict[str, Any], target: Dict[str, Any]) -> Optional[str]:
+    """
+    Places one staff leg into the transfer's conference.
+    """
+    store = transfer["store"]
+    briefing = transfer["briefing"]
+    if target["store_id"] != store.get("store_id", "default"):
+        briefing = prompt_manager.get_overflow_briefing(store.get("location"), briefing)
+
+    logger.info(f"Calling {target['store_id']} staff at {target['number']} for {store.get('name')} "
+                f"({transfer['policy']}) with briefing: {briefing}")
+    callback_url = get_callback_url("/webhooks/status/transfer")
+    call_options = {}
+    if callback_url:
+        call_options = {
+            "status_callback": callback_url,
+            "status_callback_event": ["answered", "completed"],
+            "status_callback_method": "POST",
+        }
+
+    try:
+        client = get_async_twilio_client(store)
+        async with account_slot(store):
+            staff_call = await client.calls.create_async(
+                to=target["number"],
+                from_=transfer["from_number"],
+                timeout=transfer["ring_timeout"],
+                twiml=render("staff_briefing", briefing=briefing, conference=transfer["conference"]).decode("utf-8"),
+                **call_options
+            )
+    except Exception as e:
+        logger.error(f"Could not call {target['number']} for {store.get('name')}: {e}")
+        return None
+
+    with _pending_lock:
+        transfer["legs"][staff_call.sid] = {**target, "status": "queued", "started_at": time.time()}
+        if "outcome" not in transfer:
+            _legs[staff_call.sid] = transfer["customer_call_sid"]
+            placed = True
+        else:
+            placed = False
+    if not placed:
+        # The transfer was decided while this leg was being placed
+        await _hang_up(store, staff_call.sid)
+        return None
+    _spawn(watch_transfer(staff_call.sid, transfer["ring_timeout"] + CALLBACK_GRACE_SECONDS))
+    return staff_call.sid
+
+
+def _legs_finished(transfer: Dict[str, Any]) -> bool:
+    return all(leg["status"] in FAILED_STATUSES for leg in transfer["legs"].values())
+
+
+async def resolve_transfer(staff_call_sid: str, status: str) -> Optional[Dict[str, Any]]:
+    """
+    Applies a staff leg's call status to its pending transfer.
+    The first leg answered wins the transfer and the others are cancelled;
+    a failed leg only fails the transfer once no leg is ringing and no
+    stage is left to ring. Returns the transfer record with its "outcome"
+    set once the transfer is decided ("answered" or "failed"), or None
+    while it is still ringing or if it was already resolved.
+    """
+    if status in ANSWERED_STATUSES:
+        outcome = "answered"
+    elif status in FAILED_STATUSES:
+        outcome = "failed"
+    else:
+        return None
+
+    with _pending_lock:
+        transfer = _pending_transfers.get(_legs.get(staff_call_sid))
+        leg = transfer["legs"].get(staff_call_sid) if transfer else None
+        if leg is None:
+            if staff_call_sid not in _resolved_legs:
+                # Transfers live in the process that started them; under
+                # api.workers the callback may have reached another worker
+                logger.warning(f"Status {status} for unknown staff leg {staff_call_sid}; "
+                               f"its transfer is not pending in this process")
+            return None
+        leg["status"] = status
+        leg["finished_at"] = time.time()
+        ring_next = outcome == "failed" and _legs_finished(transfer)
+        if outcome == "failed" and not ring_next:
+            # Other legs are still ringing
+            return None
+
+    if ring_next and await _ring_next_stage(transfer):
+        return None
+    return await _finish_transfer(transfer, staff_call_sid if outcome == "answered" else None, outcome, status)
+
+
+def _store_outcomes(transfer: Dict[str, Any], winner: Optional[str]) -> Dict[str, tuple]:
+    """
+    One (answered, ring seconds) per store the transfer rang: answered for
+    the winner's store, missed for a store whose every leg failed. A store
+    whose legs were still ringing when another store answered is left out.
+    """
+    now = time.time()
+    by_store: Dict[str, List[tuple]] = {}
+    for sid, leg in transfer["legs"].items():
+        by_store.setdefault(leg["store_id"], []).append((sid, leg))
+
+    outcomes = {}
+    for store_id, legs in by_store.items():
+        if any(sid == winner for sid, _ in legs):
+            leg = transfer["legs"][winner]
+            outcomes[store_id] = (True, leg["finished_at"] - leg["started_at"])
+        elif all(leg["status"] in FAILED_STATUSES for _, leg in legs):
+            outcomes[store_id] = (False, max(leg.get("finished_at", now) - leg["started_at"] for _, leg in legs))
+    return outcomes
+
+
+async def _finish_transfer(transfer: Dict[str, Any], winner: Optional[str], outcome: str,
+                           status: str = "no-answer") -> Optional[Dict[str, Any]]:
+    """
+    Decides the transfer once: cancels every leg but the winner and, if no
+    one answered, re-routes the customer to the booking-link offer.
+    """
+    with _pending_lock:
+        if "outcome" in transfer:
+            return None
+        transfer["outcome"] = outcome
+        transfer["status"] = status
+        _pending_transfers.pop(transfer["customer_call_sid"], None)
+        for sid in transfer["legs"]:
+            _legs.pop(sid, None)
+            _resolved_legs[sid] = transfer["customer_call_sid"]
+        while len(_resolved_legs) > RESOLVED_LEGS_KEPT:
+            _resolved_legs.popitem(last=False)
+        losers = [sid for sid, leg in transfer["legs"].items()
+                  if sid != winner and leg["status"] not in FAILED_STATUSES]
+        outcomes = _store_outcomes(transfer, winner)
+
+    # Staff availability counts transfers per store, not the legs each one rang
+    for store_id, (answered, ring_seconds) in outcomes.items():
+        get_staff_availability().transfer_finished(store_id, answered, ring_seconds)
+
+    store = transfer["store"]
+    set_call_context(transfer["customer_call_sid"], store.get("store_id", "default"))
+    if losers:
+        await asyncio.gather(*(_hang_up(store, sid) for sid in losers))
+    if outcome == "answered":
+        leg = transfer["legs"][winner]
+        transfer["answered_by"] = leg["store_id"]
+        get_staff_availability().transfer_connected(transfer["customer_call_sid"], winner, leg["store_id"])
+        record_stage("transfer_answer", time.time() - transfer["started_at"])
+        logger.success(f"Staff call for {store.get('name')} answered by {leg['store_id']} at {leg['number']} "
+                       f"({len(losers)} other legs cancelled).")
+    else:
+        logger.warning(f"Staff call for {store.get('name')} failed with status: {status}")
+        await reroute_customer_call(transfer["customer_call_sid"], store)
+
+    log_call_event({
+        "call_sid": transfer["customer_call_sid"],
+        "store_id": store.get("store_id", "default"),
+        "intent": "transfer",
+        "response_type": f"warm_transfer_{outcome}",
+        "transfer_attempted": True
+    })
+    return transfer
+
+
+async def _hang_up(store: Dict[str, Any], staff_call_sid: str):
+    """
+    Cancels a staff leg that is still ringing, or ends it if it was just answered.
+    """
+    client = get_async_twilio_client(store)
+    if not client:
+        return
+    for status in ("canceled", "completed"):
+        try:
+            async with account_slot(store):
+                await client.calls(staff_call_sid).update_async(status=status)
+            return
+        except Exception as e:
+            logger.debug(f"Could not set staff leg {staff_call_sid} to {status}: {e}")
+    logger.warning(f"Could not cancel staff leg {staff_call_sid} for {store.get('name')}")
+
+
+async def reroute_customer_call(customer_call_sid: str, store: Dict[str, Any]) -> bool:
+    """
+    Pulls the customer out of the hold conference and offers the booking
+    link instead, listening for their answer on the gather webhook.
+    """
+    client = get_async_twilio_client(store)
+    if not client:
+        return False
+
+    twiml = render("transfer_reroute", action=get_callback_url("/webhooks/gather") or "/webhooks/gather")
+
+    try:
+        async with account_slot(store):
+            await client.calls(customer_call_sid).update_async(twiml=twiml.decode("utf-8"))
+        # The caller's next "yes" accepts the booking link
+        await set_pending_offer(customer_call_sid, OFFER_BOOKING_SMS)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to reroute customer {customer_call_sid} for {store.get('name')}: {e}")
         return False
+
+
+async def check_transfer_status(staff_call_sid: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetches a staff leg once when its callback never arrived.
+    Legs still queued or ringing past the ring timeout count as no-answer.
+    """
+    with _pending_lock:
+        transfer = _pending_transfers.get(_legs.get(staff_call_sid))
+    if transfer is None:
+        return None
+
+    status = "no-answer"
+    client = get_async_twilio_client(transfer["store"])
+    if client:
+        try:
+            async with account_slot(transfer["store"]):
+                fetched = (await client.calls(staff_call_sid).fetch_async()).status
+            if fetched in ANSWERED_STATUSES or fetched in FAILED_STATUSES:
+                status = fetched
+        except Exception as e:
+            logger.error(f"Transfer status check failed for {staff_call_sid}: {e}")
+
+    return await resolve_transfer(staff_call_sid, status)
+
+
+async def watch_transfer(staff_call_sid: str, delay: float = STAFF_RING_TIMEOUT + CALLBACK_GRACE_SECONDS):
+    """
+    Safety net for lost status callbacks: waits without blocking the event
+    loop, then checks the staff leg once if it is still pending.
+    """
+    await asyncio.sleep(delay)
+    with _pending_lock:
+        still_pending = staff_call_sid in _legs
+    if still_pending:
+        await check_transfer_status(staff_call_sid)
+
+
+def schedule_transfer_watch(staff_call_sid: str):
+    """
+    Starts the watchdog for a staff leg on the running event loop.
+    initiate_warm_transfer already does this for every leg it places.
+    """
+    _spawn(watch_transfer(staff_call_sid))
+
+
+def get_pending_transfer_count() -> int:
+    with _pending_lock:
+        return len(_pending_transfers)
@@ -1,15 +1,68 @@
 from fastapi import FastAPI
 from api.webhooks.inbound_call import router as voice_router
 from api.webhooks.gather import router as gather_router
+from api.webhooks.status_updates import router as status_router
+from api.webhooks.relay import router as relay_router
 from api.routes import router as extra_router
+from database.repository import close_event_repository
+from database.analytics_tracker import save_analytics_snapshot
+from utils.twilio_utils import close_twilio_clients
+from utils.logger import setup_logging, shutdown_logging
+from utils.metrics import MetricsMiddleware
+from utils.concurrency import start_blocking_detector, stop_blocking_detector, warm_blocking_pool
+from actions.notification_service import get_outbound_queue
+
+# Queue-backed, CallSid-tagged log sink (LOG_LEVEL / LOG_FORMAT / LOG_SAMPLE_RATE)
+setup_logging()
 
 app = FastAPI(title="AI Voice Agent Backend")
+app.add_middleware(MetricsMiddleware)
 
 # Register Routers
 app.include_router(voice_router, prefix="/webhooks", tags=["webhooks"])
 app.include_router(gather_router, prefix="/webhooks", tags=["webhooks"])
+app.include_router(status_router, prefix="/webhooks", tags=["webhooks"])
+app.include_router(relay_router, prefix="/webhooks", tags=["webhooks"])
 app.include_router(extra_router, tags=["general"])
 
+@app.on_event("startup")
+async def start_loop_watchdog():
+    # ASYNC_DEBUG=true: log any blocking call that holds the event loop past ASYNC_BLOCKING_THRESHOLD_MS
+    start_blocking_detector()
+    await warm_blocking_pool()
+
+@app.on_event("startup")
+async def start_outbound_queue():
+    # Replays any SMS spooled before the last shutdown
+    await get_outbound_queue().start()
+
+@app.on_event("shutdown")
+async def stop_outbound_queue():
+    await get_outbound_queue().stop()
+
+@app.on_event("shutdown")
+def flush_call_events():
+    # Persist any buffered call events before the worker exits
+    close_event_repository()
+
+@app.on_event("shutdown")
+def save_analytics():
+    # Rolling aggregates resume from this snapshot on the next start
+    save_analytics_snapshot()
+
+@app.on_event("shutdown")
+async def close_twilio_transports():
+    await close_twilio_clients()
+
+@app.on_event("shutdown")
+def stop_loop_watchdog():
+    stop_blocking_detector()
+
+@app.on_event("shutdown")
+def flush_logs():
+    # Registered last so the other shutdown handlers' logs are written too
+    shutdown_logging()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
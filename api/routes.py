@@ -1,3 +1,106 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Response
+from core.store_resolver import get_store_registry
+from business_logic.pricing_engine import get_pricing_catalog
+from utils.twilio_utils import get_twilio_pool_metrics
+from actions.notification_service import get_outbound_queue
+from database.analytics_tracker import get_analytics_tracker, WINDOWS
+from utils.metrics import render_prometheus, latency_summary
+from utils.concurrency import run_blocking, get_concurrency_stats
+from core.decision_cache import get_decision_cache
+from core.streaming import get_streaming_stats
+from core.staff_availability import get_staff_availability, AVAILABILITY_ENABLED
+from utils.idempotency import get_webhook_dedup
 
 router = APIRouter()
+
+@router.post("/admin/reload")
+async def reload_config():
+    """
+    Forces a reload of store and pricing configuration without restarting the server.
+    """
+    # Re-reads and re-indexes every config file; keep that off the event loop
+    store_count = await run_blocking(get_store_registry().reload)
+    await run_blocking(get_pricing_catalog().reload)
+    return {"status": "reloaded", "stores": store_count}
+
+@router.get("/admin/twilio/pool")
+async def twilio_pool_metrics():
+    """
+    Twilio client reuse and per-account concurrency utilization.
+    """
+    return get_twilio_pool_metrics()
+
+@router.get("/admin/outbound/sms")
+async def outbound_sms_feed(limit: int = 100):
+    """
+    Recent outbound SMS delivery-status events.
+    """
+    queue = get_outbound_queue()
+    return {"pending": queue.pending_count(), "events": queue.get_feed(limit)}
+
+@router.get("/admin/outbound/sms/{job_id}")
+async def outbound_sms_status(job_id: str):
+    return get_outbound_queue().get_status(job_id) or {"status": "unknown"}
+
+@router.get("/analytics")
+async def analytics(store_id: str = None, window: str = "day"):
+    """
+    Rolling call counts, conversion funnel and transfer success rate.
+    window is one of hour, day or month (last 30 days).
+    """
+    if window not in WINDOWS:
+        raise HTTPException(status_code=400, detail=f"window must be one of: {', '.join(WINDOWS)}")
+    tracker = get_analytics_tracker()
+    return {**tracker.summary(store_id, window), "stores": tracker.stores()}
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Request and per-stage latency histograms in Prometheus text format.
+    """
+    return Response(content=render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@router.get("/admin/metrics/latency")
+async def metrics_latency():
+    """
+    p50/p90/p99 per route and per stage, estimated from the histograms.
+    """
+    return latency_summary()
+
+@router.get("/admin/concurrency")
+async def concurrency_stats():
+    """
+    Blocking-pool usage and, with ASYNC_DEBUG on, event loop stalls seen.
+    """
+    return get_concurrency_stats()
+
+@router.get("/admin/fsm/cache")
+async def fsm_cache_stats():
+    """
+    FSM decision cache size and hit rate (FSM_DECISION_CACHE=false disables it).
+    """
+    cache = get_decision_cache()
+    return {"enabled": False} if cache is None else {"enabled": True, **cache.summary()}
+
+@router.get("/admin/streaming")
+async def streaming_stats():
+    """
+    ConversationRelay connections and how many turns reused a partial transcript's plan.
+    """
+    return get_streaming_stats()
+
+@router.get("/admin/staff")
+async def staff_availability():
+    """
+    Per-store staff availability behind warm-transfer routing: connected
+    transfers, missed transfers in a row, recent answer rate and ring time.
+    """
+    return {"enabled": AVAILABILITY_ENABLED, "stores": get_staff_availability().summary()}
+
+@router.get("/admin/webhooks/idempotency")
+async def webhook_idempotency_stats():
+    """
+    Webhook requests handled, and Twilio retries answered with the original's reply.
+    """
+    dedup = get_webhook_dedup()
+    return {"enabled": False} if dedup is None else {"enabled": True, **dedup.summary()}
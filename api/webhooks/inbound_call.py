@@ -1,7 +1,13 @@
 from fastapi import APIRouter, Response, Request
-from twilio.twiml.voice_response import VoiceResponse
 from core.store_resolver import resolve_store_by_did
-from core import prompt_manager
+from core.orchestrator import start_session
+from core.call_warmup import start_call_warmup
+from core.twiml_renderer import render_greeting, render_relay_greeting
+from core.streaming import streaming_enabled, relay_url
+from loguru import logger
+from utils.idempotency import idempotent_reply
+from utils.logger import set_call_context
+from utils.metrics import stage, label_request
 
 router = APIRouter()
 
@@ -9,31 +15,34 @@ router = APIRouter()
 async def handle_inbound_call(request: Request):
     """
     Handles incoming calls from Twilio, detects store, and greets.
+    A Twilio retry gets the original's greeting without reopening the session.
     """
     # Extract the called number (DID) from Twilio request
-    form_data = await request.form()
+    with stage("parse_form"):
+        form_data = await request.form()
+    content = await idempotent_reply(request, form_data, lambda: _greet(form_data))
+    return Response(content=content, media_type="application/xml")
+
+
+async def _greet(form_data) -> bytes:
     called_number = form_data.get("Called", "")
+    call_sid = form_data.get("CallSid", "")
     
-    # Resolve store
+    # Resolve store and open the call session that later gathers reuse
     store = resolve_store_by_did(called_number)
-    
-    # Dynamic greeting from prompt_manager
-    greeting = prompt_manager.get_greeting(store.get("name"), store.get("location"))
-    
-    response = VoiceResponse()
-    
-    # Gather speech from the caller
-    response.say(
-    greeting,
-    voice="alice",
-    language="en-US"
-    )
+    set_call_context(call_sid, store.get("store_id", "default"))
+    label_request(store_id=store.get("store_id", "default"), response_type="greeting")
+    await start_session(call_sid, store)
 
-    response.gather(
-    input="speech",
-    action="/webhooks/gather",
-    method="POST",
-    speech_timeout="5"
-    )
+    # Hours, pricing view and Twilio client get ready while the greeting plays
+    start_call_warmup(call_sid, store)
+    
+    # Streaming mode: Twilio speaks the greeting and streams the caller's speech to /webhooks/relay
+    if streaming_enabled():
+        url = relay_url()
+        if url:
+            return render_relay_greeting(store, url)
+        logger.warning("VOICE_MODE=relay needs PUBLIC_BASE_URL; answering with <Gather> instead")
 
-    return Response(content=str(response), media_type="application/xml")
+    # Greeting TwiML is rendered once per store location and reused
+    return render_greeting(store)
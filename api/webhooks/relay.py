@@ -0,0 +1,40 @@
+import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from loguru import logger
+from core.relay_renderer import render_text
+from core.streaming import StreamingCall
+
+router = APIRouter()
+
+@router.websocket("/relay")
+async def conversation_relay(websocket: WebSocket):
+    """
+    Twilio ConversationRelay stream: partial transcripts are planned as they
+    arrive and the reply is sent as soon as the final transcript is.
+    """
+    await websocket.accept()
+    call = StreamingCall()
+    try:
+        while True:
+            message = json.loads(await websocket.receive_text())
+            call.record(message)
+            kind = message.get("type")
+
+            if kind == "setup":
+                await call.setup(message)
+            elif kind == "prompt":
+                if call.session is None:
+                    logger.warning("Relay prompt before setup; ignoring")
+                elif message.get("last", True):
+                    reply = await call.on_final(message.get("voicePrompt", ""))
+                    await websocket.send_text(render_text(reply["response_type"], reply["payload"]))
+                else:
+                    call.on_partial(message.get("voicePrompt", ""))
+            elif kind == "interrupt":
+                call.on_interrupt(message)
+            elif kind == "error":
+                logger.warning("ConversationRelay error for {}: {}", call.call_sid, message.get("description"))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await call.close()
@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Request, Response
+from actions.transfer_service import resolve_transfer
+from actions.notification_service import get_outbound_queue
+from core.orchestrator import end_session
+from core.call_warmup import drop_call_context
+from core.staff_availability import get_staff_availability
+from loguru import logger
+from utils.logger import set_call_context
+
+router = APIRouter()
+
+# Customer call statuses after which the call is over
+FINAL_CALL_STATUSES = ("completed", "busy", "failed", "no-answer", "canceled")
+
+@router.post("/status/transfer")
+async def handle_transfer_status(request: Request):
+    """
+    Receives Twilio status callbacks for staff legs of warm transfers.
+    Failed legs re-route the waiting customer to the booking-link offer,
+    and an answered leg hanging up frees its store's line again.
+    """
+    form_data = await request.form()
+    staff_call_sid = form_data.get("CallSid", "")
+    call_status = form_data.get("CallStatus", "")
+
+    logger.info("Transfer status callback: {} -> {}", staff_call_sid, call_status)
+
+    # Re-routing the customer is an async Twilio REST call
+    await resolve_transfer(staff_call_sid, call_status)
+    if call_status == "completed":
+        get_staff_availability().transfer_ended(staff_call_sid)
+
+    return Response(status_code=204)
+
+
+@router.post("/status/call")
+async def handle_call_status(request: Request):
+    """
+    Receives Twilio status callbacks for customer calls and drops the call
+    session once the call has finished.
+    """
+    form_data = await request.form()
+    call_sid = form_data.get("CallSid", "")
+    call_status = form_data.get("CallStatus", "")
+    set_call_context(call_sid)
+
+    if call_status in FINAL_CALL_STATUSES:
+        await end_session(call_sid)
+        drop_call_context(call_sid)
+        get_staff_availability().transfer_ended(call_sid)
+        logger.info(f"Call {call_sid} ended ({call_status}); session closed")
+
+    return Response(status_code=204)
+
+
+@router.post("/status/conference")
+async def handle_conference_status(request: Request):
+    """
+    Receives Twilio status callbacks for warm-transfer conferences
+    (conf_<customer CallSid>); when one ends, its staff line is free again.
+    """
+    form_data = await request.form()
+    friendly_name = form_data.get("FriendlyName", "")
+    if form_data.get("StatusCallbackEvent") == "conference-end" and friendly_name.startswith("conf_"):
+        get_staff_availability().transfer_ended(friendly_name[len("conf_"):])
+        logger.debug(f"Conference {friendly_name} ended")
+    return Response(status_code=204)
+
+
+@router.post("/status/sms")
+async def handle_sms_status(request: Request):
+    """
+    Receives Twilio message status callbacks for queued booking SMS.
+    """
+    form_data = await request.form()
+    get_outbound_queue().update_message_status(form_data.get("MessageSid", ""), form_data.get("MessageStatus", ""))
+    return Response(status_code=204)
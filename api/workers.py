@@ -0,0 +1,179 @@
+"""
+Multi-worker deployment of api.main.
+
+Runs N uvicorn workers on one listening socket. The supervisor is the only
+process that reads stores.json and the pricing files: it validates them and
+publishes a memory-mapped config snapshot (utils.cluster) that every worker
+maps read-only, and republishes it when a source file changes. Workers
+notice the new snapshot by its mtime, like any other watched config file,
+and reload from it.
+
+Each worker gets a stable WORKER_ID (kept across restarts), which gives it
+its own call event segments, SMS spool and analytics snapshot. Worker
+segments are merged into the main event store when the supervisor exits,
+or at any time with `python -m database.repository merge-workers`.
+
+Usage: python -m api.workers [--workers 4] [--host 0.0.0.0] [--port 8000]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from loguru import logger
+from business_logic.pricing_engine import PricingCatalog
+from core.store_resolver import STORES_FILE
+from database.repository import merge_worker_segments
+from utils.cluster import SNAPSHOT_FILE, write_snapshot
+from utils.config_watcher import FileWatcher, DEFAULT_CHECK_INTERVAL
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="warning", help="uvicorn access/error log level")
+    return parser.parse_args()
+
+
+def build_config_sections(catalog: PricingCatalog) -> dict:
+    """
+    Reads the shared read-only config. Raises on a malformed file so a bad
+    edit is never published.
+    """
+    with open(STORES_FILE, "r") as f:
+        stores = json.load(f)
+    return {"stores": stores, "pricing": catalog.read_sources()}
+
+
+class SnapshotPublisher:
+    """
+    Watches the config sources and publishes a new snapshot when they change.
+    """
+
+    def __init__(self, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        self.catalog = PricingCatalog()
+        self.check_interval = check_interval
+        self._watcher = self._new_watcher()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _new_watcher(self) -> FileWatcher:
+        return FileWatcher([STORES_FILE] + self.catalog.source_paths(), check_interval=0)
+
+    def publish(self) -> int:
+        version = write_snapshot(build_config_sections(self.catalog))
+        logger.info(f"Published config snapshot v{version} to {SNAPSHOT_FILE}")
+        return version
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="config-snapshot-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            if not self._watcher.changed():
+                continue
+            try:
+                self.publish()
+            except Exception as e:
+                logger.error(f"Config change not published, workers keep the previous snapshot: {e}")
+            # Override files may have been added or removed
+            self._watcher = self._new_watcher()
+
+
+def _serve(sock: socket.socket, log_level: str):
+    import uvicorn
+
+    config = uvicorn.Config("api.main:app", log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """
+    Starts the workers, restarts any that die (with the same WORKER_ID), and
+    stops them all on SIGINT/SIGTERM.
+    """
+
+    def __init__(self, workers: int, host: str, port: int, log_level: str):
+        self.worker_count = workers
+        self.log_level = log_level
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.set_inheritable(True)
+        self.processes = {}
+        self._context = multiprocessing.get_context("spawn")
+        self._stopping = threading.Event()
+
+    def _start_worker(self, worker_id: int):
+        # Spawned children read their identity from the environment at import time
+        os.environ["WORKER_ID"] = str(worker_id)
+        os.environ["CONFIG_SNAPSHOT"] = "true"
+        os.environ["CONFIG_SNAPSHOT_FILE"] = str(SNAPSHOT_FILE)
+        process = self._context.Process(
+            target=_serve, args=(self.sock, self.log_level), name=f"worker-{worker_id}", daemon=False
+        )
+        process.start()
+        self.processes[worker_id] = process
+        logger.info(f"Started worker {worker_id} (pid {process.pid})")
+
+    def run(self):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: self._stopping.set())
+
+        for worker_id in range(self.worker_count):
+            self._start_worker(worker_id)
+
+        while not self._stopping.wait(0.5):
+            for worker_id, process in list(self.processes.items()):
+                if not process.is_alive():
+                    logger.warning(f"Worker {worker_id} exited with code {process.exitcode}; restarting")
+                    self._start_worker(worker_id)
+
+        # uvicorn shuts down gracefully on SIGTERM, running the app's shutdown hooks
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(timeout=30)
+            if process.is_alive():
+                process.kill()
+        self.sock.close()
+
+
+def main():
+    args = parse_args()
+    if args.workers > 1 and not os.getenv("SESSION_BACKEND_URL"):
+        logger.warning("SESSION_BACKEND_URL is not set: call sessions are per worker, so follow-up turns "
+                       "answered by another worker lose earlier slots and offers")
+    if args.workers > 1:
+        logger.warning("Warm transfers are tracked by the worker that started them: a staff status callback "
+                       "answered by another worker is ignored, so the other legs keep ringing and a failed "
+                       "transfer keeps the caller on hold until the watchdog checks the leg "
+                       "(ring timeout + CALLBACK_GRACE_SECONDS)")
+
+    publisher = SnapshotPublisher()
+    publisher.publish()
+    publisher.start()
+
+    supervisor = Supervisor(args.workers, args.host, args.port, args.log_level)
+    logger.info(f"Serving api.main on {args.host}:{args.port} with {args.workers} workers")
+    try:
+        supervisor.run()
+    finally:
+        publisher.stop()
+        # Every worker has stopped, so their unsealed segments are complete too
+        merged = merge_worker_segments(include_active=True)
+        logger.info(f"Merged {merged} worker events into the main event store")
+
+
+if __name__ == "__main__":
+    main()
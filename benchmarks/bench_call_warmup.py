@@ -0,0 +1,75 @@
+"""
+First /webhooks/gather latency with and without the /voice call warmup.
+
+Each call posts /webhooks/voice, waits for the greeting to "play", then
+posts its first /webhooks/gather. This is measured in two states:
+
+  steady         process-wide indexes already built; the warmup only
+                 saves the store lookup, hours check and pricing setup
+  after reload   pricing is reloaded before every call, which rebuilds
+                 the entity extractor and store schedules. Without the
+                 warmup the first gather pays for that rebuild.
+
+Usage: python -m benchmarks.bench_call_warmup [calls] [greeting_seconds]
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+from loguru import logger
+
+import core.call_warmup
+import utils.idempotency
+from api.main import app
+from business_logic.pricing_engine import get_pricing_catalog
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+GREETING_SECONDS = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+STORE_DID = "+17577994705"
+TRANSCRIPTS = [
+    "How much to fix an iPhone 13 screen?",
+    "What does a battery for an iPad 6 cost",
+    "PS5 HDMI port replacement price",
+]
+
+
+async def run(reload_each_call: bool):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(CALLS):
+            if reload_each_call:
+                get_pricing_catalog().reload()
+            call = {"CallSid": f"CA{i:032d}", "Called": STORE_DID, "From": "+15550000000"}
+            (await client.post("/webhooks/voice", data=call)).raise_for_status()
+            await asyncio.sleep(GREETING_SECONDS)
+
+            start = time.perf_counter()
+            response = await client.post("/webhooks/gather", data=dict(call, SpeechResult=TRANSCRIPTS[i % 3]))
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+            await client.post("/webhooks/status/call", data={"CallSid": call["CallSid"], "CallStatus": "completed"})
+    latencies.sort()
+    return latencies
+
+
+def report(label: str, latencies):
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    mean = sum(latencies) / len(latencies) * 1000
+    print(f"  {label:<24} p50 {p50:6.2f}ms  p99 {p99:6.2f}ms  mean {mean:6.2f}ms")
+
+
+if __name__ == "__main__":
+    logger.remove()
+    # Every run replays the same CallSids; they must be handled, not answered from stored replies
+    utils.idempotency.IDEMPOTENCY_ENABLED = False
+    print(f"{CALLS} calls, {GREETING_SECONDS * 1000:.0f}ms greeting")
+    for reload_each_call in (False, True):
+        for enabled in (False, True):
+            core.call_warmup.WARMUP_ENABLED = enabled
+            asyncio.run(run(reload_each_call))  # warm up the process itself
+            latencies = asyncio.run(run(reload_each_call))
+            state = "after reload" if reload_each_call else "steady"
+            report(f"{state}, warmup {'on' if enabled else 'off'}", latencies)
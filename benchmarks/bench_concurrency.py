@@ -0,0 +1,197 @@
+"""
+How one worker scales with simultaneous calls.
+
+Runs the app as a single uvicorn worker in its own process, against the
+fake Twilio API (with a fixed REST latency) in this one, and at each
+concurrency level starts that many calls at once. Every call greets, asks
+for a technician (a warm transfer: two Twilio REST calls, and a status
+callback when staff answer), asks for a price and hangs up. Because the handlers await Twilio instead of parking a
+thread on it, calls/s should grow with the number of simultaneous calls
+until the worker's CPU, not Twilio latency, is the limit. "efficiency" is
+calls/s relative to perfect scaling of the single-call rate, and "worker
+CPU" is the worker process's CPU time per call (Linux only), which sets
+its ceiling: one core serves about 1000 / (ms per call) calls/s.
+
+The blocking-call detector runs in the worker throughout; every event loop
+stall over the threshold is logged with the loop thread's stack.
+
+The load generator and fake Twilio share the host with the worker; on a
+machine with fewer than three cores they compete with it for CPU and the
+ceiling is theirs as much as the worker's.
+
+Usage: python -m benchmarks.bench_concurrency [--levels 1,50,100,200,400] [--twilio-latency 0.1]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.fake_twilio import FakeTwilio
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+STORES_FILE = BASE_DIR / "data" / "stores" / "stores.json"
+TRANSCRIPTS = ["Can I talk to a technician please", "How much to fix an iPhone 13 screen?"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--levels", default="1,50,100,200,400", help="comma-separated simultaneous call counts")
+    parser.add_argument("--rounds", type=int, default=3, help="bursts per level")
+    parser.add_argument("--twilio-latency", type=float, default=0.1, help="seconds per fake Twilio request")
+    parser.add_argument("--threshold-ms", type=float, default=50, help="event loop stall reporting threshold")
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def cpu_seconds(pid: int):
+    """
+    User plus system CPU time of a process, from /proc.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def serve_worker(port: int, twilio_url: str, stores, threshold_ms: float):
+    """
+    The worker process: one app instance with every store open and Twilio
+    pointed at the fake.
+    """
+    # Must be set before the app modules read them
+    os.environ["TWILIO_API_BASE_URL"] = twilio_url
+    os.environ["PUBLIC_BASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault("TWILIO_MAX_CONCURRENCY_PER_ACCOUNT", "1000")
+    os.environ["EVENT_STORE_DIR"] = tempfile.mkdtemp(prefix="bench_concurrency_")
+    for index, store in enumerate(stores):
+        prefix = store["env_prefix"]
+        os.environ[f"{prefix}_TWILIO_ACCOUNT_SID"] = f"AC{index:032d}"
+        os.environ[f"{prefix}_TWILIO_AUTH_TOKEN"] = "fake-token"
+        os.environ[f"{prefix}_TWILIO_FROM_NUMBER"] = store["sms_number"]
+
+    import uvicorn
+    import business_logic.hours_validator as hours_validator
+    from api.main import app
+    from utils.concurrency import start_blocking_detector, warm_blocking_pool
+    from utils.logger import setup_logging
+
+    setup_logging(level="WARNING")
+    # Every store open, so the technician request becomes a warm transfer
+    hours_validator.StoreSchedule.is_open = lambda schedule, now=None: True
+
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", lifespan="off", backlog=4096, timeout_keep_alive=120,
+    ))
+
+    async def main():
+        start_blocking_detector(threshold_ms, force=True)
+        # lifespan is off, so do what the app's startup would
+        await warm_blocking_pool()
+        await server.serve()
+
+    asyncio.run(main())
+
+
+async def burst(client: httpx.AsyncClient, stores, calls: int, offset: int):
+    gather_latencies = []
+
+    async def one_call(i):
+        store = stores[i % len(stores)]
+        call = {"CallSid": f"CA{offset + i:032d}", "Called": store["did"], "From": f"+1555{i:07d}"}
+        (await client.post("/webhooks/voice", data=call)).raise_for_status()
+        for transcript in TRANSCRIPTS:
+            start = time.perf_counter()
+            (await client.post("/webhooks/gather", data=dict(call, SpeechResult=transcript))).raise_for_status()
+            gather_latencies.append(time.perf_counter() - start)
+        await client.post("/webhooks/status/call", data={"CallSid": call["CallSid"], "CallStatus": "completed"})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_call(i) for i in range(calls)))
+    return time.perf_counter() - start, gather_latencies
+
+
+async def drive(base_url: str, stores, levels, rounds: int, worker_pid: int):
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        await burst(client, stores, 20, 0)  # warm caches and connection pools
+        base_rate = None
+        offset = 1000
+        for level in levels:
+            wall = 0.0
+            latencies = []
+            cpu_before = cpu_seconds(worker_pid)
+            for _ in range(rounds):
+                seconds, samples = await burst(client, stores, level, offset)
+                offset += level
+                wall += seconds
+                latencies += samples
+            cpu_after = cpu_seconds(worker_pid)
+            latencies.sort()
+            rate = level * rounds / wall
+            base_rate = base_rate or rate / level
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[int(len(latencies) * 0.99)] * 1000
+            cpu = ""
+            if cpu_before is not None and cpu_after is not None:
+                cpu = f"  worker CPU {(cpu_after - cpu_before) / (level * rounds) * 1000:5.2f}ms/call"
+            print(f"  {level:>4} simultaneous: {rate:8.1f} calls/s  efficiency {rate / (base_rate * level):5.0%}  "
+                  f"gather p50 {p50:7.1f}ms  p99 {p99:7.1f}ms{cpu}")
+
+
+def wait_until_up(base_url: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("worker did not start")
+
+
+def main():
+    args = parse_args()
+    levels = [int(n) for n in args.levels.split(",")]
+    with open(STORES_FILE, "r") as f:
+        stores = json.load(f)
+
+    # Staff answer after a second; the status callback settles each transfer
+    fake = FakeTwilio(latency=args.twilio_latency, answer_delay=1.0).start()
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    context = multiprocessing.get_context("spawn")
+    worker = context.Process(target=serve_worker, args=(port, fake.base_url, stores, args.threshold_ms))
+    worker.start()
+
+    print(f"Twilio latency {args.twilio_latency * 1000:.0f}ms, {args.rounds} bursts per level, {os.cpu_count()} CPUs")
+    try:
+        wait_until_up(base_url)
+        asyncio.run(drive(base_url, stores, levels, args.rounds, worker.pid))
+        stats = httpx.get(f"{base_url}/admin/concurrency", timeout=10).json()
+    finally:
+        worker.terminate()
+        worker.join(timeout=30)
+        fake.stop()
+
+    detector = stats["blocking_detector"]
+    print(f"  event loop stalls over {detector['threshold_ms']:.0f}ms: {detector['detections']} "
+          f"(longest {detector['max_blocked_ms']}ms); blocking pool {stats['blocking_pool']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+start_fsm latency with and without the decision cache.
+
+Callers ask the same few questions, so the turns here are drawn from a
+small set of transcripts. Each turn is classified first, as /gather does,
+and then passed to start_fsm in two modes:
+
+  cache off      every turn runs rules, entity extraction and pricing
+  cache on       repeated turns reuse the cached decision; the call event
+                 is still logged for every turn
+
+Logging the call event (event store append and analytics) is most of a
+cached turn, so each mode is also timed with it stubbed out to show the
+decision alone. A last run bumps the config version every 200 turns, as a
+pricing or rules reload would, to show the cost of invalidation.
+
+Usage: python -m benchmarks.bench_decision_cache [turns]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Must be set before the event store reads it
+os.environ["EVENT_STORE_DIR"] = tempfile.mkdtemp(prefix="bench_decision_cache_")
+
+from loguru import logger  # noqa: E402
+
+import core.decision_cache  # noqa: E402
+import core.state_machine  # noqa: E402
+from core.intent_classifier import classify_intent  # noqa: E402
+from database.repository import close_event_repository  # noqa: E402
+from utils.config_watcher import bump_config_version  # noqa: E402
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+STORES_FILE = BASE_DIR / "data" / "stores" / "stores.json"
+TURNS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+TRANSCRIPTS = [
+    "How much to fix an iPhone 13 screen?",
+    "What does a battery for an iPad 6 cost",
+    "PS5 HDMI port replacement price",
+    "Can I talk to a technician please",
+    "how much is a galaxy s21 screen",
+    "My laptop won't turn on, how much to repair it",
+    "What are your hours today",
+    "yes",
+]
+
+
+def run(stores, enabled: bool, invalidate_every: int = 0):
+    core.decision_cache.CACHE_ENABLED = enabled
+    core.decision_cache._cache = core.decision_cache.DecisionCache()
+    latencies = []
+    for i in range(TURNS):
+        if invalidate_every and i % invalidate_every == 0:
+            bump_config_version()
+        transcript = TRANSCRIPTS[i % len(TRANSCRIPTS)]
+        store = stores[i % len(stores)]
+        classification = classify_intent(transcript)
+        start = time.perf_counter()
+        core.state_machine.start_fsm(transcript, store, f"CA{i:032d}", classification)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies
+
+
+def report(label: str, latencies, summary=None):
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    mean = sum(latencies) / len(latencies) * 1e6
+    hit_rate = f"  hit rate {summary['hit_rate']:.1%}" if summary else ""
+    print(f"  {label:<28} p50 {p50:7.1f}us  p99 {p99:7.1f}us  mean {mean:7.1f}us{hit_rate}")
+
+
+if __name__ == "__main__":
+    logger.remove()
+    with open(STORES_FILE, "r") as f:
+        stores = json.load(f)
+    print(f"{TURNS} turns, {len(TRANSCRIPTS)} transcripts, {len(stores)} stores")
+    log_call_event = core.state_machine.log_call_event
+    for label, enabled, invalidate_every, log_events in (
+        ("cache off", False, 0, True),
+        ("cache on", True, 0, True),
+        ("decision only, cache off", False, 0, False),
+        ("decision only, cache on", True, 0, False),
+        ("cache on, reload every 200", True, 200, True),
+    ):
+        core.state_machine.log_call_event = log_call_event if log_events else (lambda event: None)
+        run(stores, enabled, invalidate_every)  # warm up the process itself
+        latencies = run(stores, enabled, invalidate_every)
+        report(label, latencies, core.decision_cache._cache.summary() if enabled else None)
+    core.state_machine.log_call_event = log_call_event
+    close_event_repository()
@@ -0,0 +1,94 @@
+"""
+Accuracy and throughput of the entity extractor over a synthetic corpus.
+
+Transcripts are generated from every catalog model in written and spoken
+form ("iPad Air 4" / "i pad air four") inside caller-style sentences. The
+throughput section also builds extractors over growing synthetic catalogs
+to show per-transcript cost does not depend on the number of models.
+
+Usage: python -m benchmarks.bench_entity_extractor
+"""
+import random
+import time
+
+from business_logic.pricing_engine import get_pricing_catalog
+from core.entity_extractor import EntityExtractor, _load_entities
+from utils.text_utils import ORDINALS, TENS, UNITS
+
+TEMPLATES = [
+    "how much to fix the {issue} on my {model}",
+    "hi yeah i've got a {model} and the {issue} is messed up can you help",
+    "{model} {issue} price please",
+    "what do you charge for a {model} {issue} repair",
+]
+ISSUES = {"screen": "screen", "cracked screen": "screen", "battery": "battery", "display": "screen"}
+
+NUMBER_WORDS = {str(v): k for k, v in UNITS.items()}
+NUMBER_WORDS.update({str(v): k for k, v in TENS.items()})
+ORDINAL_WORDS = {v: k for k, v in ORDINALS.items()}
+
+
+def spoken(model: str) -> str:
+    words = []
+    for token in model.replace('"', "").split():
+        lower = token.lower()
+        if lower in ORDINAL_WORDS:
+            words.append(ORDINAL_WORDS[lower])
+        elif "." in token:
+            whole, decimal = token.split(".")
+            words.append(f"{NUMBER_WORDS.get(whole, whole)} point {NUMBER_WORDS.get(decimal, decimal)}")
+        elif token in NUMBER_WORDS:
+            words.append(NUMBER_WORDS[token])
+        elif lower.startswith("ip"):
+            words.append("i " + lower[1:])
+        else:
+            words.append(lower)
+    return " ".join(words)
+
+
+def build_corpus(catalog_models, size=5000, seed=7):
+    rng = random.Random(seed)
+    flat = [(category, name) for category, names in catalog_models.items() for name in names]
+    corpus = []
+    for _ in range(size):
+        category, name = rng.choice(flat)
+        issue_text, issue = rng.choice(list(ISSUES.items()))
+        model_text = spoken(name) if rng.random() < 0.5 else name
+        transcript = rng.choice(TEMPLATES).format(model=model_text, issue=issue_text)
+        corpus.append((transcript, name, issue))
+    return corpus
+
+
+def synthetic_catalog(model_count: int):
+    models = {"phone": [], "tablet": []}
+    for i in range(model_count):
+        models["phone" if i % 2 else "tablet"].append(f"Device{i} Model {i % 97} Pro")
+    return models
+
+
+if __name__ == "__main__":
+    catalog_models = get_pricing_catalog().models()
+    entities = _load_entities()
+    extractor = EntityExtractor(catalog_models, entities)
+    corpus = build_corpus(catalog_models)
+
+    model_hits = issue_hits = 0
+    start = time.perf_counter()
+    for transcript, model, issue in corpus:
+        result = extractor.extract(transcript)
+        model_hits += result["model"] == model
+        issue_hits += result["issue"] == issue
+    elapsed = time.perf_counter() - start
+
+    print(f"Accuracy over {len(corpus):,} synthetic transcripts:")
+    print(f"  model: {model_hits / len(corpus):.1%}   issue: {issue_hits / len(corpus):.1%}")
+    print(f"  throughput: {len(corpus) / elapsed:,.0f} transcripts/s ({elapsed / len(corpus) * 1e6:.1f} us each)")
+
+    print("Per-transcript cost vs catalog size:")
+    for model_count in (10, 100, 1_000, 10_000, 50_000):
+        big = EntityExtractor(synthetic_catalog(model_count), entities)
+        start = time.perf_counter()
+        for transcript, _, _ in corpus:
+            big.extract(transcript)
+        per = (time.perf_counter() - start) / len(corpus) * 1e6
+        print(f"  {model_count:>6,} models: {per:6.1f} us/transcript")
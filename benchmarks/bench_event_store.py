@@ -0,0 +1,72 @@
+"""
+Per-event write cost of the segmented event store vs the legacy
+read-modify-write JSON file.
+
+Usage: python -m benchmarks.bench_event_store [total_events]
+"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from database.models import build_call_event
+from database.repository import CallEventRepository
+
+
+def legacy_log_call_event(logs_file: Path, event: dict):
+    # The original call_logs implementation: load everything, append, rewrite
+    logs = []
+    if logs_file.exists():
+        with open(logs_file, "r") as f:
+            logs = json.load(f)
+    logs.append(event)
+    with open(logs_file, "w") as f:
+        json.dump(logs, f, indent=4)
+
+
+def sample_event(i: int) -> dict:
+    return build_call_event({
+        "call_sid": f"CA{i:032d}",
+        "store_id": "lynnhaven",
+        "intent": "pricing",
+        "response_type": "price_found",
+        "pricing_found": True,
+    })
+
+
+def bench_segmented(total: int, report_every: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = CallEventRepository(Path(tmp) / "events", segment_max_bytes=16 * 1024 * 1024)
+        start = time.perf_counter()
+        window_start = start
+        for i in range(1, total + 1):
+            repository.append(sample_event(i))
+            if i % report_every == 0:
+                repository.flush()
+                now = time.perf_counter()
+                print(f"  segmented  events={i:>9,}  us/event={(now - window_start) / report_every * 1e6:7.2f}")
+                window_start = now
+        repository.close()
+        elapsed = time.perf_counter() - start
+        print(f"  segmented  total={total:,} in {elapsed:.2f}s across {len(repository.segments())} segments")
+
+
+def bench_legacy(total: int, report_every: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        logs_file = Path(tmp) / "call_events.json"
+        window_start = time.perf_counter()
+        for i in range(1, total + 1):
+            legacy_log_call_event(logs_file, sample_event(i))
+            if i % report_every == 0:
+                now = time.perf_counter()
+                print(f"  legacy     events={i:>9,}  us/event={(now - window_start) / report_every * 1e6:7.2f}")
+                window_start = now
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print("Legacy JSON array (first 2,000 events only; cost grows linearly):")
+    bench_legacy(2_000, 500)
+    print(f"Segmented JSONL store ({total:,} events):")
+    bench_segmented(total, max(total // 10, 1))
@@ -0,0 +1,136 @@
+"""
+Fuzzy model matching over a 10k-model synthetic catalog.
+
+Model names are generated from brand/series/number/suffix combinations so
+many entries share most of their characters ("Galaxy S21 Ultra" / "Galaxy
+S22 Ultra"), then each query garbles one word the way speech recognition
+does: a dropped, doubled or swapped letter, a substituted vowel, or a
+brand name split in two. Reports accuracy and per-transcript latency with
+a cold match cache (every fragment searched) and a warm one.
+
+First checks number homophones against the real catalog: "for" or "to"
+after a model word is never taken as the model number outright, only
+offered as a candidate to confirm.
+
+Usage: python -m benchmarks.bench_fuzzy_models [models] [queries]
+"""
+import random
+import sys
+import time
+
+from core.entity_extractor import EntityExtractor, get_entity_extractor
+from core.model_matcher import CLARIFY_THRESHOLD
+
+MODEL_COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+QUERY_COUNT = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+
+BRANDS = ["Galaxy", "Pixel", "Moto", "Xperia", "Redmi", "Nokia", "Oppo", "Vivo", "Honor", "Lumia",
+          "Nexus", "Zenfone", "Blackview", "Realme", "Poco", "Tecno", "Infinix", "Surface", "Kindle", "Yoga"]
+SERIES = ["", "Note", "Edge", "Fold", "Flip", "Play", "Max", "Neo", "Active", "Tab"]
+SUFFIXES = ["", "Pro", "Plus", "Ultra", "Lite", "Mini", "FE", "Prime"]
+# (transcript, model, candidate) from the real catalog
+HOMOPHONE_CHECKS = [
+    ("ipad for my son", None, "iPad 4"),
+    ("ipad to work", None, "iPad 2"),
+    ("how much to replace the battery in my ipad for my daughter", None, "iPad 4"),
+    ("i need my ipad to last longer", None, "iPad 2"),
+    ("ipad air four screen", "iPad Air 4", None),
+    ("eye phone thirteen screen", "iPhone 13", None),
+]
+TEMPLATES = [
+    "how much to fix the screen on my {model}",
+    "hi i have a {model} and the battery is dying",
+    "{model} charging port price please",
+]
+
+
+def synthetic_catalog(model_count: int, seed: int = 3):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < model_count:
+        parts = [rng.choice(BRANDS), rng.choice(SERIES), str(rng.randint(1, 60)), rng.choice(SUFFIXES)]
+        names.add(" ".join(part for part in parts if part))
+    names = sorted(names)
+    return {"phone": names[::2], "tablet": names[1::2]}
+
+
+def garble(word: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(word)) if len(word) > 1 else 0
+    kind = rng.choice(("drop", "double", "swap", "vowel", "split"))
+    if kind == "drop":
+        return word[:i] + word[i + 1:]
+    if kind == "double":
+        return word[:i] + word[i] + word[i:]
+    if kind == "swap" and i < len(word) - 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if kind == "vowel":
+        return word[:i] + rng.choice("aeiou") + word[i + 1:]
+    return word[:i] + " " + word[i:]
+
+
+def build_queries(catalog_models, count: int, seed: int = 11):
+    rng = random.Random(seed)
+    flat = [name for names in catalog_models.values() for name in names]
+    queries = []
+    for _ in range(count):
+        name = rng.choice(flat)
+        words = name.lower().split()
+        # Garble a name word, never the model number
+        targets = [i for i, word in enumerate(words) if not word.isdigit() and len(word) > 3]
+        if targets:
+            i = rng.choice(targets)
+            words[i] = garble(words[i], rng)
+        queries.append((rng.choice(TEMPLATES).format(model=" ".join(words)), name))
+    return queries
+
+
+def run(extractor, queries):
+    latencies = []
+    correct = confident = 0
+    for transcript, name in queries:
+        start = time.perf_counter()
+        result = extractor.extract(transcript)
+        latencies.append(time.perf_counter() - start)
+        matched = result["model"] or (result["model_candidate"] or {}).get("model")
+        correct += matched == name
+        confident += (result["model_confidence"] or 0) >= CLARIFY_THRESHOLD
+    latencies.sort()
+    return {
+        "accuracy": correct / len(queries),
+        "confident": confident / len(queries),
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+    }
+
+
+def check_homophones() -> bool:
+    extractor = get_entity_extractor()
+    ok = True
+    for transcript, model, candidate in HOMOPHONE_CHECKS:
+        result = extractor.extract(transcript)
+        got = (result["model"], (result["model_candidate"] or {}).get("model"))
+        passed = got == (model, candidate)
+        ok &= passed
+        print(f"  {'ok  ' if passed else 'FAIL'} {transcript!r}: model {got[0]}, candidate {got[1]}")
+    return ok
+
+
+if __name__ == "__main__":
+    print("Number homophones")
+    if not check_homophones():
+        sys.exit(1)
+
+    catalog_models = synthetic_catalog(MODEL_COUNT)
+    start = time.perf_counter()
+    extractor = EntityExtractor(catalog_models, {})
+    print(f"{MODEL_COUNT:,} models indexed in {time.perf_counter() - start:.2f}s; "
+          f"{len(extractor.fuzzy_models.postings):,} trigrams")
+
+    queries = build_queries(catalog_models, QUERY_COUNT)
+    for label in ("cold cache", "warm cache"):
+        if label == "cold cache":
+            extractor.fuzzy_models._cache.clear()
+        stats = run(extractor, queries)
+        print(f"  {label:<10} accuracy {stats['accuracy']:.1%} (confident {stats['confident']:.1%})  "
+              f"p50 {stats['p50_ms']:.3f}ms  p99 {stats['p99_ms']:.3f}ms  mean {stats['mean_ms']:.3f}ms")
@@ -0,0 +1,64 @@
+"""
+Per-request cost of transcript analysis: the original repeated substring
+scans (classify_intent, complex keywords in start_fsm, YES_WORDS in
+handle_gather) vs one tokenization feeding the compiled keyword matcher
+and restriction rules.
+
+Usage: python -m benchmarks.bench_intent_classifier [iterations]
+"""
+import sys
+import time
+
+from business_logic.restriction_rules import evaluate_rules, RESTRICT_PRICING, FORCE_TRANSFER
+from core.intent_classifier import classify_intent
+
+TRANSCRIPTS = [
+    "How much to fix an iPhone 13 screen?",
+    "I have water damage on my phone.",
+    "Talk to a technician.",
+    "How much for a MacBook screen repair?",
+    "Yeah sure, please do send the booking link",
+    "I need a specific price for the battery on my iPad Air 4",
+    "Can I book an appointment to come in tomorrow",
+]
+
+
+def legacy_analysis(transcript: str):
+    transcript_lower = transcript.lower()
+    intent = "unknown"
+    if any(word in transcript_lower for word in ["price", "cost", "how much", "screen", "battery", "repair"]):
+        intent = "pricing"
+    if any(word in transcript_lower for word in ["appointment", "book", "schedule", "come in", "visit"]):
+        intent = "booking"
+    if any(word in transcript_lower for word in ["talk to", "representative", "manager", "technician", "person", "human"]):
+        intent = "transfer"
+    is_computer = any(word in transcript_lower for word in ["computer", "laptop", "macbook", "pc", "desktop", "surface pro"])
+    is_complex = any(word in transcript_lower for word in ["water damage", "motherboard", "data recovery"])
+    is_consent = any(word in transcript_lower for word in ["yes", "yeah", "yep", "sure", "okay", "ok", "please do"])
+    return intent, is_computer, is_complex, is_consent
+
+
+def timed(label, fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for transcript in TRANSCRIPTS:
+            fn(transcript)
+    per = (time.perf_counter() - start) / (iterations * len(TRANSCRIPTS)) * 1e6
+    print(f"  {label:<32} {per:6.2f} us/request")
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+    print("Where the two disagree (legacy substring matches in brackets):")
+    for transcript in TRANSCRIPTS:
+        legacy = legacy_analysis(transcript)
+        new = classify_intent(transcript)
+        actions = evaluate_rules(new["tokens"])["actions"]
+        current = (new["intent"], RESTRICT_PRICING in actions, FORCE_TRANSFER in actions, new["is_consent"])
+        if legacy != current:
+            print(f"  {transcript!r}: {current} [{legacy}]")
+
+    print(f"{iterations * len(TRANSCRIPTS):,} transcripts")
+    timed("legacy substring scans", legacy_analysis, iterations)
+    timed("compiled single-pass matcher", lambda t: evaluate_rules(classify_intent(t)["tokens"]), iterations)
@@ -0,0 +1,86 @@
+"""
+/webhooks/gather latency under different logging setups.
+
+  legacy        every FSM step printed and each call event pretty-printed
+                as indented JSON, all written synchronously in the handler
+  sync DEBUG    the new log calls on loguru's default synchronous sink
+  queued INFO   setup_logging() defaults: queue-backed JSON lines, debug off
+  queued WARN   the same with LOG_LEVEL=WARNING
+
+Output goes to a temporary file rather than a terminal so the numbers are
+repeatable; a real console or log pipe makes the synchronous modes slower.
+
+Usage: python -m benchmarks.bench_logging [requests]
+"""
+import asyncio
+import json
+import sys
+import tempfile
+import time
+
+import httpx
+
+import database.call_logs
+import utils.idempotency
+from api.main import app
+from utils.logger import setup_logging, shutdown_logging
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+STORE_DID = "+17577994705"
+TRANSCRIPTS = [
+    "How much to fix an iPhone 13 screen?",
+    "How much for a MacBook screen repair?",
+    "What does a battery for a Galaxy S22 cost",
+]
+
+sampled_log = database.call_logs.log_sampled
+
+
+def legacy_event_print(level, message, event):
+    print(f"DEBUG LOG: {json.dumps(event, indent=2)}")
+
+
+async def run(label: str) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        latencies = []
+        for i in range(REQUESTS):
+            start = time.perf_counter()
+            response = await client.post("/webhooks/gather", data={
+                "SpeechResult": TRANSCRIPTS[i % len(TRANSCRIPTS)],
+                "From": "+15550000000",
+                "Called": STORE_DID,
+                "CallSid": f"CA{i:032d}",
+            })
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"  {label:<14} p50 {p50:6.2f}ms  p99 {p99:6.2f}ms  mean {sum(latencies) / len(latencies) * 1000:6.2f}ms",
+          file=sys.__stdout__)
+
+
+if __name__ == "__main__":
+    print(f"{REQUESTS} gather requests per mode", file=sys.__stdout__)
+    # Every mode replays the same CallSids; they must be handled, not answered from stored replies
+    utils.idempotency.IDEMPOTENCY_ENABLED = False
+    with tempfile.TemporaryFile("w") as out:
+        sys.stdout = out
+
+        database.call_logs.log_sampled = legacy_event_print
+        setup_logging(level="DEBUG", fmt="text", enqueue=False, sink=out)
+        asyncio.run(run("legacy"))
+        database.call_logs.log_sampled = sampled_log
+
+        setup_logging(level="DEBUG", fmt="text", enqueue=False, sink=out)
+        asyncio.run(run("sync DEBUG"))
+
+        setup_logging(level="INFO", fmt="json", enqueue=True, sink=out)
+        asyncio.run(run("queued INFO"))
+
+        setup_logging(level="WARNING", fmt="json", enqueue=True, sink=out)
+        asyncio.run(run("queued WARN"))
+
+        shutdown_logging()
+        sys.stdout = sys.__stdout__
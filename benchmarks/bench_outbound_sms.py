@@ -0,0 +1,81 @@
+"""
+Outbound SMS pipeline check against a local fake Twilio server.
+
+Queues booking SMS for two stores (plus duplicate requests) while the fake
+API fails a share of sends with 503s, then reports per-sender pacing,
+retries, dedup and final delivery status.
+
+Usage: python -m benchmarks.bench_outbound_sms [jobs_per_store] [failure_rate]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.fake_twilio import FakeTwilio
+
+JOBS_PER_STORE = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+FAILURE_RATE = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+SENDER_MPS = 10.0
+
+fake = FakeTwilio(latency=0.02, sms_failure_rate=FAILURE_RATE).start()
+os.environ.update({
+    "TWILIO_API_BASE_URL": fake.base_url,
+    "OUTBOUND_SMS_BACKOFF_BASE": "0.1",
+    "OUTBOUND_SMS_MAX_ATTEMPTS": "8",
+})
+for prefix, number in (("LYNNHAVEN", "+17577994705"), ("GLEN_ALLEN", "+18042075724")):
+    os.environ.update({
+        f"{prefix}_TWILIO_ACCOUNT_SID": "AC" + "0" * 32,
+        f"{prefix}_TWILIO_AUTH_TOKEN": "fake-token",
+        f"{prefix}_TWILIO_FROM_NUMBER": number,
+    })
+
+from loguru import logger  # noqa: E402
+
+import database.call_logs  # noqa: E402
+from actions.notification_service import OutboundSmsQueue  # noqa: E402
+from core.store_resolver import get_store_by_id  # noqa: E402
+
+logger.remove()
+database.call_logs.print = lambda *args, **kwargs: None
+
+
+async def run(spool_file: Path):
+    queue = OutboundSmsQueue(spool_file=spool_file, workers=8, sender_rate=SENDER_MPS)
+    stores = [get_store_by_id("lynnhaven"), get_store_by_id("glen_allen")]
+
+    start = time.perf_counter()
+    job_ids = set()
+    for i in range(JOBS_PER_STORE):
+        for store in stores:
+            call_sid = f"CA{store['store_id']}{i:04d}"
+            job_ids.add(await queue.enqueue(call_sid, f"+1555{i:07d}", "booking link", store))
+            # Twilio webhook retry for the same call: must not send twice
+            job_ids.add(await queue.enqueue(call_sid, f"+1555{i:07d}", "booking link", store))
+
+    while queue.pending_count():
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    await queue.stop()
+
+    statuses = {}
+    for job_id in job_ids:
+        status = queue.get_status(job_id)["status"]
+        statuses[status] = statuses.get(status, 0) + 1
+    retries = sum(1 for event in queue.feed if event["status"] == "retrying")
+    duplicates = sum(1 for event in queue.feed if event["status"] == "duplicate")
+
+    print(f"{len(job_ids)} jobs from {2 * len(job_ids)} requests, fake failure rate {FAILURE_RATE:.0%}")
+    print(f"  final statuses: {statuses}")
+    print(f"  duplicates suppressed: {duplicates}, retries: {retries}")
+    print(f"  messages accepted by fake Twilio: {len(fake.messages)}")
+    print(f"  elapsed: {elapsed:.2f}s (per-sender floor at {SENDER_MPS:.0f} msg/s: {JOBS_PER_STORE / SENDER_MPS:.2f}s)")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp) / "outbound_sms.jsonl"))
+    fake.stop()
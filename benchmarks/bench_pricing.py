@@ -0,0 +1,70 @@
+"""
+Microbenchmark: compiled PricingCatalog vs the original per-call JSON parse.
+
+Usage: python -m benchmarks.bench_pricing [iterations]
+"""
+import json
+import os
+import sys
+import time
+
+from business_logic.pricing_engine import CATEGORY_MAP, ISSUE_MAP, PRICING_DIR, get_prices, get_repair_price
+
+QUERIES = [
+    ("phone", "iPhone 13", "screen"),
+    ("phone", "iphone 14", "battery"),
+    ("tablet", "iPad Air 4", "screen"),
+    ("tablet", "iPad Pro 12.9 3rd Gen", "charging"),
+    ("console", "PS5", "hdmi port"),
+    ("tablet", "iPad 99", "screen"),  # miss
+]
+
+
+def legacy_get_repair_price(device_category: str, model: str, issue: str):
+    # The original implementation: parse the category file on every lookup
+    filename = CATEGORY_MAP.get(device_category.lower())
+    if not filename:
+        return None
+    file_path = PRICING_DIR / filename
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, "r") as f:
+        pricing_data = json.load(f)
+    stored_model = None
+    for key in pricing_data.keys():
+        if key.lower() == model.lower():
+            stored_model = key
+            break
+    if stored_model:
+        model_data = pricing_data[stored_model]
+        issue_lower = issue.lower()
+        for issue_name, price in model_data.items():
+            if issue_name.lower() == issue_lower:
+                return {"price": price, "currency": "USD"}
+        for target in ISSUE_MAP.get(issue_lower, []):
+            if target in model_data:
+                return {"price": model_data[target], "currency": "USD"}
+    return None
+
+
+def timed(label, fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    per_lookup = (time.perf_counter() - start) / (iterations * len(QUERIES)) * 1e6
+    print(f"  {label:<28} {per_lookup:8.2f} us/lookup")
+    return per_lookup
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+
+    # Same answers before timing anything
+    for query in QUERIES:
+        assert legacy_get_repair_price(*query) == get_repair_price(*query), query
+
+    print(f"{iterations * len(QUERIES):,} lookups")
+    legacy = timed("legacy (parse per call)", lambda: [legacy_get_repair_price(*q) for q in QUERIES], iterations)
+    compiled = timed("PricingCatalog.lookup", lambda: [get_repair_price(*q) for q in QUERIES], iterations)
+    timed("get_prices (bulk)", lambda: get_prices(QUERIES), iterations)
+    print(f"  speedup: {legacy / compiled:.0f}x")
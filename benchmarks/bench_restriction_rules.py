@@ -0,0 +1,79 @@
+"""
+Restriction rule evaluation cost as the rule count grows.
+
+Compares the compiled RuleSet (one trie scan per transcript) with checking
+every rule's terms against the transcript in turn, the way the original
+hardcoded keyword lists worked. Synthetic rules use made-up two-word terms,
+half of them scoped to a single store.
+
+Usage: python -m benchmarks.bench_restriction_rules [iterations]
+"""
+import random
+import sys
+import time
+
+from business_logic.restriction_rules import RuleSet, RULE_ACTIONS
+from utils.text_utils import normalize_text
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+RULE_COUNTS = [10, 100, 1000, 5000]
+TRANSCRIPTS = [
+    "How much to fix an iPhone 13 screen?",
+    "I have water damage on my phone and it will not turn on",
+    "Can you do data recovery on a laptop that fell in the pool",
+    "Do you guys replace the charging port on a Galaxy S22 Ultra",
+]
+
+random.seed(7)
+WORDS = [f"w{i}" for i in range(400)]
+
+
+def synthetic_rules(count):
+    rules = [
+        {"id": "water-damage-transfer", "action": "force_transfer", "terms": ["water damage"]},
+        {"id": "data-recovery-transfer", "action": "force_transfer", "terms": ["data recovery"]},
+        {"id": "computer-pricing-restricted", "action": "restrict_pricing", "terms": ["laptop", "computer"]},
+    ]
+    for i in range(count - len(rules)):
+        rule = {
+            "id": f"rule-{i}",
+            "action": random.choice(RULE_ACTIONS),
+            "terms": [f"{random.choice(WORDS)} {random.choice(WORDS)}" for _ in range(3)],
+        }
+        if i % 2:
+            rule["stores"] = ["lynnhaven"]
+        rules.append(rule)
+    return rules
+
+
+def linear_evaluate(rules, transcript, store_id):
+    text = f" {' '.join(normalize_text(transcript))} "
+    matched = []
+    for rule in rules:
+        if rule.get("stores") and store_id not in rule["stores"]:
+            continue
+        if any(f" {term} " in text for term in rule["terms"]):
+            matched.append(rule["id"])
+    return matched
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        for transcript in TRANSCRIPTS:
+            fn(transcript)
+    return (time.perf_counter() - start) / (ITERATIONS * len(TRANSCRIPTS)) * 1e6
+
+
+if __name__ == "__main__":
+    print(f"{'rules':>6}{'per-rule scan':>16}{'compiled':>12}")
+    for count in RULE_COUNTS:
+        rules = synthetic_rules(count)
+        rule_set = RuleSet(rules)
+        for transcript in TRANSCRIPTS:
+            expected = linear_evaluate(rules, transcript, "glen_allen")
+            assert rule_set.evaluate(normalize_text(transcript), "glen_allen")["rule_ids"] == expected
+
+        linear = timed(lambda t: linear_evaluate(rules, t, "glen_allen"))
+        compiled = timed(lambda t: rule_set.evaluate(normalize_text(t), "glen_allen"))
+        print(f"{count:>6}{linear:>14.1f}us{compiled:>10.1f}us")
@@ -0,0 +1,176 @@
+"""
+Warm transfers at peak load, with and without staff availability tracking.
+
+Lynnhaven rings its two staff lines at once (ring timeout 2s) and has Glen
+Allen as its sister store; Glen Allen's line answers 0.3s after it rings.
+WAVES waves of CALLS customers ask for a technician, one wave after the
+other, in two floor situations:
+
+  away        nobody at Lynnhaven picks up
+  busy        Lynnhaven's first line answers the first wave's calls; after
+              that both lines report busy
+  nobody      nobody picks up at either store
+
+Each answered transfer stays connected until the wave is over, when its
+conference ends (posted the way Twilio's conference-end callback is).
+Without tracking every caller is put on hold while Lynnhaven's lines ring;
+with it, once the tracker has seen the lines miss or fill up, callers go
+to Glen Allen or straight to the booking-link offer.
+
+Usage: python -m benchmarks.bench_staff_availability [calls] [waves]
+"""
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+from benchmarks.fake_twilio import FakeTwilio
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+WAVES = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+STORE_DID = "+17577994705"  # Lynnhaven
+STAFF_LINES = ["+17570000001", "+17570000002"]
+SISTER_LINE = "+18040000001"
+SISTER = {SISTER_LINE: {"answer_delay": 0.3, "call_outcome": "in-progress"}}
+BUSY = {line: {"answer_delay": 0.1, "call_outcome": "busy"} for line in STAFF_LINES}
+SITUATIONS = {
+    # Lines per wave: the first wave's, then every later one's
+    "away": ({**{line: {"answer_delay": 99} for line in STAFF_LINES}, **SISTER},) * 2,
+    "busy": ({STAFF_LINES[0]: {"answer_delay": 0.3, "call_outcome": "in-progress"}, **SISTER}, {**BUSY, **SISTER}),
+    "nobody": ({line: {"answer_delay": 99} for line in STAFF_LINES + [SISTER_LINE]},) * 2,
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+fake = FakeTwilio(latency=0.02).start()
+app_port = free_port()
+os.environ.update({
+    "PUBLIC_BASE_URL": f"http://127.0.0.1:{app_port}",
+    "TWILIO_API_BASE_URL": fake.base_url,
+    "LYNNHAVEN_TWILIO_ACCOUNT_SID": "AC" + "0" * 32,
+    "LYNNHAVEN_TWILIO_AUTH_TOKEN": "fake-token",
+    "LYNNHAVEN_TWILIO_FROM_NUMBER": STORE_DID,
+})
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from loguru import logger  # noqa: E402
+
+import core.state_machine  # noqa: E402
+import core.staff_availability as staff_availability  # noqa: E402
+from actions.transfer_service import get_pending_transfer_count  # noqa: E402
+from api.main import app  # noqa: E402
+from core import prompt_manager  # noqa: E402
+from core.store_resolver import get_store_by_id  # noqa: E402
+
+# Transfers only happen during business hours
+core.state_machine.is_business_hours = lambda *args, **kwargs: True
+logger.remove()
+
+get_store_by_id("glen_allen")["transfer_routing"] = {"numbers": [SISTER_LINE]}
+get_store_by_id("lynnhaven")["transfer_routing"] = {
+    "policy": "simultaneous",
+    "numbers": STAFF_LINES,
+    "ring_timeout": 2,
+    "overflow_store": "glen_allen",
+}
+BUSY_OFFER = prompt_manager.get_staff_busy_offer()[:40]
+
+
+async def wave(client: httpx.AsyncClient, offset: int) -> int:
+    async def one_call(i):
+        response = await client.post("/webhooks/gather", data={
+            "SpeechResult": "I want to talk to a technician",
+            "From": f"+1555000{i:04d}",
+            "Called": STORE_DID,
+            "CallSid": f"CA{offset + i:032d}",
+        })
+        response.raise_for_status()
+        return BUSY_OFFER in response.text
+
+    offered = sum(await asyncio.gather(*(one_call(i) for i in range(CALLS))))
+    deadline = time.time() + 30
+    while get_pending_transfer_count() and time.time() < deadline:
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.3)  # let cancellation callbacks land
+    return offered
+
+
+async def end_conferences(client: httpx.AsyncClient, ended: set):
+    for call in list(fake.calls.values()):
+        conference = _conference(call)
+        if call.get("answered") and conference not in ended:
+            ended.add(conference)
+            await client.post("/webhooks/status/conference", data={
+                "FriendlyName": f"conf_{conference}", "StatusCallbackEvent": "conference-end",
+            })
+
+
+def _conference(call):
+    twiml = call.get("twiml") or ""
+    return twiml.split("conf_", 1)[1].split("<", 1)[0] if "conf_" in twiml else None
+
+
+def summarize():
+    transfers = {}
+    for call in list(fake.calls.values()):
+        conference = _conference(call)
+        if conference:
+            transfers.setdefault(conference, []).append(call)
+
+    own_legs, held, answered, sister = 0, [], 0, 0
+    for calls in transfers.values():
+        own_legs += sum(1 for call in calls if call["to"] in STAFF_LINES)
+        start = min(call["created"] for call in calls)
+        winners = [call for call in calls if call["answered"]]
+        if winners:
+            first = min(winners, key=lambda call: call["answered"])
+            answered += 1
+            sister += first["to"] == SISTER_LINE
+            held.append(first["answered"] - start)
+        else:
+            # On hold until the last leg gave up, then offered the booking link
+            held.append(max(call["finished"] or time.time() for call in calls) - start)
+    return len(transfers), own_legs, answered, sister, held
+
+
+async def main():
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", timeout=60) as client:
+        offset = 0
+        print(f"{WAVES} waves of {CALLS} transfer requests, 2 Lynnhaven lines, ring timeout 2s")
+        for situation, (first_lines, later_lines) in SITUATIONS.items():
+            for enabled in (False, True):
+                staff_availability.AVAILABILITY_ENABLED = enabled
+                staff_availability._availability = staff_availability.StaffAvailability()
+                fake.calls.clear()
+                offered, ended = 0, set()
+                for n in range(WAVES):
+                    fake.lines = first_lines if n == 0 else later_lines
+                    offered += await wave(client, offset)
+                    offset += CALLS
+                    await end_conferences(client, ended)
+                count, own_legs, answered, sister, held = summarize()
+                held.sort()
+                hold = f"hold p50 {held[len(held) // 2]:4.2f}s max {held[-1]:4.2f}s" if held else "no holds"
+                print(f"  {situation:<6} tracking {'on ' if enabled else 'off'}  transfers {count:>2}  "
+                      f"answered {answered:>2} ({sister} at Glen Allen)  booking offered up front {offered:>2}  "
+                      f"Lynnhaven legs {own_legs:>2}  {hold}")
+
+
+if __name__ == "__main__":
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=app_port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        asyncio.run(main())
+    finally:
+        server.should_exit = True
+        fake.stop()
@@ -0,0 +1,159 @@
+"""
+Warm-transfer routing policies against a fake Twilio server.
+
+Lynnhaven gets three staff lines and Glen Allen as its sister store, and
+every policy is run against two floor situations (times scaled down, ring
+timeout 2s):
+
+  staffed     line 1 never picks up, line 2 answers after 0.8s, line 3
+              after 1.2s
+  slammed     no Lynnhaven line picks up
+
+Glen Allen's line answers 0.3s after it rings. For each policy and
+situation, CALLS customers ask for a technician at once. Every transfer
+is then followed through the fake's status callbacks until it is decided.
+Time to answer runs from the first staff leg being placed to the winning
+leg answering.
+
+Usage: python -m benchmarks.bench_transfer_routing [calls]
+"""
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+from benchmarks.fake_twilio import FakeTwilio
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+STORE_DID = "+17577994705"  # Lynnhaven
+STAFF_LINES = ["+17570000001", "+17570000002", "+17570000003"]
+SISTER_LINE = "+18040000001"
+SITUATIONS = {
+    "staffed": {
+        STAFF_LINES[0]: {"answer_delay": 99},
+        STAFF_LINES[1]: {"answer_delay": 0.8, "call_outcome": "in-progress"},
+        STAFF_LINES[2]: {"answer_delay": 1.2, "call_outcome": "in-progress"},
+        SISTER_LINE: {"answer_delay": 0.3, "call_outcome": "in-progress"},
+    },
+    "slammed": {
+        **{line: {"answer_delay": 99} for line in STAFF_LINES},
+        SISTER_LINE: {"answer_delay": 0.3, "call_outcome": "in-progress"},
+    },
+}
+POLICIES = ("sequential", "simultaneous", "overflow")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+fake = FakeTwilio(latency=0.02).start()
+app_port = free_port()
+os.environ.update({
+    "PUBLIC_BASE_URL": f"http://127.0.0.1:{app_port}",
+    "TWILIO_API_BASE_URL": fake.base_url,
+    "LYNNHAVEN_TWILIO_ACCOUNT_SID": "AC" + "0" * 32,
+    "LYNNHAVEN_TWILIO_AUTH_TOKEN": "fake-token",
+    "LYNNHAVEN_TWILIO_FROM_NUMBER": STORE_DID,
+})
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from loguru import logger  # noqa: E402
+
+import core.staff_availability  # noqa: E402
+import core.state_machine  # noqa: E402
+from actions.transfer_service import get_pending_transfer_count  # noqa: E402
+from api.main import app  # noqa: E402
+from core.store_resolver import get_store_by_id  # noqa: E402
+
+# Transfers only happen during business hours
+core.state_machine.is_business_hours = lambda *args, **kwargs: True
+# Every run rings the configured lines; bench_staff_availability covers skipping them
+core.staff_availability.AVAILABILITY_ENABLED = False
+logger.remove()
+
+
+def configure(policy: str):
+    # The registry's store records are what every request sees
+    get_store_by_id("glen_allen")["transfer_routing"] = {"numbers": [SISTER_LINE]}
+    get_store_by_id("lynnhaven")["transfer_routing"] = {
+        "policy": policy,
+        "numbers": STAFF_LINES,
+        "ring_timeout": 2,
+        "overflow_store": "glen_allen",
+        "overflow_after": 0.5,
+    }
+
+
+async def run(client: httpx.AsyncClient, offset: int):
+    async def one_call(i):
+        response = await client.post("/webhooks/gather", data={
+            "SpeechResult": "I want to talk to a technician",
+            "From": f"+1555000{i:04d}",
+            "Called": STORE_DID,
+            "CallSid": f"CA{offset + i:032d}",
+        })
+        response.raise_for_status()
+
+    await asyncio.gather(*(one_call(i) for i in range(CALLS)))
+    deadline = time.time() + 30
+    while get_pending_transfer_count() and time.time() < deadline:
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.3)  # let cancellation callbacks land
+
+
+def summarize():
+    transfers = {}
+    for call in list(fake.calls.values()):
+        if call.get("twiml") and "conf_" in call["twiml"]:
+            conference = call["twiml"].split("conf_", 1)[1].split("<", 1)[0]
+            transfers.setdefault(conference, []).append(call)
+
+    answer_times, legs, cancelled, sister = [], 0, 0, 0
+    for calls in transfers.values():
+        legs += len(calls)
+        cancelled += sum(1 for call in calls if call["status"] == "canceled")
+        answered = [call for call in calls if call["answered"]]
+        if answered:
+            first = min(answered, key=lambda call: call["answered"])
+            answer_times.append(first["answered"] - min(call["created"] for call in calls))
+            sister += first["to"] == SISTER_LINE
+    return len(transfers), answer_times, legs, cancelled, sister
+
+
+async def main():
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", timeout=60) as client:
+        offset = 0
+        print(f"{CALLS} simultaneous transfers per run, ring timeout 2s, overflow after 0.5s")
+        for situation, lines in SITUATIONS.items():
+            fake.lines = lines
+            for policy in POLICIES:
+                configure(policy)
+                fake.calls.clear()
+                await run(client, offset)
+                offset += CALLS
+                count, times, legs, cancelled, sister = summarize()
+                times.sort()
+                answered = f"{len(times)}/{count} answered"
+                if times:
+                    answered += (f"  p50 {times[len(times) // 2]:4.2f}s  max {times[-1]:4.2f}s  "
+                                 f"({sister} by the sister store)")
+                print(f"  {situation:<8} {policy:<12} {answered}  legs/transfer {legs / max(count, 1):3.1f}  "
+                      f"cancelled {cancelled}")
+
+
+if __name__ == "__main__":
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=app_port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        asyncio.run(main())
+    finally:
+        server.should_exit = True
+        fake.stop()
@@ -0,0 +1,96 @@
+"""
+Concurrent warm-transfer load test against a local fake Twilio server.
+
+Fires N simultaneous "talk to a technician" gathers at a real uvicorn
+instance. With the old polling loop each request held the event loop for
+the whole staff ring time, so N transfers took roughly N x answer_delay;
+now every request returns as soon as the staff leg is queued and the
+outcomes arrive on /webhooks/status/transfer.
+
+Usage: python -m benchmarks.bench_transfers [concurrency] [answer_delay]
+"""
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+from benchmarks.fake_twilio import FakeTwilio
+
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+ANSWER_DELAY = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+STORE_DID = "+17577994705"  # Lynnhaven
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+fake = FakeTwilio(latency=0.05, answer_delay=ANSWER_DELAY).start()
+app_port = free_port()
+os.environ.update({
+    "PUBLIC_BASE_URL": f"http://127.0.0.1:{app_port}",
+    "TWILIO_API_BASE_URL": fake.base_url,
+    "LYNNHAVEN_TWILIO_ACCOUNT_SID": "AC" + "0" * 32,
+    "LYNNHAVEN_TWILIO_AUTH_TOKEN": "fake-token",
+    "LYNNHAVEN_TWILIO_FROM_NUMBER": STORE_DID,
+})
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from loguru import logger  # noqa: E402
+
+import core.state_machine  # noqa: E402
+from actions.transfer_service import get_pending_transfer_count  # noqa: E402
+from api.main import app  # noqa: E402
+from utils.twilio_utils import get_twilio_pool_metrics  # noqa: E402
+
+# Transfers only happen during business hours
+core.state_machine.is_business_hours = lambda *args, **kwargs: True
+logger.remove()
+
+
+async def run():
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", timeout=60) as client:
+        async def one_call(i):
+            start = time.perf_counter()
+            response = await client.post("/webhooks/gather", data={
+                "SpeechResult": "I want to talk to a technician",
+                "From": f"+1555000{i:04d}",
+                "Called": STORE_DID,
+                "CallSid": f"CA{i:032d}",
+            })
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one_call(i) for i in range(CONCURRENCY)))
+        wall = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{CONCURRENCY} concurrent transfers, staff answer delay {ANSWER_DELAY}s")
+    print(f"  wall time:        {wall:.2f}s (serialized polling would be ~{CONCURRENCY * ANSWER_DELAY:.0f}s)")
+    print(f"  webhook p50/max:  {latencies[len(latencies) // 2] * 1000:.0f}ms / {latencies[-1] * 1000:.0f}ms")
+
+    deadline = time.time() + ANSWER_DELAY + 10
+    while get_pending_transfer_count() and time.time() < deadline:
+        await asyncio.sleep(0.1)
+    print(f"  resolved via status callbacks: {CONCURRENCY - get_pending_transfer_count()}/{CONCURRENCY}")
+    account = get_twilio_pool_metrics()["accounts"]["LYNNHAVEN"]
+    print(f"  twilio clients created: {account['clients_created']}, requests: {account['requests']}, "
+          f"peak in flight: {account['peak_in_flight']}, waited for a slot: {account['waited']}")
+
+
+if __name__ == "__main__":
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=app_port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        asyncio.run(run())
+    finally:
+        server.should_exit = True
+        fake.stop()
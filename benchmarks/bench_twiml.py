@@ -0,0 +1,79 @@
+"""
+TwiML rendering benchmark: precompiled byte templates vs building a
+VoiceResponse tree and serializing it on every webhook.
+
+Both paths are checked to produce byte-identical documents first, including
+slot values that need XML escaping.
+
+Usage: python -m benchmarks.bench_twiml [iterations]
+"""
+import sys
+import time
+
+from twilio.twiml.voice_response import VoiceResponse
+
+from core import prompt_manager
+from core.twiml_renderer import render, render_fsm_response, render_greeting
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+STORE = {"name": "uBreakiFix Lynnhaven", "location": "Lynnhaven & Virginia Beach"}
+
+
+def legacy_greeting(store):
+    response = VoiceResponse()
+    response.say(prompt_manager.get_greeting(store.get("name"), store.get("location")), voice="alice", language="en-US")
+    response.gather(input="speech", action="/webhooks/gather", method="POST", speech_timeout="5")
+    return str(response).encode("utf-8")
+
+
+def legacy_price_found(price):
+    response = VoiceResponse()
+    response.say(prompt_manager.get_pricing_found(price), voice="alice", language="en-US")
+    response.pause(length=1)
+    return str(response).encode("utf-8")
+
+
+def legacy_booking_offer():
+    response = VoiceResponse()
+    response.say(prompt_manager.get_booking_offer(), voice="alice", language="en-US")
+    response.gather(input="speech", action="/webhooks/gather", method="POST", speech_timeout="3")
+    response.pause(length=1)
+    return str(response).encode("utf-8")
+
+
+def legacy_warm_transfer():
+    response = VoiceResponse()
+    response.say(prompt_manager.get_transfer_justification(), voice="alice", language="en-US")
+    response.pause(length=1)
+    response.say(prompt_manager.get_transfer_context_assurance(), voice="alice", language="en-US")
+    response.say(prompt_manager.get_transfer_instruction(), voice="alice", language="en-US")
+    response.say(prompt_manager.get_transfer_connecting(), voice="alice", language="en-US")
+    response.pause(length=1)
+    return str(response).encode("utf-8")
+
+
+CASES = [
+    ("greeting", lambda: legacy_greeting(STORE), lambda: render_greeting(STORE)),
+    ("price_found", lambda: legacy_price_found(129.99), lambda: render_fsm_response("price_found", {"price": 129.99})),
+    ("offer_booking_sms", legacy_booking_offer, lambda: render("offer_booking_sms")),
+    ("warm_transfer", legacy_warm_transfer, lambda: render("warm_transfer")),
+]
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn()
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+if __name__ == "__main__":
+    for name, legacy, compiled in CASES:
+        assert legacy() == compiled(), f"{name}: template output differs from VoiceResponse"
+
+    print(f"{ITERATIONS} renders per shape (outputs verified byte-identical)")
+    print(f"{'shape':<20}{'VoiceResponse':>16}{'template':>12}{'speedup':>10}")
+    for name, legacy, compiled in CASES:
+        before = timed(legacy)
+        after = timed(compiled)
+        print(f"{name:<20}{before:>14.2f}us{after:>10.2f}us{before / after:>9.0f}x")
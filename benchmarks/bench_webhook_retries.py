@@ -0,0 +1,121 @@
+"""
+Twilio webhook retries against a slow Twilio API, with and without the
+idempotency layer on /webhooks/voice and /webhooks/gather.
+
+Every fake Twilio request takes 1s, so a transfer turn takes about 2s
+(moving the caller to the hold conference, then dialing staff). For each
+of CALLS calls the greeting and the "talk to a technician" turn are each
+delivered three times with the same I-Twilio-Idempotency-Token: the
+original, a retry 0.3s later (while the transfer turn is still running)
+and a retry after it has answered. Reported: staff legs dialed per transfer, Twilio
+REST requests, and the webhook latency of each delivery.
+
+Usage: python -m benchmarks.bench_webhook_retries [calls]
+"""
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+from benchmarks.fake_twilio import FakeTwilio
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+STORE_DID = "+17577994705"  # Lynnhaven
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+fake = FakeTwilio(latency=1.0, answer_delay=0.5).start()
+app_port = free_port()
+os.environ.update({
+    "PUBLIC_BASE_URL": f"http://127.0.0.1:{app_port}",
+    "TWILIO_API_BASE_URL": fake.base_url,
+    "LYNNHAVEN_TWILIO_ACCOUNT_SID": "AC" + "0" * 32,
+    "LYNNHAVEN_TWILIO_AUTH_TOKEN": "fake-token",
+    "LYNNHAVEN_TWILIO_FROM_NUMBER": STORE_DID,
+})
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from loguru import logger  # noqa: E402
+
+import core.staff_availability  # noqa: E402
+import utils.idempotency  # noqa: E402
+from actions.transfer_service import get_pending_transfer_count  # noqa: E402
+from api.main import app  # noqa: E402
+from core import call_warmup  # noqa: E402
+
+# Transfers only happen during business hours (the warmed-up context decides on /gather)
+call_warmup.CallContext.is_open = lambda self: True
+# Every transfer rings the store; availability tracking would skip it once lines fill up
+core.staff_availability.AVAILABILITY_ENABLED = False
+logger.remove()
+
+
+async def deliver(client, path, data, token):
+    """
+    The original request, a retry while it is running and one after it answered.
+    """
+    headers = {"I-Twilio-Idempotency-Token": token}
+
+    async def post(delay):
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        response = await client.post(path, data=data, headers=headers)
+        response.raise_for_status()
+        return time.perf_counter() - start, response.content
+
+    (original, body), (in_flight, retry_body) = await asyncio.gather(post(0), post(0.3))
+    after, late_body = await post(0)
+    return original, in_flight, after, body == retry_body == late_body
+
+
+async def one_call(client, i, offset):
+    call_sid = f"CA{offset + i:032d}"
+    voice = {"Called": STORE_DID, "From": f"+1555000{i:04d}", "CallSid": call_sid}
+    greeting = await deliver(client, "/webhooks/voice", voice, f"{call_sid}-voice")
+    turn = await deliver(client, "/webhooks/gather", dict(voice, SpeechResult="I want to talk to a technician"),
+                         f"{call_sid}-gather-1")
+    return greeting, turn
+
+
+async def main():
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", timeout=60) as client:
+        print(f"{CALLS} calls, every webhook delivered 3 times, 1s per Twilio request")
+        for enabled in (False, True):
+            utils.idempotency.IDEMPOTENCY_ENABLED = enabled
+            fake.calls.clear()
+            fake.request_counts.clear()
+            results = await asyncio.gather(*(one_call(client, i, CALLS * enabled) for i in range(CALLS)))
+            deadline = time.time() + 30
+            while get_pending_transfer_count() and time.time() < deadline:
+                await asyncio.sleep(0.05)
+
+            legs = sum(1 for call in list(fake.calls.values()) if "conf_" in (call.get("twiml") or ""))
+            requests = sum(fake.request_counts.values())
+            same = sum(greeting[3] and turn[3] for greeting, turn in results)
+            print(f"  idempotency {'on ' if enabled else 'off'}  staff legs per transfer {legs / CALLS:3.1f}  "
+                  f"Twilio requests {requests:>3}  identical replies {same}/{CALLS}")
+            for name, index in (("voice", 0), ("gather", 1)):
+                original, in_flight, after = (sorted(r[index][n] for r in results) for n in range(3))
+                print(f"    /{name:<7} p50 original {original[CALLS // 2] * 1000:6.1f}ms  "
+                      f"in-flight retry {in_flight[CALLS // 2] * 1000:6.1f}ms  "
+                      f"late retry {after[CALLS // 2] * 1000:6.1f}ms")
+
+
+if __name__ == "__main__":
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=app_port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        asyncio.run(main())
+    finally:
+        server.should_exit = True
+        fake.stop()
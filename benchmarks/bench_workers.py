@@ -0,0 +1,112 @@
+"""
+/webhooks/gather throughput of api.workers at different worker counts.
+
+Starts `python -m api.workers --workers N` for each N, drives it with
+pricing transcripts from a fixed number of concurrent clients, and reports
+requests per second and latency. The transcripts only produce quotes or
+booking offers, so no Twilio traffic is involved. Events go to a
+temporary directory.
+
+The load generator runs on the same host and takes CPU from the workers;
+for numbers that reflect a production box, run the clients elsewhere or
+leave a core free for them.
+
+Usage: python -m benchmarks.bench_workers [--workers 1,2,4] [--requests 3000] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+STORE_DID = "+17577994705"
+TRANSCRIPTS = [
+    "How much to fix an iPhone 13 screen?",
+    "What does a battery for an iPad 6 cost",
+    "PS5 HDMI port replacement price",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    default_counts = sorted({1, 2, os.cpu_count() or 1})
+    parser.add_argument("--workers", default=",".join(map(str, default_counts)), help="comma-separated worker counts")
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def drive(base_url: str, requests: int, concurrency: int):
+    latencies = []
+    next_request = iter(range(requests))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        async def client_loop():
+            for i in next_request:
+                start = time.perf_counter()
+                response = await client.post("/webhooks/gather", data={
+                    "SpeechResult": TRANSCRIPTS[i % len(TRANSCRIPTS)],
+                    "Called": STORE_DID,
+                    "From": "+15550000000",
+                    "CallSid": f"CA{i:032d}",
+                })
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+    latencies.sort()
+    return wall, latencies
+
+
+def wait_until_up(base_url: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("api.workers did not start")
+
+
+def run(workers: int, args) -> None:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, EVENT_STORE_DIR=tempfile.mkdtemp(prefix="bench_workers_"), LOG_LEVEL="ERROR")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "api.workers", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_up(base_url)
+        # Warm every worker's caches before measuring
+        asyncio.run(drive(base_url, workers * 50, workers * 4))
+        wall, latencies = asyncio.run(drive(base_url, args.requests, args.concurrency))
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"  {workers:>2} workers: {len(latencies) / wall:8.1f} req/s  p50 {p50:7.2f}ms  p99 {p99:7.2f}ms")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"{args.requests} gather requests, {args.concurrency} concurrent clients, {os.cpu_count()} CPUs")
+    for workers in (int(n) for n in args.workers.split(",")):
+        run(workers, args)
@@ -0,0 +1,193 @@
+"""
+Minimal in-process fake of the Twilio REST API for load tests.
+
+Implements just the endpoints this project calls (Calls create/update/fetch
+and Messages create), with configurable latency, staff answer delays and
+failure modes (busy/no-answer staff legs, transient 5xx or permanent 400
+SMS errors), optionally per dialed number. A leg that would answer after
+its Timeout ends as no-answer at the timeout, and cancelled legs report
+"canceled". Status callbacks are POSTed back to the app over HTTP, the
+same way Twilio would.
+"""
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode
+from urllib.request import Request, urlopen
+
+
+class _Server(ThreadingHTTPServer):
+    # Concurrency benchmarks open hundreds of connections at once
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # The app dropping pooled keep-alive connections on shutdown is expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeTwilio:
+    def __init__(
+        self,
+        latency: float = 0.05,
+        answer_delay: float = 2.0,
+        call_outcome="in-progress",
+        sms_failure_rate: float = 0.0,
+        sms_failure_status: int = 503,
+        lines=None,
+    ):
+        self.latency = latency
+        self.answer_delay = answer_delay
+        # A single status, or {status: weight} to mix answered, busy and no-answer legs
+        self.call_outcome = call_outcome
+        self.sms_failure_rate = sms_failure_rate
+        self.sms_failure_status = sms_failure_status
+        # {to_number: {"answer_delay": seconds, "call_outcome": status}} overriding the defaults per line
+        self.lines = lines or {}
+
+        self.calls = {}
+        self.messages = {}
+        self.request_counts = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeTwilio":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real API; every response carries a Content-Length
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._handle(self, "GET", {})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                params = {k: v if len(v) > 1 else v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+                fake._handle(self, "POST", params)
+
+        self._server = _Server(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+
+    def _handle(self, handler, method, params):
+        time.sleep(self.latency)
+        path = handler.path.split("?")[0]
+        parts = path.strip("/").split("/")
+        # /2010-04-01/Accounts/{AccountSid}/{Resource}[/{Sid}].json
+        resource = parts[3].replace(".json", "") if len(parts) > 3 else ""
+        sid = parts[4].replace(".json", "") if len(parts) > 4 else None
+
+        with self._lock:
+            key = f"{method} {resource}{'/{sid}' if sid else ''}"
+            self.request_counts[key] = self.request_counts.get(key, 0) + 1
+
+        if resource == "Calls" and method == "POST" and sid is None:
+            status, body = self._create_call(params)
+        elif resource == "Calls" and sid:
+            status, body = self._call_instance(sid, method, params)
+        elif resource == "Messages" and method == "POST":
+            status, body = self._create_message(params)
+        else:
+            status, body = 404, {"code": 20404, "message": "Not found", "status": 404}
+
+        payload = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def _create_call(self, params):
+        sid = "CA" + uuid.uuid4().hex
+        line = self.lines.get(params.get("To"), {})
+        call = {
+            "sid": sid,
+            "to": params.get("To"),
+            "from": params.get("From"),
+            "status": "queued",
+            "created": time.time(),
+            "answered": None,
+            "finished": None,
+            "twiml": params.get("Twiml"),
+            "status_callback": params.get("StatusCallback"),
+        }
+        with self._lock:
+            self.calls[sid] = call
+        delay = line.get("answer_delay", self.answer_delay)
+        outcome = line.get("call_outcome")
+        timeout = float(params.get("Timeout", "inf"))
+        if delay > timeout:
+            delay, outcome = timeout, "no-answer"
+        threading.Timer(delay, self._finish_call, args=(sid, outcome)).start()
+        return 201, {"sid": sid, "status": "queued", "to": call["to"], "from": call["from"]}
+
+    def _finish_call(self, sid, outcome=None):
+        with self._lock:
+            call = self.calls.get(sid)
+            if call is None or call["status"] not in ("queued", "ringing"):
+                return
+            call["status"] = outcome or self._pick_outcome()
+            call["finished"] = time.time()
+            if call["status"] == "in-progress":
+                call["answered"] = call["finished"]
+        self._post_callback(call)
+
+    def _pick_outcome(self) -> str:
+        if isinstance(self.call_outcome, str):
+            return self.call_outcome
+        statuses = list(self.call_outcome)
+        return random.choices(statuses, weights=[self.call_outcome[s] for s in statuses])[0]
+
+    def _call_instance(self, sid, method, params):
+        ended = None
+        with self._lock:
+            call = self.calls.setdefault(sid, {"sid": sid, "status": "in-progress", "status_callback": None})
+            if method == "POST" and params.get("Status") in ("canceled", "completed"):
+                if call["status"] in ("queued", "ringing"):
+                    call["status"] = ended = "canceled"
+                elif call["status"] == "in-progress":
+                    call["status"] = ended = "completed"
+                if ended:
+                    call["finished"] = time.time()
+            status = call["status"]
+        if ended:
+            threading.Thread(target=self._post_callback, args=(dict(call),), daemon=True).start()
+        return 200, {"sid": sid, "status": status}
+
+    def _create_message(self, params):
+        if random.random() < self.sms_failure_rate:
+            if self.sms_failure_status >= 500:
+                return self.sms_failure_status, {"code": 20500, "message": "Service unavailable", "status": self.sms_failure_status}
+            return 400, {"code": 21610, "message": "Attempt to send to unsubscribed recipient", "status": 400}
+        sid = "SM" + uuid.uuid4().hex
+        with self._lock:
+            self.messages[sid] = {"sid": sid, "to": params.get("To"), "from": params.get("From"), "body": params.get("Body")}
+        return 201, {"sid": sid, "status": "queued", "to": params.get("To"), "from": params.get("From")}
+
+    def _post_callback(self, call):
+        url = call.get("status_callback")
+        if not url:
+            return
+        data = urlencode({"CallSid": call["sid"], "CallStatus": call["status"]}).encode()
+        try:
+            urlopen(Request(url, data=data, method="POST"), timeout=5).read()
+        except Exception:
+            pass
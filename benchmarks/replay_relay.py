@@ -0,0 +1,231 @@
+"""
+Replays recorded ConversationRelay transcript streams and compares
+end-of-speech-to-response latency with the <Gather> path.
+
+Each stream is a JSONL file of {"t": seconds, "message": {...}} lines, as
+the relay endpoint writes them with RELAY_RECORD_DIR set; the streams in
+benchmarks/streams are synthesized samples in the same shape. Every stream
+is answered with /webhooks/voice and then driven three ways:
+
+  gather          each final transcript POSTed to /webhooks/gather
+  relay, final    only the final prompt of each utterance is sent over the
+                  websocket, so nothing is planned ahead
+  relay           partial prompts go out with their recorded timing (scaled
+                  by --speed) and the reply is planned on them
+
+Latency runs from the final transcript leaving the client to the reply
+arriving; the server's own share (from /admin/metrics/latency) is listed
+after it. Client-side "relay" numbers include waking the connection after
+each recorded pause, so compare planned and unplanned turns on the server
+lines. Twilio only POSTs a <Gather> result after speechTimeout (3 to 5
+seconds) of silence; that wait is not part of the gather numbers.
+
+By default the app runs in this process with the decision cache off, so
+every plan is real work; --url drives a running server instead (its
+/webhooks/relay needs the websockets package on both ends).
+
+Usage: python -m benchmarks.replay_relay [--url http://127.0.0.1:8000] [--speed 4] [--rounds 5] [stream.jsonl ...]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+STREAMS_DIR = BASE_DIR / "benchmarks" / "streams"
+MODES = ("gather", "relay, final", "relay")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("streams", nargs="*", help="recorded stream files (default: benchmarks/streams/*.jsonl)")
+    parser.add_argument("--url", help="base URL of a running server; omit to run the app in this process")
+    parser.add_argument("--speed", type=float, default=4.0, help="replay partial prompts this many times faster")
+    parser.add_argument("--rounds", type=int, default=5, help="times to replay every stream per mode")
+    return parser.parse_args()
+
+
+def load_stream(path: Path):
+    """
+    The stream's setup message and its utterances, each a list of
+    (t, prompt message) ending with the final prompt.
+    """
+    setup, utterances, current = None, [], []
+    with open(path, "r") as f:
+        for line in f:
+            entry = json.loads(line)
+            message = entry["message"]
+            if message.get("type") == "setup":
+                setup = message
+            elif message.get("type") == "prompt":
+                current.append((entry["t"], message))
+                if message.get("last", True):
+                    utterances.append(current)
+                    current = []
+    return setup, utterances
+
+
+class InProcess:
+    """
+    The app under starlette's TestClient.
+    """
+
+    def __init__(self):
+        # Must be set before the app modules read them
+        os.environ["EVENT_STORE_DIR"] = tempfile.mkdtemp(prefix="replay_relay_")
+        os.environ.setdefault("PUBLIC_BASE_URL", "http://testserver")
+        from loguru import logger
+        from starlette.testclient import TestClient
+        import core.decision_cache
+        from api.main import app
+
+        logger.remove()
+        core.decision_cache.CACHE_ENABLED = False
+        self.client = TestClient(app)
+
+    def post(self, path: str, data: dict):
+        response = self.client.post(path, data=data)
+        response.raise_for_status()
+        return response
+
+    def websocket(self):
+        return self.client.websocket_connect("/webhooks/relay")
+
+    def stats(self):
+        return self.client.get("/admin/streaming").json()
+
+    def latency(self):
+        return self.client.get("/admin/metrics/latency").json()
+
+
+class Remote:
+    """
+    A running server, over HTTP and a real websocket.
+    """
+
+    def __init__(self, url: str):
+        import httpx
+        from websockets.sync.client import connect
+
+        self.client = httpx.Client(base_url=url, timeout=30)
+        self.ws_url = url.replace("https://", "wss://").replace("http://", "ws://") + "/webhooks/relay"
+        self._connect = connect
+
+    def post(self, path: str, data: dict):
+        response = self.client.post(path, data=data)
+        response.raise_for_status()
+        return response
+
+    def websocket(self):
+        return _RemoteSocket(self._connect(self.ws_url))
+
+    def stats(self):
+        return self.client.get("/admin/streaming").json()
+
+    def latency(self):
+        return self.client.get("/admin/metrics/latency").json()
+
+
+class _RemoteSocket:
+    """
+    websockets' sync client with the TestClient session's method names.
+    """
+
+    def __init__(self, connect):
+        self._connect = connect
+        self.connection = None
+
+    def __enter__(self):
+        self.connection = self._connect.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._connect.__exit__(*exc)
+
+    def send_text(self, text: str):
+        self.connection.send(text)
+
+    def receive_text(self) -> str:
+        return self.connection.recv()
+
+
+def replay(app, setup: dict, utterances, mode: str, call_sid: str, speed: float):
+    """
+    One call in one mode; returns the latency of each utterance's reply.
+    """
+    call = {"CallSid": call_sid, "Called": setup["to"], "From": setup["from"]}
+    app.post("/webhooks/voice", call)
+    latencies = []
+
+    if mode == "gather":
+        for utterance in utterances:
+            start = time.perf_counter()
+            app.post("/webhooks/gather", dict(call, SpeechResult=utterance[-1][1]["voicePrompt"]))
+            latencies.append(time.perf_counter() - start)
+    else:
+        with app.websocket() as ws:
+            ws.send_text(json.dumps(dict(setup, callSid=call_sid)))
+            for utterance in utterances:
+                prompts = utterance if mode == "relay" else utterance[-1:]
+                previous = prompts[0][0]
+                for t, message in prompts:
+                    if mode == "relay":
+                        time.sleep(max(0.0, t - previous) / speed)
+                        previous = t
+                    start = time.perf_counter()
+                    ws.send_text(json.dumps(message))
+                latencies.append(_await_reply(ws, start))
+
+    app.post("/webhooks/status/call", {"CallSid": call_sid, "CallStatus": "completed"})
+    return latencies
+
+
+def _await_reply(ws, start: float) -> float:
+    while json.loads(ws.receive_text()).get("type") != "text":
+        pass
+    return time.perf_counter() - start
+
+
+def report(mode: str, latencies):
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    mean = sum(latencies) / len(latencies) * 1000
+    print(f"  {mode:<14} p50 {p50:7.2f}ms  p99 {p99:7.2f}ms  mean {mean:7.2f}ms  ({len(latencies)} replies)")
+
+
+def main():
+    args = parse_args()
+    paths = [Path(p) for p in args.streams] or sorted(STREAMS_DIR.glob("*.jsonl"))
+    streams = [load_stream(path) for path in paths]
+    app = Remote(args.url) if args.url else InProcess()
+
+    print(f"{len(streams)} streams, {args.rounds} rounds, partials at {args.speed:g}x speed")
+    call_number = 0
+    for mode in MODES:
+        latencies = []
+        for _ in range(args.rounds):
+            for setup, utterances in streams:
+                call_number += 1
+                latencies += replay(app, setup, utterances, mode, f"CA{call_number:032d}", args.speed)
+        report(mode, latencies)
+
+    stats = app.stats()
+    print(f"  relay turns: {stats['turns']} ({stats['planned']} planned on a partial, "
+          f"{stats['replanned']} replanned, {stats['unplanned']} unplanned)")
+
+    # Server side: the whole /gather request, and the relay turn from final prompt to reply
+    latency = app.latency()
+    server = {"gather": latency["http_request_duration_seconds"].get("POST /webhooks/gather")}
+    for outcome in ("unplanned", "replanned", "planned"):
+        server[f"relay, {outcome}"] = latency["stage_duration_seconds"].get(f"relay_turn_{outcome}")
+    for label, summary in server.items():
+        if summary:
+            print(f"  server {label:<18} p50 {summary['p50_ms']:7.2f}ms  p99 {summary['p99_ms']:7.2f}ms  "
+                  f"mean {summary['mean_ms']:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
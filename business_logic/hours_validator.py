@@ -0,0 +1,210 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from loguru import logger
+from core.store_resolver import get_store_registry
+from utils.config_watcher import get_config_version
+
+# Used for stores without their own schedule: every day 10 AM - 7 PM Eastern
+DEFAULT_TIMEZONE = "America/New_York"
+DEFAULT_HOURS = "10:00-19:00"
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+# How far ahead to look for the next opening (covers long holiday closures)
+SHORT_HORIZON_DAYS = 14
+MAX_HORIZON_DAYS = 400
+
+NEVER = float("inf")
+
+
+def _parse_clock(value: str) -> int:
+    hours, minutes = value.strip().split(":")
+    minute = int(hours) * 60 + int(minutes)
+    if not 0 <= minute <= 24 * 60:
+        raise ValueError(f"Invalid time of day: {value!r}")
+    return minute
+
+
+def _parse_ranges(spec) -> List[Tuple[int, int]]:
+    """
+    "10:00-19:00", ["09:00-12:00", "13:00-18:00"], "closed" or null ->
+    [(open_minute, close_minute)]. A close before the open runs past midnight.
+    """
+    if spec is None or spec == "closed":
+        return []
+    if isinstance(spec, str):
+        spec = [spec]
+    ranges = []
+    for item in spec:
+        start, end = item.split("-")
+        open_minute, close_minute = _parse_clock(start), _parse_clock(end)
+        if close_minute <= open_minute:
+            close_minute += 24 * 60
+        ranges.append((open_minute, close_minute))
+    return sorted(ranges)
+
+
+class StoreSchedule:
+    """
+    A store's weekly hours, IANA timezone and dated exceptions.
+
+    Store config fields (all optional):
+        "timezone": "America/New_York"
+        "hours": {"mon": "10:00-19:00", ..., "sun": "closed"}
+        "holidays": {"2026-12-25": "closed", "2026-12-24": "10:00-15:00"}
+
+    The open/closed state is computed together with the timestamp of the
+    next transition, so until that moment a check is one comparison.
+    """
+
+    def __init__(self, store: Dict[str, Any]):
+        self.store_id = store.get("store_id", "default")
+        try:
+            self.tz = ZoneInfo(store.get("timezone") or DEFAULT_TIMEZONE)
+        except ZoneInfoNotFoundError:
+            logger.error(f"Unknown timezone {store.get('timezone')!r} for {self.store_id}; using {DEFAULT_TIMEZONE}")
+            self.tz = ZoneInfo(DEFAULT_TIMEZONE)
+
+        hours = store.get("hours")
+        if hours is None:
+            hours = {day: DEFAULT_HOURS for day in WEEKDAYS}
+        self.weekly = [_parse_ranges(hours.get(day)) for day in WEEKDAYS]
+        self.exceptions = {
+            date.fromisoformat(day): _parse_ranges(spec)
+            for day, spec in (store.get("holidays") or {}).items()
+        }
+        # (valid_from, valid_until, is_open, next_opening); replaced atomically
+        self._state = (NEVER, -NEVER, False, None)
+
+    def _ranges_for(self, day: date) -> List[Tuple[int, int]]:
+        if day in self.exceptions:
+            return self.exceptions[day]
+        return self.weekly[day.weekday()]
+
+    def _intervals(self, first: date, days: int) -> List[Tuple[float, float]]:
+        """
+        Merged open intervals (UTC timestamps) for a run of local dates.
+        """
+        intervals = []
+        for offset in range(days):
+            day = first + timedelta(days=offset)
+            midnight = datetime(day.year, day.month, day.day)
+            for open_minute, close_minute in self._ranges_for(day):
+                start = (midnight + timedelta(minutes=open_minute)).replace(tzinfo=self.tz).timestamp()
+                end = (midnight + timedelta(minutes=close_minute)).replace(tzinfo=self.tz).timestamp()
+                if intervals and start <= intervals[-1][1]:
+                    intervals[-1] = (intervals[-1][0], max(intervals[-1][1], end))
+                else:
+                    intervals.append((start, end))
+        return intervals
+
+    def _compute(self, now: float):
+        # Start a day early so overnight hours from yesterday are included
+        first = datetime.fromtimestamp(now, self.tz).date() - timedelta(days=1)
+        for horizon in (SHORT_HORIZON_DAYS, MAX_HORIZON_DAYS):
+            for start, end in self._intervals(first, horizon + 1):
+                if end <= now:
+                    continue
+                if start <= now:
+                    return (start, end, True, now)
+                return (now, start, False, start)
+        return (now, NEVER, False, None)
+
+    def _current(self, now: float):
+        state = self._state
+        if not state[0] <= now < state[1]:
+            state = self._compute(now)
+            self._state = state
+        return state
+
+    def is_open(self, now: Optional[float] = None) -> bool:
+        return self._current(time.time() if now is None else now)[2]
+
+    def valid_until(self, now: Optional[float] = None) -> float:
+        """
+        Timestamp of the next open/close transition after now.
+        """
+        return self._current(time.time() if now is None else now)[1]
+
+    def next_opening(self, now: Optional[float] = None) -> Optional[datetime]:
+        """
+        When the store next opens, in store-local time; now if it is open.
+        """
+        opening = self._current(time.time() if now is None else now)[3]
+        return datetime.fromtimestamp(opening, self.tz) if opening is not None else None
+
+
+_schedules: Dict[str, StoreSchedule] = {}
+_schedules_version = -1
+_schedules_lock = threading.Lock()
+
+
+def get_store_schedule(store: Dict[str, Any]) -> StoreSchedule:
+    """
+    Compiled schedule for a store, rebuilt after a store config reload.
+    """
+    global _schedules, _schedules_version
+    version = get_config_version()
+    if version != _schedules_version:
+        with _schedules_lock:
+            if version != _schedules_version:
+                _schedules = {}
+                _schedules_version = version
+
+    store_id = store.get("store_id", "default")
+    schedule = _schedules.get(store_id)
+    if schedule is None:
+        try:
+            schedule = StoreSchedule(store)
+        except (ValueError, AttributeError) as e:
+            logger.error(f"Invalid hours for store {store_id}: {e}; using default hours")
+            schedule = StoreSchedule({"store_id": store_id, "timezone": store.get("timezone")})
+        _schedules[store_id] = schedule
+    return schedule
+
+
+def is_business_hours(store: Dict[str, Any], now: Optional[float] = None) -> bool:
+    """
+    Checks whether the store is open at now (defaults to the current time).
+    """
+    return get_store_schedule(store).is_open(now)
+
+
+def next_opening(store: Dict[str, Any], now: Optional[float] = None) -> Optional[datetime]:
+    return get_store_schedule(store).next_opening(now)
+
+
+def describe_next_opening(store: Dict[str, Any], now: Optional[float] = None) -> Optional[str]:
+    """
+    Spoken form of the next opening, e.g. "tomorrow at 10 AM" or "Monday at 9:30 AM".
+    """
+    now = time.time() if now is None else now
+    opening = next_opening(store, now)
+    if opening is None:
+        return None
+
+    hour = opening.hour % 12 or 12
+    clock = f"{hour}:{opening.minute:02d}" if opening.minute else f"{hour}"
+    clock += " AM" if opening.hour < 12 else " PM"
+
+    days_ahead = (opening.date() - datetime.fromtimestamp(now, opening.tzinfo).date()).days
+    if days_ahead == 0:
+        return f"today at {clock}"
+    if days_ahead == 1:
+        return f"tomorrow at {clock}"
+    if days_ahead < 7:
+        return f"{opening.strftime('%A')} at {clock}"
+    return f"{opening.strftime('%A, %B')} {opening.day} at {clock}"
+
+
+def open_stores(stores: Optional[List[Dict[str, Any]]] = None, now: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Stores open at now, from the given list or every configured store.
+    """
+    if stores is None:
+        stores = get_store_registry().all_stores()
+    now = time.time() if now is None else now
+    return [store for store in stores if get_store_schedule(store).is_open(now)]
@@ -1,10 +1,16 @@
 import json
-import os
+import threading
 from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+from utils.config_watcher import FileWatcher, bump_config_version
+from utils.cluster import get_config_snapshot, config_sources
+from utils.metrics import timed
 
 # Paths
 BASE_DIR = Path(__file__).resolve().parents[1]
 PRICING_DIR = BASE_DIR / "data" / "pricing"
+OVERRIDES_DIR = PRICING_DIR / "overrides"
 
 CATEGORY_MAP = {
     "phone": "phones.json",
@@ -21,45 +27,213 @@ ISSUE_MAP = {
     "hdmi": ["hdmi", "dock"]
 }
 
-def get_repair_price(device_category: str, model: str, issue: str) -> dict | None:
+PriceKey = Tuple[str, str, str]
+
+
+def _compile_model(category: str, model: str, issues: Dict[str, float], prices: Dict[PriceKey, float]):
     """
-    Look up repair prices from static JSON files using exact and mapped matching.
+    Adds one model's prices to a (category, model, issue) map, including
+    ISSUE_MAP aliases. Direct issue names always win over aliases.
     """
-    filename = CATEGORY_MAP.get(device_category.lower())
-    if not filename:
-        return None
-    
-    file_path = PRICING_DIR / filename
-    if not os.path.exists(file_path):
-        return None
+    model_key = model.casefold()
+    direct = set()
+    for issue_name, price in issues.items():
+        direct.add(issue_name.casefold())
+        prices[(category, model_key, issue_name.casefold())] = price
 
-    try:
-        with open(file_path, "r") as f:
-            pricing_data = json.load(f)
-        
-        # Exact model matching (case-insensitive)
-        stored_model = None
-        for key in pricing_data.keys():
-            if key.lower() == model.lower():
-                stored_model = key
+    for alias, targets in ISSUE_MAP.items():
+        if alias in direct:
+            continue
+        for target in targets:
+            if target in issues:
+                prices[(category, model_key, alias)] = issues[target]
                 break
-        
-        if stored_model:
-            model_data = pricing_data[stored_model]
-            issue_lower = issue.lower()
-            
-            # 1. Try direct matching
-            for issue_name, price in model_data.items():
-                if issue_name.lower() == issue_lower:
-                    return {"price": price, "currency": "USD"}
-            
-            # 2. Try mapped matching (e.g. "screen" -> "glass_lcd")
-            target_keys = ISSUE_MAP.get(issue_lower, [])
-            for target in target_keys:
-                if target in model_data:
-                    return {"price": model_data[target], "currency": "USD"}
 
+
+class PricingCatalog:
+    """
+    All pricing files compiled into a single case-folded lookup table.
+
+    Store-specific overrides live in data/pricing/overrides/<store_id>.json
+    using the shape {"<category>": {"<model>": {"<issue>": price}}} and take
+    precedence over the base price for that store only. The catalog
+    recompiles itself when any pricing or override file changes (or, under
+    api.workers, when the supervisor publishes a new config snapshot).
+    """
+
+    def __init__(self, pricing_dir: Path = PRICING_DIR, overrides_dir: Optional[Path] = None):
+        self.pricing_dir = Path(pricing_dir)
+        self.overrides_dir = Path(overrides_dir) if overrides_dir else self.pricing_dir / "overrides"
+        self._reload_lock = threading.Lock()
+        self._prices: Dict[PriceKey, float] = {}
+        self._store_prices: Dict[str, Dict[PriceKey, float]] = {}
+        self._models: Dict[str, List[str]] = {}
+        self.generation = 0
+        self._build()
+
+    def source_paths(self) -> List[Path]:
+        paths = [self.pricing_dir / filename for filename in CATEGORY_MAP.values()]
+        paths.append(self.overrides_dir)
+        if self.overrides_dir.is_dir():
+            paths.extend(sorted(self.overrides_dir.glob("*.json")))
+        return paths
+
+    def read_sources(self) -> Dict[str, Dict[str, Any]]:
+        """
+        The pricing files as written: {"categories": {category: models},
+        "overrides": {store_id: {category: models}}}.
+        """
+        categories: Dict[str, Any] = {}
+        for category, filename in CATEGORY_MAP.items():
+            file_path = self.pricing_dir / filename
+            if not file_path.exists():
+                continue
+            with open(file_path, "r") as f:
+                categories[category] = json.load(f)
+
+        overrides: Dict[str, Any] = {}
+        if self.overrides_dir.is_dir():
+            for override_file in self.overrides_dir.glob("*.json"):
+                with open(override_file, "r") as f:
+                    overrides[override_file.stem] = json.load(f)
+        return {"categories": categories, "overrides": overrides}
+
+    def _build(self):
+        snapshot = get_config_snapshot()
+        sources = snapshot.section("pricing") if snapshot is not None else None
+        if sources is None:
+            sources = self.read_sources()
+
+        raw: Dict[str, Dict[str, Dict[str, float]]] = sources["categories"]
+        prices: Dict[PriceKey, float] = {}
+        models: Dict[str, List[str]] = {}
+
+        for category, category_models in raw.items():
+            models[category] = list(category_models.keys())
+            for model, issues in category_models.items():
+                _compile_model(category, model, issues, prices)
+
+        store_prices: Dict[str, Dict[PriceKey, float]] = {}
+        for store_id, overrides in sources["overrides"].items():
+            compiled: Dict[PriceKey, float] = {}
+            for category, override_models in overrides.items():
+                base_models = {m.casefold(): issues for m, issues in raw.get(category, {}).items()}
+                for model, issues in override_models.items():
+                    # Merge so aliases resolve against the overridden issue prices
+                    merged = dict(base_models.get(model.casefold(), {}))
+                    merged.update(issues)
+                    _compile_model(category, model, merged, compiled)
+            store_prices[store_id] = compiled
+
+        # Swap in one step so concurrent lookups never see a half-built catalog
+        self._prices, self._store_prices, self._models = prices, store_prices, models
+        self.generation += 1
+        self._watcher = FileWatcher(config_sources(*self.source_paths()))
+
+    def reload(self):
+        with self._reload_lock:
+            try:
+                self._build()
+            except Exception as e:
+                logger.error(f"Failed to reload pricing data, keeping previous catalog: {e}")
+                return
+            bump_config_version()
+        logger.info(f"Pricing catalog compiled: {len(self._prices)} price entries")
+
+    def _check_for_changes(self):
+        if self._watcher.changed():
+            self.reload()
+
+    def lookup(self, device_category: str, model: str, issue: str, store_id: Optional[str] = None) -> Optional[float]:
+        self._check_for_changes()
+        key = (device_category.casefold(), model.casefold(), issue.casefold())
+        if store_id:
+            store_prices = self._store_prices.get(store_id)
+            if store_prices and key in store_prices:
+                return store_prices[key]
+        return self._prices.get(key)
+
+    def get_prices(self, queries: Iterable[Tuple[str, str, str]], store_id: Optional[str] = None) -> List[Optional[dict]]:
+        """
+        Bulk lookup: one result (or None) per (category, model, issue) query.
+        """
+        return [_price_result(self.lookup(category, model, issue, store_id)) for category, model, issue in queries]
+
+    def store_view(self, store_id: Optional[str]) -> "PricingView":
+        return PricingView(self, store_id)
+
+    def models(self) -> Dict[str, List[str]]:
+        """
+        Model names as written in the pricing files, grouped by category.
+        """
+        self._check_for_changes()
+        return self._models
+
+
+class PricingView:
+    """
+    One store's prices from the catalog build current when the view was
+    taken: a lookup is two dict probes, with no change check and no
+    override-table search. After the catalog recompiles, lookups go
+    through the live catalog instead.
+    """
+
+    def __init__(self, catalog: PricingCatalog, store_id: Optional[str]):
+        self.catalog = catalog
+        self.store_id = store_id
+        self.generation = catalog.generation
+        self._prices = catalog._prices
+        self._store_prices = catalog._store_prices.get(store_id, {}) if store_id else {}
+
+    def lookup(self, device_category: str, model: str, issue: str) -> Optional[float]:
+        if self.catalog.generation != self.generation:
+            return self.catalog.lookup(device_category, model, issue, self.store_id)
+        key = (device_category.casefold(), model.casefold(), issue.casefold())
+        price = self._store_prices.get(key)
+        return price if price is not None else self._prices.get(key)
+
+    @timed("get_repair_price")
+    def get_repair_price(self, device_category: str, model: str, issue: str) -> Optional[dict]:
+        try:
+            return _price_result(self.lookup(device_category, model, issue))
+        except Exception as e:
+            logger.error(f"Error reading pricing data: {e}")
+            return None
+
+
+def _price_result(price: Optional[float]) -> Optional[dict]:
+    if price is None:
+        return None
+    return {"price": price, "currency": "USD"}
+
+
+_catalog: Optional[PricingCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_pricing_catalog() -> PricingCatalog:
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = PricingCatalog()
+    return _catalog
+
+
+@timed("get_repair_price")
+def get_repair_price(device_category: str, model: str, issue: str, store_id: Optional[str] = None) -> dict | None:
+    """
+    Look up repair prices from the compiled pricing catalog using exact and mapped matching.
+    """
+    try:
+        return _price_result(get_pricing_catalog().lookup(device_category, model, issue, store_id))
     except Exception as e:
-        print(f"Error reading pricing data: {e}")
-    
-    return None
+        logger.error(f"Error reading pricing data: {e}")
+        return None
+
+
+def get_prices(queries: Iterable[Tuple[str, str, str]], store_id: Optional[str] = None) -> List[Optional[dict]]:
+    """
+    Look up several (category, model, issue) prices in one call.
+    """
+    return get_pricing_catalog().get_prices(queries, store_id)
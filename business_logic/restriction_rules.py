@@ -0,0 +1,147 @@
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence
+from loguru import logger
+from utils.config_watcher import FileWatcher, bump_config_version
+from utils.text_utils import PhraseMatcher, normalize_text
+
+try:
+    import yaml
+except ImportError:  # YAML rule files are optional; JSON always works
+    yaml = None
+
+# Paths
+BASE_DIR = Path(__file__).resolve().parents[1]
+RULES_DIR = BASE_DIR / "data" / "rules"
+
+RULE_FILE_SUFFIXES = (".json", ".yaml", ".yml")
+
+# What a matched rule does to the call
+RESTRICT_PRICING = "restrict_pricing"  # never quote; invite the caller into the store
+NO_QUOTE = "no_quote"                  # skip the price lookup; staff or booking link instead
+FORCE_TRANSFER = "force_transfer"      # hand the call to staff during business hours
+RULE_ACTIONS = (RESTRICT_PRICING, NO_QUOTE, FORCE_TRANSFER)
+
+
+class RuleSet:
+    """
+    Restriction rules compiled into one token trie.
+
+    A rule file holds {"rules": [...]}; each rule is
+        {"id": "...", "action": "restrict_pricing" | "no_quote" | "force_transfer",
+         "terms": ["water damage", ...], "stores": ["lynnhaven"]}
+    where "stores" is optional (global when omitted) and may also be set
+    once at the top of a file for all of its rules.
+
+    Every term of every rule lives in the same trie, so a transcript is
+    scanned once no matter how many rules are loaded; store scoping is
+    applied only to the rules that actually matched.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules: List[Dict[str, Any]] = []
+        self.matcher = PhraseMatcher()
+        for rule in rules:
+            if rule.get("action") not in RULE_ACTIONS or not rule.get("id"):
+                logger.warning(f"Skipping invalid restriction rule: {rule}")
+                continue
+            index = len(self.rules)
+            stores = rule.get("stores")
+            self.rules.append({
+                "id": rule["id"],
+                "action": rule["action"],
+                "stores": frozenset(stores) if stores else None,
+            })
+            for term in rule.get("terms", []):
+                self.matcher.add(normalize_text(term), index)
+
+    def evaluate(self, tokens: Sequence[str], store_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Returns the matched rule IDs (in rule order) and which actions apply.
+        """
+        result = {"rule_ids": [], "actions": set()}
+        for index in sorted(self.matcher.matched_values(tokens)):
+            rule = self.rules[index]
+            if rule["stores"] is not None and store_id not in rule["stores"]:
+                continue
+            result["rule_ids"].append(rule["id"])
+            result["actions"].add(rule["action"])
+        return result
+
+
+def _load_rule_file(path: Path) -> List[Dict[str, Any]]:
+    with open(path, "r") as f:
+        if path.suffix == ".json":
+            data = json.load(f)
+        elif yaml is not None:
+            data = yaml.safe_load(f)
+        else:
+            logger.warning(f"PyYAML is not installed; skipping {path.name}")
+            return []
+
+    data = data or {}
+    file_stores = data.get("stores")
+    rules = []
+    for rule in data.get("rules", []):
+        if file_stores and "stores" not in rule:
+            rule = dict(rule, stores=file_stores)
+        rules.append(rule)
+    return rules
+
+
+def _rule_files(rules_dir: Path) -> List[Path]:
+    if not rules_dir.is_dir():
+        return []
+    return sorted(p for p in rules_dir.iterdir() if p.suffix in RULE_FILE_SUFFIXES)
+
+
+def load_rules(rules_dir: Path = RULES_DIR, skip_failed: bool = False) -> RuleSet:
+    """
+    Compiles every rule file. A file that fails to load raises, so a typo
+    can never silently drop its rules; with skip_failed it is logged and
+    left out instead.
+    """
+    rules = []
+    for path in _rule_files(rules_dir):
+        try:
+            rules.extend(_load_rule_file(path))
+        except Exception as e:
+            if not skip_failed:
+                raise ValueError(f"{path.name}: {e}") from e
+            logger.error(f"Failed to load restriction rules from {path.name}: {e}")
+    return RuleSet(rules)
+
+
+_rules: Optional[RuleSet] = None
+_watcher: Optional[FileWatcher] = None
+_rules_lock = threading.Lock()
+
+
+def get_rule_set() -> RuleSet:
+    """
+    Returns the compiled rules, recompiling after any rule file is added,
+    edited or removed. If any file fails to load, the previous rules stay
+    live (policy rules must not fail open); only at startup, with nothing
+    to keep, are the files that did load used on their own.
+    """
+    global _rules, _watcher
+    if _rules is None or _watcher.changed():
+        with _rules_lock:
+            # Watching the directory itself catches new and deleted files
+            _watcher = FileWatcher([RULES_DIR] + _rule_files(RULES_DIR))
+            try:
+                _rules = load_rules()
+            except Exception as e:
+                if _rules is not None:
+                    logger.error(f"Failed to reload restriction rules, keeping previous rules: {e}")
+                    return _rules
+                logger.error(f"Failed to load restriction rules: {e}")
+                _rules = load_rules(skip_failed=True)
+            bump_config_version()
+            logger.info(f"Loaded {len(_rules.rules)} restriction rules")
+    return _rules
+
+
+def evaluate_rules(tokens: Sequence[str], store_id: Optional[str] = None) -> Dict[str, Any]:
+    return get_rule_set().evaluate(tokens, store_id)
@@ -0,0 +1,87 @@
+from typing import Dict, Any, List, Optional
+from loguru import logger
+from core.store_resolver import get_store_by_id
+
+# How a store's staff lines are rung for a warm transfer
+SEQUENTIAL = "sequential"      # one line at a time, the next when it fails
+SIMULTANEOUS = "simultaneous"  # every line at once
+OVERFLOW = "overflow"          # every line at once, plus the sister store's after a delay
+POLICIES = (SEQUENTIAL, SIMULTANEOUS, OVERFLOW)
+
+# Seconds a staff leg rings before Twilio gives up on it
+DEFAULT_RING_TIMEOUT = 20
+DEFAULT_OVERFLOW_AFTER = 10
+
+
+def transfer_numbers(store: Dict[str, Any]) -> List[str]:
+    """
+    The store's staff lines: transfer_routing.numbers, else its transfer_number (or DID).
+    """
+    routing = store.get("transfer_routing") or {}
+    numbers = routing.get("numbers") or [store.get("transfer_number", store.get("did"))]
+    return [number for number in numbers if number]
+
+
+def get_transfer_plan(store: Dict[str, Any], primary_number: Optional[str] = None,
+                      target_store: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    The store's warm-transfer routing as ring stages.
+
+    Store config field (optional; without it the primary number rings alone):
+        "transfer_routing": {
+            "policy": "sequential" | "simultaneous" | "overflow",
+            "numbers": ["+17578370990", "+17578370991"],
+            "ring_timeout": 20,
+            "overflow_store": "glen_allen",
+            "overflow_after": 10
+        }
+
+    Each stage is {"targets": [{"number", "store_id"}], "start_after"}.
+    A stage starts once every earlier leg has failed, or start_after
+    seconds into the transfer when that comes first (None: only on failure).
+
+    target_store replaces all of that with one stage ringing every line of
+    that store, for when the caller's own store has no one free to answer.
+    """
+    routing = store.get("transfer_routing") or {}
+    store_id = store.get("store_id", "default")
+    if target_store is not None:
+        return {
+            "policy": SIMULTANEOUS,
+            "ring_timeout": int(routing.get("ring_timeout", DEFAULT_RING_TIMEOUT)),
+            "stages": [{
+                "targets": [{"number": number, "store_id": target_store["store_id"]}
+                            for number in transfer_numbers(target_store)],
+                "start_after": None,
+            }],
+        }
+
+    policy = routing.get("policy", SEQUENTIAL)
+    if policy not in POLICIES:
+        logger.warning(f"Unknown transfer policy {policy!r} for {store.get('name')}; ringing lines in sequence")
+        policy = SEQUENTIAL
+
+    numbers = routing.get("numbers") or ([primary_number] if primary_number else transfer_numbers(store))
+    own = [{"number": number, "store_id": store_id} for number in numbers]
+
+    if policy == SEQUENTIAL:
+        stages = [{"targets": [target], "start_after": None} for target in own]
+    else:
+        stages = [{"targets": own, "start_after": None}] if own else []
+
+    if policy == OVERFLOW:
+        sister = get_store_by_id(routing.get("overflow_store", ""))
+        if sister is None or sister.get("store_id") == store_id:
+            logger.warning(f"Overflow store {routing.get('overflow_store')!r} for {store.get('name')} not found; "
+                           f"ringing its own lines only")
+        else:
+            stages.append({
+                "targets": [{"number": number, "store_id": sister["store_id"]} for number in transfer_numbers(sister)],
+                "start_after": float(routing.get("overflow_after", DEFAULT_OVERFLOW_AFTER)),
+            })
+
+    return {
+        "policy": policy,
+        "ring_timeout": int(routing.get("ring_timeout", DEFAULT_RING_TIMEOUT)),
+        "stages": stages,
+    }
@@ -0,0 +1,149 @@
+from typing import Dict, Any
+from loguru import logger
+from core.state_machine import start_fsm, decision_for
+from core.intent_classifier import classify_intent
+from core.orchestrator import (
+    has_pending_offer, record_turn, confirm_pending_model, confirmed_model_slots, OFFER_BOOKING_SMS, OFFER_CONFIRM_MODEL
+)
+from actions.notification_service import enqueue_booking_sms
+from actions.transfer_service import initiate_warm_transfer
+from core.store_resolver import get_store_by_id
+from database.call_logs import log_call_event
+from utils.metrics import label_request
+
+
+def plan_turn(transcript: str, session: Dict[str, Any], store: Dict[str, Any], context=None,
+              previous: Dict[str, Any] = None, partial: bool = False) -> Dict[str, Any]:
+    """
+    The side-effect-free half of a caller turn: classification, SMS consent
+    and the FSM decision, worked out against the session as it stands.
+    Nothing is logged or saved, so streaming mode can plan every partial
+    transcript and keep only the last; a previous plan whose decision key
+    still matches is reused instead of deciding again. Plans for partial
+    transcripts (partial=True) leave the decision cache untouched.
+    """
+    # One pass over the transcript: intent, SMS consent and restriction flags.
+    # A "yes" only counts as consent if we actually offered the booking link.
+    classification = classify_intent(transcript)
+    is_consent = classification["is_consent"] and has_pending_offer(session, OFFER_BOOKING_SMS)
+
+    # "Yes" to "did you say the iPad Air 4?" fills the model slot and resumes pricing
+    slots = session
+    confirms_model = False
+    if classification["is_consent"] and has_pending_offer(session, OFFER_CONFIRM_MODEL):
+        confirmed = confirmed_model_slots(session)
+        if confirmed is not None:
+            classification = dict(classification, intent="pricing")
+            slots = dict(session, **confirmed)
+            confirms_model = True
+
+    booking_url = context.booking_link if context else store.get("booking_link")
+    decision = None
+    if not (is_consent and booking_url):
+        decision = decision_for(transcript, store, classification, slots, context,
+                                previous["decision"] if previous else None, partial)
+
+    return {
+        "transcript": transcript,
+        "classification": classification,
+        "is_consent": is_consent,
+        "confirms_model": confirms_model,
+        "booking_url": booking_url,
+        "decision": decision,
+    }
+
+
+async def run_turn(plan: Dict[str, Any], call_sid: str, from_number: str, session: Dict[str, Any],
+                   store: Dict[str, Any], context=None) -> Dict[str, Any]:
+    """
+    Carries out a planned turn: queues the booking SMS or starts the warm
+    transfer, logs the call events and saves the session. Returns the reply
+    as {"response_type", "payload"} for the TwiML or text renderer.
+    """
+    store_id = store.get("store_id", "default")
+    transcript = plan["transcript"]
+
+    if plan["confirms_model"]:
+        confirm_pending_model(session)
+
+    if plan["is_consent"]:
+        # Log consent event
+        log_call_event({
+            "call_sid": call_sid,
+            "store_id": store_id,
+            "intent": "sms_consent",
+            "response_type": "sms_processing",
+            "sms_sent": False
+        })
+
+        booking_url = plan["booking_url"]
+        if booking_url:
+            # Queue the SMS; delivery, retries and rate limits happen in the background
+            job_id = await enqueue_booking_sms(call_sid, from_number, booking_url, store)
+
+            # Log SMS queued (the worker logs sms_sent once Twilio accepts it)
+            log_call_event({
+                "call_sid": call_sid,
+                "store_id": store_id,
+                "intent": "sms_consent",
+                "response_type": "sms_queued",
+                "sms_sent": False
+            })
+            logger.info("Booking SMS queued as job {} for {}", job_id, store.get("name"))
+
+            await record_turn(session, {})
+            label_request(response_type="sms_sent")
+            return {"response_type": "sms_sent", "payload": {}}
+        else:
+            logger.warning("No booking URL found for store: {}. SMS NOT SENT.", store.get("name"))
+
+    logger.info("Captured transcript: {}", transcript)
+
+    # Pass to FSM and get result (include full store object and call_sid)
+    fsm_result = start_fsm(transcript, store, call_sid, plan["classification"], slots=session, context=context,
+                           planned=plan["decision"])
+    response_type = fsm_result.get("response_type")
+    label_request(response_type=response_type)
+    payload = fsm_result.get("response_payload", {})
+    intent = fsm_result.get("intent")
+
+    # Store object from FSM result
+    current_store = fsm_result.get("store", store)
+
+    offer = None
+
+    if response_type == "warm_transfer":
+        # Execute transfer; the customer-facing script is part of the template
+        store_phone = payload.get("store_phone_number")
+        briefing = payload.get("briefing_text")
+
+        logger.info("Initiating transfer to {} for store {}", store_phone, current_store.get("name"))
+
+        # Log transfer attempt
+        log_call_event({
+            "call_sid": call_sid,
+            "store_id": store_id,
+            "intent": intent,
+            "response_type": "warm_transfer_initiated",
+            "transfer_attempted": True
+        })
+
+        # A sister store when start_fsm found this store's staff unavailable
+        target_store = get_store_by_id(payload["transfer_store_id"]) if payload.get("transfer_store_id") else None
+
+        # Only queues the staff legs (each with its own watchdog); the outcome arrives on /webhooks/status/transfer
+        staff_call_sid = await initiate_warm_transfer(call_sid, store_phone, briefing, current_store, target_store)
+
+        if not staff_call_sid:
+            logger.warning("Transfer failed for {}. Offering booking link fallback.", current_store.get("name"))
+            response_type = "warm_transfer_failed"
+            offer = OFFER_BOOKING_SMS
+
+    elif response_type in ("offer_booking_sms", "staff_busy"):
+        offer = OFFER_BOOKING_SMS
+    elif response_type == "clarify_model":
+        offer = OFFER_CONFIRM_MODEL
+
+    await record_turn(session, fsm_result, offer)
+
+    return {"response_type": response_type, "payload": payload}
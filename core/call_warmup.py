@@ -0,0 +1,149 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from loguru import logger
+from business_logic.hours_validator import get_store_schedule, describe_next_opening
+from business_logic.pricing_engine import get_pricing_catalog, PricingView
+from business_logic.restriction_rules import get_rule_set
+from core.entity_extractor import get_entity_extractor
+from core.intent_classifier import get_keyword_matcher
+from utils.metrics import record_stage
+from utils.concurrency import run_blocking
+from utils.twilio_utils import get_twilio_credentials, get_async_twilio_client
+
+# Tuning (overridable via environment)
+WARMUP_ENABLED = os.getenv("CALL_WARMUP", "true").lower() == "true"
+CONTEXT_TTL_SECONDS = int(os.getenv("CALL_CONTEXT_TTL_SECONDS", "3600"))
+CONTEXT_MAX_ENTRIES = int(os.getenv("CALL_CONTEXT_MAX_ENTRIES", "10000"))
+# Longest a gather waits on a warmup still in flight before doing the work itself
+WARMUP_WAIT_SECONDS = float(os.getenv("CALL_WARMUP_WAIT_SECONDS", "0.25"))
+
+
+class CallContext:
+    """
+    Everything the FSM needs about the call's store, prepared once per call:
+    the store, its compiled schedule, a pricing view and the booking link.
+    The open/closed state is re-derived only when the schedule's next
+    transition passes, so a long call still sees the store close.
+    """
+
+    def __init__(self, store: Dict[str, Any]):
+        self.store = store
+        self.store_id = store.get("store_id", "default")
+        self.booking_link: Optional[str] = store.get("booking_link")
+        self.schedule = get_store_schedule(store)
+        self.pricing: PricingView = get_pricing_catalog().store_view(self.store_id)
+        self.twilio_ready = False
+        self._opening_text: Optional[str] = None
+        self._opening_until = 0.0
+
+    def is_open(self, now: Optional[float] = None) -> bool:
+        return self.schedule.is_open(now)
+
+    def describe_next_opening(self, now: Optional[float] = None) -> Optional[str]:
+        now = time.time() if now is None else now
+        if now >= self._opening_until:
+            self._opening_text = describe_next_opening(self.store, now)
+            # "tomorrow at 10 AM" changes wording at midnight too; recheck hourly at most
+            self._opening_until = min(self.schedule.valid_until(now), now + 3600)
+        return self._opening_text
+
+
+def build_call_context(store: Dict[str, Any]) -> CallContext:
+    """
+    Blocking: resolves everything up front, including the per-process
+    indexes a config reload may have invalidated, so the first gather of
+    the call finds them built.
+    """
+    get_keyword_matcher()
+    get_rule_set()
+    get_entity_extractor()
+
+    context = CallContext(store)
+    context.is_open()
+    context.describe_next_opening()
+    return context
+
+
+_contexts: "OrderedDict[str, tuple]" = OrderedDict()
+_contexts_lock = threading.Lock()
+
+
+def _remember(call_sid: str, entry):
+    with _contexts_lock:
+        _contexts[call_sid] = (time.monotonic() + CONTEXT_TTL_SECONDS, entry)
+        _contexts.move_to_end(call_sid)
+        while len(_contexts) > CONTEXT_MAX_ENTRIES:
+            _contexts.popitem(last=False)
+
+
+async def _warm(call_sid: str, store: Dict[str, Any]) -> Optional[CallContext]:
+    start = time.perf_counter()
+    try:
+        context = await run_blocking(build_call_context, store)
+        # The async Twilio client is bound to this loop, so it is built here;
+        # only for stores that have credentials configured
+        creds = get_twilio_credentials(store)
+        if creds.get("account_sid") and creds.get("auth_token"):
+            context.twilio_ready = get_async_twilio_client(store) is not None
+        return context
+    except Exception as e:
+        logger.error(f"Call warmup failed for {call_sid}: {e}")
+        return None
+    finally:
+        record_stage("call_warmup", time.perf_counter() - start)
+
+
+def start_call_warmup(call_sid: str, store: Dict[str, Any]):
+    """
+    Builds the call's context in the background while the greeting plays.
+    Must be called from the event loop.
+    """
+    if not WARMUP_ENABLED or not call_sid:
+        return
+    _remember(call_sid, asyncio.get_running_loop().create_task(_warm(call_sid, store)))
+
+
+async def get_call_context(call_sid: str) -> Optional[CallContext]:
+    """
+    The call's warmed-up context, or None if this worker never saw the
+    call start (or the warmup failed or is still running after
+    WARMUP_WAIT_SECONDS).
+    """
+    with _contexts_lock:
+        entry = _contexts.get(call_sid)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del _contexts[call_sid]
+            return None
+        _contexts.move_to_end(call_sid)
+
+    if isinstance(value, CallContext):
+        return value
+    if not value.done():
+        try:
+            await asyncio.wait_for(asyncio.shield(value), WARMUP_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.debug("Call warmup for {} still running; handling the turn without it", call_sid)
+            return None
+    context = None if value.cancelled() else value.result()
+    with _contexts_lock:
+        if call_sid in _contexts:
+            if context is None:
+                del _contexts[call_sid]
+            else:
+                # Later turns skip the task indirection
+                _contexts[call_sid] = (_contexts[call_sid][0], context)
+    return context
+
+
+def drop_call_context(call_sid: str):
+    with _contexts_lock:
+        entry = _contexts.pop(call_sid, None)
+    if entry is not None and isinstance(entry[1], asyncio.Task) and not entry[1].done():
+        entry[1].cancel()
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from business_logic.restriction_rules import get_rule_set
+from core.entity_extractor import get_entity_extractor
+from utils.config_watcher import get_config_version
+from utils.metrics import register_collector
+
+# Tuning (overridable via environment)
+CACHE_ENABLED = os.getenv("FSM_DECISION_CACHE", "true").lower() == "true"
+CACHE_TTL_SECONDS = float(os.getenv("FSM_DECISION_CACHE_TTL_SECONDS", "600"))
+CACHE_MAX_ENTRIES = int(os.getenv("FSM_DECISION_CACHE_MAX_ENTRIES", "20000"))
+
+
+def current_config_version() -> int:
+    """
+    The config version after polling every source a decision reads: rules,
+    entity aliases and pricing (through the extractor). Keywords and stores
+    are polled by classify_intent and the store lookup earlier in the turn.
+    """
+    get_rule_set()
+    get_entity_extractor()
+    return get_config_version()
+
+
+def decision_key(classification: Dict[str, Any], store_id: str, open_now: bool,
+                 slots: Optional[Dict[str, Any]], version: int) -> Tuple:
+    """
+    Everything the FSM's decision depends on. The token signature covers
+    the rules, entities and pricing; the intent is part of the key because
+    a confirmed model turns a plain "yes" into a pricing turn.
+    """
+    remembered = (slots.get("model"), slots.get("issue"), slots.get("category")) if slots else (None, None, None)
+    return (" ".join(classification["tokens"]), classification["intent"], remembered, store_id, open_now, version)
+
+
+class DecisionCache:
+    """
+    Bounded LRU of FSM decisions with per-entry expiry. Entries from an
+    older config version are dropped as soon as a lookup sees the new one.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, tuple]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _admit(self, version: int) -> bool:
+        """
+        Moves the cache to a newer config version (dropping every entry);
+        False for a key built against an older version than the cache's.
+        """
+        if self._version is None or version > self._version:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self._version = version
+        return version == self._version
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key) if self._admit(key[-1]) else None
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def peek(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """
+        The cached decision for key, if any, without counting a hit or miss
+        or refreshing its place in the LRU.
+        """
+        with self._lock:
+            entry = self._entries.get(key) if self._admit(key[-1]) else None
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return entry[1]
+
+    def put(self, key: Tuple, decision: Dict[str, Any]):
+        with self._lock:
+            if not self._admit(key[-1]):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, decision)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            entries = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            **stats,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hit_rate": round(stats["hits"] / lookups, 4) if lookups else None,
+        }
+
+
+_cache = DecisionCache()
+
+
+def get_decision_cache() -> Optional[DecisionCache]:
+    return _cache if CACHE_ENABLED else None
+
+
+def _render_metrics() -> List[str]:
+    summary = _cache.summary()
+    lines = []
+    for name, help_text in (
+        ("hits", "FSM decisions served from the cache."),
+        ("misses", "FSM decisions computed because the cache had none."),
+        ("evictions", "FSM decisions evicted to stay within the size bound."),
+    ):
+        lines += [
+            f"# HELP fsm_decision_cache_{name}_total {help_text}",
+            f"# TYPE fsm_decision_cache_{name}_total counter",
+            f"fsm_decision_cache_{name}_total {summary[name]}",
+        ]
+    lines += [
+        "# HELP fsm_decision_cache_entries FSM decisions currently cached.",
+        "# TYPE fsm_decision_cache_entries gauge",
+        f"fsm_decision_cache_entries {summary['entries']}",
+    ]
+    return lines
+
+
+register_collector(_render_metrics)
@@ -0,0 +1,174 @@
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+from loguru import logger
+from business_logic.pricing_engine import get_pricing_catalog
+from core.model_matcher import FuzzyModelIndex, phonetic_tokens, number_homophones, CLARIFY_THRESHOLD, HOMOPHONE_CONFIDENCE
+from utils.config_watcher import FileWatcher, bump_config_version, get_config_version
+from utils.text_utils import PhraseMatcher, normalize_text
+
+# Paths
+BASE_DIR = Path(__file__).resolve().parents[1]
+ENTITIES_FILE = BASE_DIR / "data" / "config" / "entities.json"
+
+DEFAULT_CATEGORY = "phone"
+
+# Brand words callers often drop ("thirteen pro max" for "iPhone 13 Pro Max")
+DROPPABLE_PREFIXES = {"iphone"}
+
+
+class EntityExtractor:
+    """
+    Finds device model and issue slots in a transcript.
+
+    Model phrases are generated from the pricing catalog's model names plus
+    the spoken-form aliases in data/config/entities.json, and compiled into
+    token tries. Number words in the transcript are normalized first, so
+    "ipad air four" and "iPad Air 4" match the same entry.
+
+    When no phrase matches exactly, the same phrases are searched fuzzily
+    (see core.model_matcher) and the model comes back with a confidence
+    score; a low score is returned as a candidate for the FSM to confirm
+    with the caller rather than as the model itself.
+    """
+
+    def __init__(self, catalog_models: Dict[str, List[str]], entities: dict):
+        self.models = PhraseMatcher()
+        self.issues = PhraseMatcher()
+        self.issue_categories: Dict[str, str] = entities.get("issue_categories", {})
+
+        phrases = []
+        model_aliases = entities.get("model_aliases", {})
+        for category, names in catalog_models.items():
+            for name in names:
+                target = (category, name)
+                tokens = normalize_text(name)
+                phrases.append((tokens, target))
+                if tokens[0] in DROPPABLE_PREFIXES and len(tokens) >= 3:
+                    phrases.append((tokens[1:], target))
+                for alias in model_aliases.get(name, []):
+                    phrases.append((normalize_text(alias), target))
+
+        for tokens, target in phrases:
+            self.models.add(tokens, target)
+        self.fuzzy_models = FuzzyModelIndex(phrases)
+
+        for issue, phrases in entities.get("issue_aliases", {}).items():
+            self.issues.add(normalize_text(issue), issue)
+            for phrase in phrases:
+                self.issues.add(normalize_text(phrase), issue)
+
+    @staticmethod
+    def _best(matches) -> Optional[tuple]:
+        # Longest span wins; on a tie the earliest mention does
+        best = None
+        for start, end, values in matches:
+            if best is None or end - start > best[1] - best[0]:
+                best = (start, end, values[0])
+        return best
+
+    def _fuzzy_model(self, tokens: List[str]) -> Optional[tuple]:
+        """
+        The fuzzy model match, also trying number homophones after model
+        words ("ipad air for" -> "ipad air 4"). A match that needs one is
+        capped below CLARIFY_THRESHOLD: "for" or "to" after "ipad" is far
+        more often just a word, so the caller is asked to confirm it.
+        """
+        best = self.fuzzy_models.best_match(tokens)
+        heard, mapped = number_homophones(tokens, self.fuzzy_models.vocabulary)
+        if mapped:
+            homophone_match = self.fuzzy_models.best_match(heard)
+            if homophone_match and any(homophone_match[0] <= i < homophone_match[1] for i in mapped):
+                start, end, target, confidence = homophone_match
+                homophone_match = (start, end, target, min(confidence, HOMOPHONE_CONFIDENCE))
+            if homophone_match and (best is None or homophone_match[3] > best[3]):
+                best = homophone_match
+        return best
+
+    def extract(self, transcript: str, tokens: Optional[Sequence[str]] = None) -> dict:
+        """
+        Returns the model, category and issue slots (None when not mentioned),
+        the model's match confidence, and a low-confidence model_candidate
+        to confirm with the caller.
+        """
+        if tokens is None:
+            tokens = normalize_text(transcript)
+        tokens = phonetic_tokens(tokens)
+
+        model = None
+        category = None
+        issue = None
+        confidence = None
+        candidate = None
+
+        issue_match = self._best(self.issues.find_longest(tokens))
+        model_match = self._best(self.models.find_longest(tokens))
+        if model_match:
+            category, model = model_match[2]
+            confidence = 1.0
+        else:
+            # Keep the issue words out of the fuzzy model search
+            remaining = list(tokens)
+            if issue_match:
+                remaining[issue_match[0]:issue_match[1]] = [""] * (issue_match[1] - issue_match[0])
+            fuzzy_match = self._fuzzy_model(remaining)
+            if fuzzy_match:
+                (fuzzy_category, fuzzy_model), confidence = fuzzy_match[2], fuzzy_match[3]
+                if confidence >= CLARIFY_THRESHOLD:
+                    category, model = fuzzy_category, fuzzy_model
+                else:
+                    candidate = {"model": fuzzy_model, "category": fuzzy_category}
+
+        if issue_match:
+            issue = issue_match[2]
+            if category is None:
+                category = self.issue_categories.get(issue)
+
+        return {
+            "model": model,
+            "category": category or DEFAULT_CATEGORY,
+            "issue": issue,
+            "model_confidence": confidence,
+            "model_candidate": candidate,
+        }
+
+
+_extractor: Optional[EntityExtractor] = None
+_extractor_version = -1
+_entities_watcher = FileWatcher([ENTITIES_FILE])
+_extractor_lock = threading.Lock()
+
+
+def _load_entities() -> dict:
+    if not ENTITIES_FILE.exists():
+        return {}
+    with open(ENTITIES_FILE, "r") as f:
+        return json.load(f)
+
+
+def get_entity_extractor() -> EntityExtractor:
+    """
+    Returns the shared extractor, rebuilding it after pricing or alias changes.
+    """
+    global _extractor, _extractor_version
+    catalog_models = get_pricing_catalog().models()  # also picks up pricing file changes
+    if _entities_watcher.changed():
+        bump_config_version()
+
+    version = get_config_version()
+    if _extractor is None or version != _extractor_version:
+        with _extractor_lock:
+            if _extractor is None or version != _extractor_version:
+                try:
+                    _extractor = EntityExtractor(catalog_models, _load_entities())
+                except Exception as e:
+                    logger.error(f"Failed to build entity extractor: {e}")
+                    if _extractor is None:
+                        _extractor = EntityExtractor(catalog_models, {})
+                _extractor_version = version
+    return _extractor
+
+
+def extract_entities(transcript: str, tokens: Optional[Sequence[str]] = None) -> dict:
+    return get_entity_extractor().extract(transcript, tokens)
@@ -1,36 +1,102 @@
-import re
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+from loguru import logger
+from utils.config_watcher import FileWatcher, bump_config_version
+from utils.text_utils import PhraseMatcher, normalize_text
 
-def classify_intent(transcript: str) -> dict:
+# Paths
+BASE_DIR = Path(__file__).resolve().parents[1]
+KEYWORDS_FILE = BASE_DIR / "data" / "config" / "intent_keywords.json"
+
+
+class KeywordMatcher:
     """
-    Classifies the caller's intent and checks for computer repair requests using rule-based logic.
+    All intent keywords and flag phrases compiled into one token trie.
+
+    Matching is on whole tokens, so "pc" no longer fires inside "specific"
+    and "ok" no longer fires inside "book". Each intent scores its weight
+    per matched keyword; ties go to the intent listed first in the config.
     """
-    transcript_lower = transcript.lower()
-
-    # Rule-based intent detection
-    intent = "unknown"
-    
-    pricing_keywords = ["price", "cost", "how much", "screen", "battery", "repair"]
-    booking_keywords = ["appointment", "book", "schedule", "come in", "visit"]
-    transfer_keywords = ["talk to", "representative", "manager", "technician", "person", "human"]
-    
-    # Check for pricing
-    if any(word in transcript_lower for word in pricing_keywords):
-        intent = "pricing"
-    
-    # Check for booking (can override pricing if specific booking words are used)
-    if any(word in transcript_lower for word in booking_keywords):
-        intent = "booking"
-
-    # Check for transfer
-    if any(word in transcript_lower for word in transfer_keywords):
-        intent = "transfer"
-
-    # Restriction detection (computer repairs)
-    computer_keywords = ["computer", "laptop", "macbook", "pc", "desktop", "surface pro"]
-    is_computer_repair = any(word in transcript_lower for word in computer_keywords)
+
+    def __init__(self, config: dict):
+        self.matcher = PhraseMatcher()
+        self.weights: Dict[str, float] = {}
+        self.priority: List[str] = []
+        self.flags: List[str] = list(config.get("flags", {}).keys())
+
+        for intent, spec in config.get("intents", {}).items():
+            self.priority.append(intent)
+            self.weights[intent] = spec.get("weight", 1)
+            for keyword in spec.get("keywords", []):
+                self.matcher.add(normalize_text(keyword), ("intent", intent))
+
+        for flag, keywords in config.get("flags", {}).items():
+            for keyword in keywords:
+                self.matcher.add(normalize_text(keyword), ("flag", flag))
+
+    def analyze(self, tokens: Sequence[str]) -> dict:
+        scores = {intent: 0 for intent in self.priority}
+        flags = {flag: False for flag in self.flags}
+        matched: List[str] = []
+
+        for start, end, (kind, name) in self.matcher.find_all(tokens):
+            matched.append(" ".join(tokens[start:end]))
+            if kind == "intent":
+                scores[name] += self.weights[name]
+            else:
+                flags[name] = True
+
+        intent = "unknown"
+        best = 0
+        for candidate in self.priority:
+            if scores[candidate] > best:
+                intent, best = candidate, scores[candidate]
+
+        return {"intent": intent, "scores": scores, "flags": flags, "matched_keywords": matched}
+
+
+_matcher: Optional[KeywordMatcher] = None
+_watcher = FileWatcher([KEYWORDS_FILE])
+_matcher_lock = threading.Lock()
+
+
+def get_keyword_matcher() -> KeywordMatcher:
+    """
+    Returns the compiled keyword matcher, recompiling it when the config changes.
+    """
+    global _matcher
+    if _matcher is None or _watcher.changed():
+        with _matcher_lock:
+            try:
+                with open(KEYWORDS_FILE, "r") as f:
+                    _matcher = KeywordMatcher(json.load(f))
+                bump_config_version()
+            except Exception as e:
+                logger.error(f"Failed to load {KEYWORDS_FILE.name}: {e}")
+                if _matcher is None:
+                    _matcher = KeywordMatcher({})
+    return _matcher
+
+
+def classify_intent(transcript: str, tokens: Optional[Sequence[str]] = None) -> dict:
+    """
+    Classifies the caller's intent and flags consent in a single pass over
+    the transcript tokens. Restricted devices and forced transfers are
+    policy, evaluated separately by business_logic.restriction_rules.
+    """
+    if tokens is None:
+        tokens = normalize_text(transcript)
+
+    analysis = get_keyword_matcher().analyze(tokens)
+    flags = analysis["flags"]
 
     return {
-        "intent": intent,
-        "is_computer_repair": is_computer_repair,
+        "intent": analysis["intent"],
+        "intent_scores": analysis["scores"],
+        "is_consent": flags.get("consent", False),
+        "matched_keywords": analysis["matched_keywords"],
+        "tokens": list(tokens),
         "original_transcript": transcript
     }
@@ -0,0 +1,222 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from utils.text_utils import normalize_tokens
+
+# Tuning (overridable via environment)
+# Below MATCH_THRESHOLD a fuzzy candidate is ignored; below CLARIFY_THRESHOLD
+# it is only used to ask the caller whether that is the model they meant.
+MATCH_THRESHOLD = float(os.getenv("MODEL_MATCH_THRESHOLD", "0.6"))
+CLARIFY_THRESHOLD = float(os.getenv("MODEL_CLARIFY_THRESHOLD", "0.85"))
+CACHE_SIZE = int(os.getenv("MODEL_MATCH_CACHE_SIZE", "16384"))
+
+# Candidates taken from the trigram index before edit-distance ranking
+RETRIEVAL_TRIGRAMS = 4
+RANKED_CANDIDATES = 8
+
+# Speech recognition homophones. Letters are always safe to map. Number
+# homophones are also ordinary words ("my ipad for my son"), so they are only
+# tried in the fuzzy search, right after a model word ("air for" -> "air 4"),
+# and a match that needs one is always confirmed with the caller.
+HOMOPHONE_WORDS = {"eye": "i", "aye": "i"}
+HOMOPHONE_NUMBERS = {"for": "4", "fore": "4", "to": "2", "too": "2", "ate": "8"}
+# Highest confidence a match relying on a number homophone can get
+HOMOPHONE_CONFIDENCE = CLARIFY_THRESHOLD - 0.01
+
+# Words that never start or end a model mention
+STOPWORDS = {
+    "a", "an", "the", "my", "your", "our", "i", "im", "me", "it", "its", "is", "are", "was", "be",
+    "for", "to", "of", "on", "in", "at", "with", "and", "or", "but", "so", "do", "does", "did",
+    "how", "much", "what", "whats", "can", "could", "would", "you", "guys", "please", "hi", "hey",
+    "yeah", "yes", "no", "got", "have", "has", "need", "want", "fix", "fixed", "repair", "replace",
+    "replacement", "price", "cost", "quote", "broken", "cracked", "this", "that", "one", "phone",
+    "tablet", "console", "screen", "battery", "charging", "port", "s", "t", "m", "ll", "ve", "d",
+}
+
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def phonetic_tokens(tokens: Sequence[str]) -> List[str]:
+    """
+    Maps spoken letter homophones onto catalog spellings, then rejoins split
+    brand names: "eye pad air" -> "ipad air".
+    """
+    if not any(token in HOMOPHONE_WORDS for token in tokens):
+        return list(tokens)
+    return normalize_tokens([HOMOPHONE_WORDS.get(token, token) for token in tokens])
+
+
+def number_homophones(tokens: Sequence[str], vocabulary: Set[str]) -> Tuple[List[str], Set[int]]:
+    """
+    Reads number homophones right after a model word as digits, token for
+    token: "ipad air for" -> "ipad air 4". Returns the tokens and the
+    positions that were changed (empty if none were).
+    """
+    out = list(tokens)
+    mapped = set()
+    for i in range(1, len(out)):
+        previous = out[i - 1]
+        if out[i] in HOMOPHONE_NUMBERS and previous in vocabulary and not previous.isdigit():
+            out[i] = HOMOPHONE_NUMBERS[out[i]]
+            mapped.add(i)
+    return out, mapped
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"^{key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """
+    Levenshtein distance. With a limit, gives up as soon as the distance is
+    known to exceed it and returns limit + 1.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def similarity(query: str, candidate: str, floor: float = 0.0) -> float:
+    """
+    1 - normalized edit distance, halved when the model numbers disagree
+    ("iphone 13" vs "iphone 14" is one character but a different device).
+    Scores below floor may be returned as any value below floor.
+    """
+    longest = max(len(query), len(candidate))
+    distance = edit_distance(query, candidate, int((1.0 - floor) * longest))
+    score = 1.0 - distance / longest
+    if _DIGITS_RE.findall(query) != _DIGITS_RE.findall(candidate):
+        score *= 0.5
+    return score
+
+
+class FuzzyModelIndex:
+    """
+    Approximate lookup over model phrases for garbled speech transcripts.
+
+    Each phrase is keyed by its tokens with spaces removed ("iphone13pro"),
+    so word splits and joins do not matter. Candidates come from an inverted
+    index of character trigrams (the query's rarest trigrams bound the work
+    regardless of catalog size) and are ranked by edit distance. Results are
+    memoized per fragment in a bounded LRU.
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[Sequence[str], Any]], cache_size: int = CACHE_SIZE):
+        self.keys: List[str] = []
+        self.targets: List[Any] = []
+        self.trigrams: List[Set[str]] = []
+        # (model numbers, trigram) -> phrase indexes
+        self.postings: Dict[Tuple[Tuple[str, ...], str], List[int]] = {}
+        self.vocabulary: Set[str] = set()
+        self.max_tokens = 1
+        seen = set()
+
+        for tokens, target in phrases:
+            key = "".join(tokens)
+            if not key or (key, target) in seen:
+                continue
+            seen.add((key, target))
+            index = len(self.keys)
+            self.keys.append(key)
+            self.targets.append(target)
+            grams = _trigrams(key)
+            self.trigrams.append(grams)
+            digits = tuple(_DIGITS_RE.findall(key))
+            for gram in grams:
+                self.postings.setdefault((digits, gram), []).append(index)
+            self.vocabulary.update(tokens)
+            self.max_tokens = max(self.max_tokens, len(tokens))
+
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Optional[Tuple[Any, float]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _search(self, key: str) -> Optional[Tuple[Any, float]]:
+        # A phrase with different model numbers scores at most 0.5, below
+        # MATCH_THRESHOLD, so only phrases with the same numbers are searched
+        digits = tuple(_DIGITS_RE.findall(key))
+        grams = _trigrams(key)
+        known = sorted(
+            (self.postings[(digits, g)] for g in grams if (digits, g) in self.postings),
+            key=len,
+        )
+        if not known:
+            return None
+
+        candidates = set()
+        for posting in known[:RETRIEVAL_TRIGRAMS]:
+            candidates.update(posting)
+
+        # Dice coefficient on trigrams narrows the field before edit distance
+        overlap = sorted(
+            candidates,
+            key=lambda i: -2 * len(grams & self.trigrams[i]) / (len(grams) + len(self.trigrams[i])),
+        )[:RANKED_CANDIDATES]
+
+        best = None
+        for i in overlap:
+            # Only a better score than the best so far (and the threshold) matters
+            floor = max(MATCH_THRESHOLD, best[1]) if best else MATCH_THRESHOLD
+            score = similarity(key, self.keys[i], floor)
+            if score >= floor and (best is None or score > best[1]):
+                best = (self.targets[i], score)
+                if score == 1.0:
+                    break
+        return best
+
+    def lookup(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        Best (target, confidence) for a spaceless fragment key, or None.
+        """
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        result = self._search(key)
+
+        with self._cache_lock:
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def best_match(self, tokens: Sequence[str]) -> Optional[Tuple[int, int, Any, float]]:
+        """
+        Scores every plausible model mention (token windows that neither
+        start nor end with a stopword) and returns the best as
+        (start, end, target, confidence), or None below MATCH_THRESHOLD.
+        Empty tokens mark spans already claimed by another slot.
+        """
+        best = None
+        n = len(tokens)
+        for start in range(n):
+            if not tokens[start] or tokens[start] in STOPWORDS:
+                continue
+            for end in range(start + 1, min(n, start + self.max_tokens + 1) + 1):
+                if not tokens[end - 1]:
+                    break
+                if tokens[end - 1] in STOPWORDS:
+                    continue
+                result = self.lookup("".join(tokens[start:end]))
+                if result and (best is None or result[1] > best[3]):
+                    best = (start, end, result[0], result[1])
+        if best is None or best[3] < MATCH_THRESHOLD:
+            return None
+        return best
+
+    def cache_info(self) -> Dict[str, int]:
+        return {"size": len(self._cache), "max_size": self.cache_size}
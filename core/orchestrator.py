@@ -0,0 +1,215 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from loguru import logger
+from core.store_resolver import resolve_store_by_did, get_store_by_id, DEFAULT_STORE
+
+# Session tuning (overridable via environment)
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_BACKEND_URL = os.getenv("SESSION_BACKEND_URL")  # e.g. redis://localhost:6379/0
+
+# Offers the caller can accept with a plain "yes" on the next turn
+OFFER_BOOKING_SMS = "booking_sms"
+OFFER_CONFIRM_MODEL = "confirm_model"
+
+
+class MemorySessionBackend:
+    """
+    Per-process session storage: a bounded LRU with per-entry expiry.
+    Async like the shared backend, though nothing here ever waits.
+    """
+
+    def __init__(self, max_entries: int = SESSION_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(value)
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisSessionBackend:
+    """
+    Shared session storage so every worker sees the same call state.
+    Requires the optional `redis` package; uses its asyncio client so a
+    session round trip never blocks the event loop.
+    """
+
+    def __init__(self, url: str, prefix: str = "call_session:"):
+        import redis.asyncio  # optional dependency
+        self._client = redis.asyncio.Redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self._client.get(self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: int):
+        await self._client.set(self.prefix + key, json.dumps(value), ex=ttl)
+
+    async def delete(self, key: str):
+        await self._client.delete(self.prefix + key)
+
+
+def _create_backend():
+    if SESSION_BACKEND_URL:
+        try:
+            return RedisSessionBackend(SESSION_BACKEND_URL)
+        except Exception as e:
+            logger.error(f"Session backend {SESSION_BACKEND_URL} unavailable, using in-memory sessions: {e}")
+    return MemorySessionBackend()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_session_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend()
+    return _backend
+
+
+def new_session(call_sid: str, store: Dict[str, Any]) -> Dict[str, Any]:
+    now = time.time()
+    return {
+        "call_sid": call_sid,
+        "store_id": store.get("store_id", "default"),
+        "model": None,
+        "issue": None,
+        "category": None,
+        "last_offer": None,
+        "pending_model": None,
+        "turns": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+async def get_session(call_sid: str) -> Optional[Dict[str, Any]]:
+    if not call_sid:
+        return None
+    return await get_session_backend().get(call_sid)
+
+
+async def save_session(session: Dict[str, Any]):
+    if not session.get("call_sid"):
+        return
+    session["updated_at"] = time.time()
+    await get_session_backend().set(session["call_sid"], session, SESSION_TTL_SECONDS)
+
+
+async def start_session(call_sid: str, store: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Creates (or resets) the session for a new inbound call.
+    """
+    session = new_session(call_sid, store)
+    await save_session(session)
+    return session
+
+
+async def load_call_context(call_sid: str, called_number: str, store: Optional[Dict[str, Any]] = None):
+    """
+    Returns (session, store) for a gather turn. The store is only resolved
+    when the caller has not already got it (from the call's warmed-up
+    context), and only from the DID when this worker has no session yet.
+    """
+    session = await get_session(call_sid)
+    if store is None and session:
+        store = get_store_by_id(session["store_id"])
+        if store is None and session["store_id"] == DEFAULT_STORE["store_id"]:
+            store = DEFAULT_STORE
+    if store is None:
+        store = resolve_store_by_did(called_number)
+    if session is None:
+        session = new_session(call_sid, store)
+    return session, store
+
+
+def has_pending_offer(session: Dict[str, Any], offer: str) -> bool:
+    return session.get("last_offer") == offer
+
+
+async def record_turn(session: Dict[str, Any], fsm_result: Dict[str, Any], offer: Optional[str] = None):
+    """
+    Carries detected slots forward and remembers what was offered this turn.
+    """
+    entities = fsm_result.get("entities") or {}
+    for slot in ("model", "issue", "category"):
+        if entities.get(slot):
+            session[slot] = entities[slot]
+    session["last_offer"] = offer
+    # A rough model match waits here until the caller confirms it
+    session["pending_model"] = fsm_result.get("model_candidate") if offer == OFFER_CONFIRM_MODEL else None
+    session["turns"] = session.get("turns", 0) + 1
+    await save_session(session)
+
+
+def confirmed_model_slots(session: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The slots confirm_pending_model would set, without touching the session;
+    None when no model is waiting for confirmation.
+    """
+    pending = session.get("pending_model")
+    if not pending:
+        return None
+    return {
+        "model": pending["model"],
+        "category": pending.get("category") or session.get("category"),
+        "pending_model": None,
+    }
+
+
+def confirm_pending_model(session: Dict[str, Any]) -> bool:
+    """
+    Promotes the model the caller just confirmed into the call's slots.
+    """
+    slots = confirmed_model_slots(session)
+    if slots is None:
+        return False
+    session.update(slots)
+    return True
+
+
+async def set_pending_offer(call_sid: str, offer: Optional[str]):
+    """
+    Marks an offer made outside a gather turn (e.g. after a failed transfer).
+    """
+    session = await get_session(call_sid)
+    if session:
+        session["last_offer"] = offer
+        await save_session(session)
+
+
+async def end_session(call_sid: str):
+    await get_session_backend().delete(call_sid)
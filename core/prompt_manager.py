@@ -27,14 +27,19 @@ def get_pricing_restricted() -> str:
         "Please visit the store or call us during business hours for assistance, and we'll take great care of you."
     )
 
-def get_booking_offer() -> str:
+def get_booking_offer(next_opening: str = None) -> str:
     """SOP: Always secure an appointment, confidence-building."""
+    closed = f"Our store is currently closed until {next_opening}, " if next_opening else "Our store is currently closed, "
     return (
-        "We can definitely take care of that for you! Our store is currently closed, "
+        "We can definitely take care of that for you! " + closed +
         "but to ensure a smooth and quick repair, I can send you a link to book an appointment by text right now. "
         "What do you think, should I send that over?"
     )
 
+def get_model_clarification(model: str) -> str:
+    """SOP: Confirm details before quoting so the estimate is right."""
+    return f"Just to make sure I quote the right repair, did you say the {model}?"
+
 def get_transfer_justification() -> str:
     """SOP: Frame it as quality control/trust building."""
     return (
@@ -57,6 +62,13 @@ def get_transfer_message() -> str:
 def get_transfer_failed() -> str:
     return "I'm sorry, our team is currently busy and unable to take the call. Would you like me to send you a booking link instead?"
 
+def get_staff_busy_offer() -> str:
+    """SOP: Don't leave the customer holding for a team that can't pick up; secure the appointment instead."""
+    return (
+        "Our technicians are all with other customers at the moment, so rather than keep you waiting on hold, "
+        "I can text you a link to book a time that works for you. Would you like me to send that over?"
+    )
+
 def get_sms_sent_confirmation() -> str:
     return "I've sent the booking link to your phone. Is there anything else I can help with?"
 
@@ -66,6 +78,9 @@ def get_fallback_message() -> str:
 def get_repeat_prompt() -> str:
     return "I'm sorry, I didn't catch that. Could you please repeat what you said?"
 
+def get_overflow_briefing(store_location: str, briefing: str) -> str:
+    return f"This is an overflow call from our {store_location} store. {briefing}"
+
 def get_tech_briefing(device: str, issue: str, reason: str) -> str:
     return (
         f"Hey, this is the AI assistant. I've got a customer on the line. "
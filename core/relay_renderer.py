@@ -0,0 +1,49 @@
+import json
+from typing import Callable, Dict
+from core import prompt_manager
+
+# Spoken text per reply type; the same prompts the TwiML templates <Say>
+TEXTS: Dict[str, Callable[[dict], str]] = {
+    "repeat": lambda p: prompt_manager.get_repeat_prompt(),
+    "sms_sent": lambda p: prompt_manager.get_sms_sent_confirmation(),
+    "price_found": lambda p: prompt_manager.get_pricing_found(p.get("price")),
+    "warm_transfer": lambda p: " ".join((
+        prompt_manager.get_transfer_justification(),
+        prompt_manager.get_transfer_context_assurance(),
+        prompt_manager.get_transfer_instruction(),
+        prompt_manager.get_transfer_connecting(),
+    )),
+    "offer_booking_sms": lambda p: prompt_manager.get_booking_offer(p.get("next_opening")),
+    "staff_busy": lambda p: prompt_manager.get_staff_busy_offer(),
+    "clarify_model": lambda p: prompt_manager.get_model_clarification(p.get("model")),
+    "price_not_found": lambda p: prompt_manager.get_pricing_not_found(),
+    "pricing_restricted": lambda p: prompt_manager.get_pricing_restricted(),
+    "fallback": lambda p: prompt_manager.get_fallback_message(),
+}
+TEXTS["warm_transfer_failed"] = lambda p: TEXTS["warm_transfer"](p) + " " + prompt_manager.get_transfer_failed()
+
+# Reply types whose text never changes are serialized once
+_STATIC = ("repeat", "sms_sent", "warm_transfer", "warm_transfer_failed", "staff_busy", "price_not_found", "pricing_restricted", "fallback")
+
+
+def text_message(text: str) -> str:
+    """
+    A ConversationRelay "text" message: Twilio speaks it to the caller.
+    """
+    return json.dumps({"type": "text", "token": text, "last": True})
+
+
+_messages: Dict[str, str] = {name: text_message(TEXTS[name]({})) for name in _STATIC}
+
+
+def render_text(response_type: str, payload: dict) -> str:
+    """
+    The ConversationRelay message for a turn's reply; unknown response types
+    get the fallback.
+    """
+    cached = _messages.get(response_type)
+    if cached is not None:
+        return cached
+    if response_type in TEXTS:
+        return text_message(TEXTS[response_type](payload))
+    return _messages["fallback"]
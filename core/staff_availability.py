@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+from loguru import logger
+from business_logic.transfer_routing import transfer_numbers
+from core.store_resolver import get_store_by_id
+
+# Tuning (overridable via environment)
+AVAILABILITY_ENABLED = os.getenv("STAFF_AVAILABILITY", "true").lower() == "true"
+# Transfers in a row that none of a store's lines answered, after which its staff count as away...
+MISS_LIMIT = int(os.getenv("STAFF_MISS_LIMIT", "3"))
+# ...until this many seconds after the last miss, when one transfer is tried again
+MISS_COOLDOWN_SECONDS = float(os.getenv("STAFF_MISS_COOLDOWN_SECONDS", "120"))
+# Transfer outcomes kept per store for the answer rate and ring time
+HISTORY_SIZE = int(os.getenv("STAFF_HISTORY_SIZE", "20"))
+# A connected transfer whose end was never reported stops counting after this long
+ACTIVE_MAX_SECONDS = float(os.getenv("STAFF_ACTIVE_MAX_SECONDS", "3600"))
+
+
+class _StoreStaff:
+    """
+    Live transfer state of one store's staff lines.
+    """
+
+    def __init__(self):
+        self.active: Dict[str, float] = {}  # customer call SID -> connected at
+        self.consecutive_misses = 0
+        self.last_miss = 0.0
+        self.history = deque(maxlen=HISTORY_SIZE)  # (answered, ring seconds)
+        self.answered = 0
+        self.ring_seconds = 0.0
+
+    def record(self, answered: bool, ring_seconds: float):
+        if len(self.history) == self.history.maxlen:
+            old_answered, old_ring = self.history[0]
+            self.answered -= old_answered
+            self.ring_seconds -= old_ring
+        self.history.append((answered, ring_seconds))
+        self.answered += answered
+        self.ring_seconds += ring_seconds
+        if answered:
+            self.consecutive_misses = 0
+        else:
+            self.consecutive_misses += 1
+            self.last_miss = time.time()
+
+
+class StaffAvailability:
+    """
+    Per-store staff availability, fed by transfer outcomes and the
+    conference and call status callbacks. A store is busy while every one
+    of its staff lines is on a transferred call, and away after MISS_LIMIT
+    missed transfers in a row (until MISS_COOLDOWN_SECONDS pass).
+    """
+
+    def __init__(self):
+        self._stores: Dict[str, _StoreStaff] = {}
+        self._transfers: Dict[str, tuple] = {}  # customer call SID -> (store_id, staff call SID)
+        self._staff_legs: Dict[str, str] = {}   # staff call SID -> customer call SID
+        self._lock = threading.Lock()
+
+    def _store(self, store_id: str) -> _StoreStaff:
+        staff = self._stores.get(store_id)
+        if staff is None:
+            staff = self._stores[store_id] = _StoreStaff()
+        return staff
+
+    def _active_count(self, staff: _StoreStaff, now: float) -> int:
+        # Bounded by the store's line count, so this stays effectively O(1)
+        for customer_call_sid in [sid for sid, since in staff.active.items() if now - since > ACTIVE_MAX_SECONDS]:
+            self._end(customer_call_sid)
+        return len(staff.active)
+
+    def _end(self, customer_call_sid: str):
+        entry = self._transfers.pop(customer_call_sid, None)
+        if entry is None:
+            return
+        store_id, staff_call_sid = entry
+        self._staff_legs.pop(staff_call_sid, None)
+        self._stores[store_id].active.pop(customer_call_sid, None)
+
+    def transfer_finished(self, store_id: str, answered: bool, ring_seconds: float):
+        """
+        A transfer that rang the store's lines was decided: one of them
+        answered, or every one rang out / was busy / failed. Reported once
+        per transfer and store, however many lines rang.
+        """
+        with self._lock:
+            self._store(store_id).record(answered, ring_seconds)
+
+    def transfer_connected(self, customer_call_sid: str, staff_call_sid: str, store_id: str):
+        with self._lock:
+            self._store(store_id).active[customer_call_sid] = time.time()
+            self._transfers[customer_call_sid] = (store_id, staff_call_sid)
+            self._staff_legs[staff_call_sid] = customer_call_sid
+
+    def transfer_ended(self, call_sid: str):
+        """
+        The transfer is over: its conference ended, or the customer or the
+        staff member hung up. call_sid is either side's; unknown SIDs are ignored.
+        """
+        with self._lock:
+            self._end(self._staff_legs.get(call_sid, call_sid))
+
+    def check(self, store: Dict[str, Any]) -> Optional[str]:
+        """
+        None if a transfer to the store is worth trying, else why not:
+        "busy" (every line on a transferred call) or "not_answering".
+        """
+        store_id = store.get("store_id", "default")
+        now = time.time()
+        with self._lock:
+            staff = self._stores.get(store_id)
+            if staff is None:
+                return None
+            if self._active_count(staff, now) >= max(len(transfer_numbers(store)), 1):
+                return "busy"
+            if staff.consecutive_misses >= MISS_LIMIT and now - staff.last_miss < MISS_COOLDOWN_SECONDS:
+                return "not_answering"
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            return {
+                store_id: {
+                    "active_transfers": self._active_count(staff, now),
+                    "consecutive_misses": staff.consecutive_misses,
+                    "recent_transfers": len(staff.history),
+                    "answer_rate": round(staff.answered / len(staff.history), 3) if staff.history else None,
+                    "mean_ring_seconds": round(staff.ring_seconds / len(staff.history), 2) if staff.history else None,
+                }
+                for store_id, staff in self._stores.items()
+            }
+
+
+_availability = StaffAvailability()
+
+
+def get_staff_availability() -> StaffAvailability:
+    return _availability
+
+
+def choose_transfer_route(store: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Where a warm transfer for the store should go right now:
+        {"route": "store"}                          ring the store as usual
+        {"route": "alternate", "store": sister}     ring the sister store instead
+        {"route": "booking", "reason": ...}         skip the transfer; offer the booking link
+    The sister store is transfer_routing.overflow_store, when it is available.
+    """
+    if not AVAILABILITY_ENABLED:
+        return {"route": "store"}
+    reason = _availability.check(store)
+    if reason is None:
+        return {"route": "store"}
+
+    sister_id = (store.get("transfer_routing") or {}).get("overflow_store")
+    sister = get_store_by_id(sister_id) if sister_id else None
+    if sister is not None and transfer_numbers(sister) and _availability.check(sister) is None:
+        logger.info(f"{store.get('name')} staff {reason}; transferring to {sister.get('name')} instead")
+        return {"route": "alternate", "store": sister, "reason": reason}
+
+    logger.info(f"{store.get('name')} staff {reason}; offering the booking link instead of a transfer")
+    return {"route": "booking", "reason": reason}
@@ -1,69 +1,164 @@
-import json
-import os
+from loguru import logger
 from core.intent_classifier import classify_intent
+from core.entity_extractor import extract_entities
 from business_logic.pricing_engine import get_repair_price
-from utils.time_utils import is_business_hours
-from core.store_resolver import STORES_FILE, DEFAULT_STORE
+from business_logic.restriction_rules import evaluate_rules, RESTRICT_PRICING, NO_QUOTE, FORCE_TRANSFER
+from business_logic.hours_validator import is_business_hours, describe_next_opening
 from database.call_logs import log_call_event
 from core import prompt_manager
+from core.decision_cache import get_decision_cache, decision_key, current_config_version
+from core.staff_availability import choose_transfer_route
+from business_logic.transfer_routing import transfer_numbers
+from utils.metrics import timed
 
 
-def start_fsm(transcript: str, store: dict, call_sid: str = "unknown"):
+def decision_for(transcript: str, store: dict, classification: dict, slots: dict = None, context=None,
+                 planned: tuple = None, partial: bool = False) -> tuple:
+    """
+    The (key, decision) pair for a turn, from the decision cache when it has
+    one. A pair planned earlier for the same key (streaming mode plans one
+    on each partial transcript) is returned as is.
+
+    partial marks a plan for an unfinished transcript: it may read the cache
+    but stores nothing and counts no hit or miss, so the prefixes of every
+    utterance neither evict final-turn decisions nor skew the hit rate.
+    """
+    # Check the store's own hours (timezone, weekly schedule, holidays)
+    open_now = context.is_open() if context else is_business_hours(store)
+    key = decision_key(classification, store.get("store_id", "default"), open_now, slots, current_config_version())
+    cache = get_decision_cache()
+    if planned is not None and planned[0] == key:
+        # Worked out on an earlier partial; a finished turn still goes through the cache
+        if not partial and cache is not None and cache.get(key) is None:
+            cache.put(key, planned[1])
+        return planned
+    if partial:
+        decision = cache.peek(key) if cache is not None else None
+        return key, decision or decide(transcript, store, classification, open_now, slots, context)
+
+    decision = cache.get(key) if cache is not None else None
+    if decision is None:
+        decision = decide(transcript, store, classification, open_now, slots, context)
+        if cache is not None:
+            cache.put(key, decision)
+    return key, decision
+
+
+@timed("start_fsm")
+def start_fsm(transcript: str, store: dict, call_sid: str = "unknown", classification: dict = None, slots: dict = None,
+              context=None, planned: tuple = None):
     """
     Initial entry point for the Finite State Machine.
+    Accepts a precomputed classify_intent result so the transcript is only analyzed once,
+    the model/issue slots remembered from earlier turns of the same call, and the
+    call's warmed-up CallContext (store hours and pricing view) when there is one.
+
+    The decision itself is pure, so identical turns (same tokens, store, hours
+    state, remembered slots and config version) are served from the decision
+    cache, or from planned when streaming mode worked it out ahead of time;
+    the call event is still logged for every turn.
     """
     store_id = store.get("store_id", "default")
-    print(f"FSM Started for {store.get('name')} with transcript: {transcript}")
-    
-    # Classify intent
-    classification = classify_intent(transcript)
+    logger.debug("FSM started for {} with transcript: {}", store.get("name"), transcript)
+
+    if classification is None:
+        classification = classify_intent(transcript)
+
+    _, decision = decision_for(transcript, store, classification, slots, context, planned)
+
+    intent = decision["intent"]
+    response_type = decision["response_type"]
+    pricing_info = decision["pricing_info"]
+    if decision["rule_ids"]:
+        logger.info("Matched restriction rules: {}", decision["rule_ids"])
+
+    # Per-call parts of the response: the opening time moves with the clock,
+    # and the transfer target with the caller's store record and how its staff
+    # are doing right now (never cached: that changes from one call to the next)
+    response_payload = dict(decision["response_payload"])
+    if response_type == "offer_booking_sms":
+        response_payload["next_opening"] = context.describe_next_opening() if context else describe_next_opening(store)
+    elif response_type == "warm_transfer" and decision["open_now"]:
+        route = choose_transfer_route(store)
+        if route["route"] == "booking":
+            # Every line is busy or nobody is answering; don't park the caller on a doomed transfer
+            response_type = "staff_busy"
+            response_payload = {"reason": route["reason"]}
+        elif route["route"] == "alternate":
+            sister = route["store"]
+            response_payload["store_phone_number"] = transfer_numbers(sister)[0]
+            response_payload["transfer_store_id"] = sister["store_id"]
+        else:
+            response_payload["store_phone_number"] = store.get("transfer_number", store.get("did"))
+
+    # Log initial FSM event
+    log_call_event({
+        "call_sid": call_sid,
+        "store_id": store_id,
+        "intent": intent,
+        "response_type": response_type,
+        "pricing_found": pricing_info is not None,
+        "sms_sent": False, # Will be logged in webhook if triggered
+        "transfer_attempted": False, # Will be logged in webhook if triggered
+        "rule_ids": decision["rule_ids"]
+    })
+
+    model_candidate = decision["model_candidate"]
+    return {
+        "state": "pricing_check" if intent == "pricing" else "initial",
+        "transcript": transcript,
+        "intent": intent,
+        "is_computer_repair": decision["is_computer_repair"],
+        "rule_ids": list(decision["rule_ids"]),
+        "pricing_info": dict(pricing_info) if pricing_info else None,
+        "response_type": response_type,
+        "response_payload": response_payload,
+        "entities": dict(decision["entities"]),
+        "model_candidate": dict(model_candidate) if model_candidate else None,
+        "store": store
+    }
+
+
+def decide(transcript: str, store: dict, classification: dict, open_now: bool, slots: dict = None, context=None) -> dict:
+    """
+    The FSM's decision for one turn: intent, rules, slots, price and
+    response. Depends only on its arguments and the loaded config, never on
+    the call, so start_fsm can cache it.
+    """
+    store_id = store.get("store_id", "default")
+
+    # Apply the store's restriction rules to the classified tokens
     intent = classification['intent']
-    is_computer = classification['is_computer_repair']
+    rules = evaluate_rules(classification['tokens'], store_id)
+    is_computer = RESTRICT_PRICING in rules["actions"]
+    is_complex = FORCE_TRANSFER in rules["actions"]
+    no_quote = NO_QUOTE in rules["actions"]
     
-    transcript_lower = transcript.lower()
-    print(f"Detected Intent: {intent}")
-    print(f"Is Computer Repair: {is_computer}")
-    
-    # Complex issue detection
-    complex_keywords = ["water damage", "motherboard", "data recovery"]
-    is_complex = any(word in transcript_lower for word in complex_keywords)
+    logger.debug("Detected intent: {} (computer repair: {})", intent, is_computer)
     
     pricing_info = None
     response_type = "unknown"
     response_payload = {}
 
-    # Check business hours
-    open_now = is_business_hours()
+    # Model, issue and category slots for briefing/pricing
+    entities = extract_entities(transcript, classification['tokens'])
+    model = entities["model"]
+    issue = entities["issue"]
+    category = entities["category"]
+    model_candidate = entities.get("model_candidate")
 
-    # Model and Issue slots for briefing/pricing
-    model = None
-    issue = None
-    category = "phone" # default
-    
-    # Model detection
-    if "iphone 13" in transcript_lower:
-        model = "iPhone 13"
-    elif "iphone 14" in transcript_lower:
-        model = "iPhone 14"
-    elif "ipad air 4" in transcript_lower:
-        model = "iPad Air 4"
-        category = "tablet"
-    elif "ps5" in transcript_lower:
-        model = "PS5"
-        category = "console"
-    
-    # Issue detection
-    if "screen" in transcript_lower:
-        issue = "screen"
-    elif "battery" in transcript_lower:
-        issue = "battery"
-    elif "hdmi" in transcript_lower:
-        issue = "hdmi port"
-        category = "console"
+    # Fill slots the caller mentioned on an earlier turn; a new device this
+    # turn, even a rough match still to be confirmed, wins over the old one
+    if slots:
+        if not model and not model_candidate and slots.get("model"):
+            model = slots["model"]
+            category = slots.get("category") or category
+        if not issue and slots.get("issue"):
+            issue = slots["issue"]
 
     # LOGIC BRANCHES
     if is_computer:
-        print("LOG: Pricing is RESTRICTED for computer/laptop repairs.")
+        logger.debug("Pricing is restricted for computer/laptop repairs")
         response_type = "pricing_restricted"
     
     # Case: Warm Transfer (Triggered by intent, complexity, or missing price during business hours)
@@ -72,26 +167,34 @@ def start_fsm(transcript: str, store: dict, call_sid: str = "unknown"):
     
     elif intent == "pricing":
         if not open_now:
-            print("LOG: After-hours pricing intent detected. Offering SMS booking.")
+            # start_fsm adds the next opening time, which changes with the clock
+            logger.debug("After-hours pricing intent; offering SMS booking")
             response_type = "offer_booking_sms"
+        elif not model and model_candidate:
+            # The model was only a rough match; confirm it instead of transferring
+            logger.debug("Low-confidence model match {} ({}); asking the caller",
+                         model_candidate["model"], entities.get("model_confidence"))
+            response_type = "clarify_model"
+            response_payload = {"model": model_candidate["model"]}
         else:
-            # Attempt to find a price
-            if model and issue:
-                pricing_info = get_repair_price(category, model, issue)
+            # Attempt to find a price (unless a rule says this repair is never quoted)
+            if model and issue and not no_quote:
+                if context:
+                    pricing_info = context.pricing.get_repair_price(category, model, issue)
+                else:
+                    pricing_info = get_repair_price(category, model, issue, store_id)
                 
             if pricing_info:
-                print(f"LOG: Price found: {pricing_info['price']} {pricing_info['currency']} for {model} {issue}")
+                logger.debug("Price found: {} {} for {} {}", pricing_info['price'], pricing_info['currency'], model, issue)
                 response_type = "price_found"
                 response_payload = {"price": pricing_info['price']}
             else:
                 # Pricing not found during business hours -> Warm Transfer
-                print(f"LOG: Pricing not determined during business hours. Triggering transfer.")
+                logger.debug("Pricing not determined during business hours; triggering transfer")
                 response_type = "warm_transfer"
     
-    # If Warm Transfer was determined, build the payload
+    # If Warm Transfer was determined, build the payload (start_fsm adds the store's number)
     if response_type == "warm_transfer" and open_now:
-        transfer_number = store.get("transfer_number", store.get("did"))
-        
         # Build structured fields for tech briefing
         device_desc = model if model else "their device"
         issue_desc = issue if issue else "a repair issue"
@@ -108,31 +211,25 @@ def start_fsm(transcript: str, store: dict, call_sid: str = "unknown"):
         briefing = prompt_manager.get_tech_briefing(device_desc, issue_desc, transfer_reason)
         
         response_payload = {
-            "store_phone_number": transfer_number,
             "briefing_text": briefing,
             "device": device_desc,
             "issue": issue_desc,
             "transfer_reason": transfer_reason
         }
 
-    # Log initial FSM event
-    log_call_event({
-        "call_sid": call_sid,
-        "store_id": store_id,
-        "intent": intent,
-        "response_type": response_type,
-        "pricing_found": pricing_info is not None,
-        "sms_sent": False, # Will be logged in webhook if triggered
-        "transfer_attempted": False # Will be logged in webhook if triggered
-    })
-
     return {
-        "state": "pricing_check" if intent == "pricing" else "initial", 
-        "transcript": transcript,
+        "open_now": open_now,
         "intent": intent,
         "is_computer_repair": is_computer,
+        "rule_ids": rules["rule_ids"],
         "pricing_info": pricing_info,
         "response_type": response_type,
         "response_payload": response_payload,
-        "store": store
+        "entities": {
+            "model": model,
+            "issue": issue,
+            "category": category if (model or issue) else None,
+            "model_confidence": entities.get("model_confidence") if model == entities["model"] else None,
+        },
+        "model_candidate": model_candidate,
     }
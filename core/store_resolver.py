@@ -1,6 +1,12 @@
 import json
-import os
+import threading
 from pathlib import Path
+from typing import Dict, Any, List, Optional
+from loguru import logger
+from utils.config_watcher import FileWatcher, bump_config_version
+from utils.cluster import get_config_snapshot, config_sources
+from utils.telephony_utils import normalize_phone_number
+from utils.metrics import timed
 
 # Paths
 BASE_DIR = Path(__file__).resolve().parents[1]  # project root
@@ -13,21 +19,115 @@ DEFAULT_STORE = {
     "location": "your local area"
 }
 
+
+class _StoreIndex:
+    """
+    Immutable lookup tables built from one read of stores.json.
+    """
+
+    def __init__(self, stores: List[Dict[str, Any]]):
+        self.stores = stores
+        self.by_did: Dict[str, Dict[str, Any]] = {}
+        self.by_store_id: Dict[str, Dict[str, Any]] = {}
+        self.by_sms_number: Dict[str, Dict[str, Any]] = {}
+
+        for store in stores:
+            if store.get("did"):
+                self.by_did[normalize_phone_number(store["did"])] = store
+            if store.get("store_id"):
+                self.by_store_id[store["store_id"]] = store
+            if store.get("sms_number"):
+                self.by_sms_number[normalize_phone_number(store["sms_number"])] = store
+
+
+class StoreRegistry:
+    """
+    In-memory store directory indexed by DID, store_id and SMS number.
+
+    Lookups read the current index without locking; reloads build a new
+    index and swap the reference in one assignment, so readers always see
+    either the old or the new directory in full. Under api.workers the
+    stores come from the supervisor's config snapshot instead of the file.
+    """
+
+    def __init__(self, stores_file: Path = STORES_FILE):
+        self.stores_file = Path(stores_file)
+        self._reload_lock = threading.Lock()
+        self._index = self._load()
+        self._watcher = FileWatcher(config_sources(self.stores_file))
+
+    def _load(self) -> _StoreIndex:
+        snapshot = get_config_snapshot()
+        if snapshot is not None:
+            return _StoreIndex(snapshot.section("stores", []))
+        if not self.stores_file.exists():
+            return _StoreIndex([])
+        with open(self.stores_file, "r") as f:
+            return _StoreIndex(json.load(f))
+
+    def reload(self) -> int:
+        """
+        Re-reads stores.json. On a parse error the previous index stays live.
+        Returns the number of stores loaded.
+        """
+        with self._reload_lock:
+            try:
+                index = self._load()
+            except Exception as e:
+                logger.error(f"Failed to reload {self.stores_file.name}, keeping previous stores: {e}")
+                return len(self._index.stores)
+            self._index = index
+            self._watcher.reset()
+            bump_config_version()
+        logger.info(f"Loaded {len(index.stores)} stores from {self.stores_file.name}")
+        return len(index.stores)
+
+    def _current(self) -> _StoreIndex:
+        # Throttled mtime check, so most requests don't even stat the file
+        if self._watcher.changed():
+            self.reload()
+        return self._index
+
+    def get_by_did(self, number: str) -> Optional[Dict[str, Any]]:
+        return self._current().by_did.get(normalize_phone_number(number))
+
+    def get_by_store_id(self, store_id: str) -> Optional[Dict[str, Any]]:
+        return self._current().by_store_id.get(store_id)
+
+    def get_by_sms_number(self, number: str) -> Optional[Dict[str, Any]]:
+        return self._current().by_sms_number.get(normalize_phone_number(number))
+
+    def all_stores(self) -> List[Dict[str, Any]]:
+        return self._current().stores
+
+
+_registry: Optional[StoreRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_store_registry() -> StoreRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = StoreRegistry()
+    return _registry
+
+
+@timed("resolve_store_by_did")
 def resolve_store_by_did(called_number: str) -> dict:
     """
     Look up a store based on the incoming phone number (DID).
     """
-    if not os.path.exists(STORES_FILE):
-        return DEFAULT_STORE
-
     try:
-        with open(STORES_FILE, "r") as f:
-            stores = json.load(f)
-        
-        for store in stores:
-            if store.get("did") == called_number:
-                return store
+        return get_store_registry().get_by_did(called_number) or DEFAULT_STORE
     except Exception as e:
+        logger.error(f"Store lookup failed for {called_number}: {e}")
         return DEFAULT_STORE
 
-    return DEFAULT_STORE
+
+def get_store_by_id(store_id: str) -> Optional[dict]:
+    """
+    Look up a store by its store_id.
+    """
+    return get_store_registry().get_by_store_id(store_id)
@@ -0,0 +1,137 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from loguru import logger
+from core.call_turn import plan_turn, run_turn
+from core.call_warmup import get_call_context
+from core.orchestrator import load_call_context
+from utils.concurrency import run_blocking
+from utils.logger import set_call_context
+from utils.metrics import record_stage
+from utils.twilio_utils import get_callback_url
+
+# Tuning (overridable via environment)
+# "relay" answers calls with ConversationRelay instead of <Gather> round trips
+VOICE_MODE = os.getenv("VOICE_MODE", "gather").lower()
+# When set, every relay connection's inbound messages are saved here for replay
+RECORD_DIR = os.getenv("RELAY_RECORD_DIR")
+
+RELAY_PATH = "/webhooks/relay"
+
+_stats = {"connections": 0, "turns": 0, "planned": 0, "replanned": 0, "unplanned": 0, "partials": 0}
+
+
+def relay_url() -> Optional[str]:
+    """
+    The websocket URL Twilio connects the call to, derived from
+    PUBLIC_BASE_URL. Returns None if that is not configured.
+    """
+    url = get_callback_url(RELAY_PATH)
+    if not url:
+        return None
+    if url.startswith("https://"):
+        return "wss://" + url[len("https://"):]
+    if url.startswith("http://"):
+        return "ws://" + url[len("http://"):]
+    return url
+
+
+def streaming_enabled() -> bool:
+    return VOICE_MODE == "relay"
+
+
+class StreamingCall:
+    """
+    One call's ConversationRelay connection. Each partial transcript is
+    planned (classification and FSM decision, no side effects) as it
+    arrives, so when the caller stops speaking the final transcript usually
+    matches the last plan and only the turn's side effects remain.
+    """
+
+    def __init__(self):
+        self.call_sid = ""
+        self.from_number = ""
+        self.session: Optional[Dict[str, Any]] = None
+        self.store: Optional[Dict[str, Any]] = None
+        self.context = None
+        self.plan: Optional[Dict[str, Any]] = None
+        self.started = time.monotonic()
+        self.recording: Optional[List[Dict[str, Any]]] = [] if RECORD_DIR else None
+        _stats["connections"] += 1
+
+    def record(self, message: Dict[str, Any]):
+        if self.recording is not None:
+            self.recording.append({"t": round(time.monotonic() - self.started, 3), "message": message})
+
+    async def setup(self, message: Dict[str, Any]):
+        """
+        Loads the call's session and store from the "setup" message; /voice
+        has already opened the session and started the warmup.
+        """
+        self.call_sid = message.get("callSid", "")
+        self.from_number = message.get("from", "")
+        set_call_context(self.call_sid)
+        self.context = await get_call_context(self.call_sid)
+        self.session, self.store = await load_call_context(
+            self.call_sid, message.get("to", ""), self.context.store if self.context else None
+        )
+        set_call_context(store_id=self.store.get("store_id", "default"))
+
+    def on_partial(self, transcript: str):
+        transcript = transcript.strip()
+        if not transcript:
+            return
+        _stats["partials"] += 1
+        start = time.perf_counter()
+        self.plan = plan_turn(transcript, self.session, self.store, self.context, self.plan, partial=True)
+        record_stage("relay_plan", time.perf_counter() - start)
+
+    async def on_final(self, transcript: str) -> Dict[str, Any]:
+        """
+        Runs the turn for the caller's finished utterance, reusing the last
+        partial's plan when nothing that decides the reply has changed.
+        """
+        transcript = transcript.strip()
+        planned, self.plan = self.plan, None
+        if not transcript:
+            return {"response_type": "repeat", "payload": {}}
+
+        _stats["turns"] += 1
+        start = time.perf_counter()
+        plan = plan_turn(transcript, self.session, self.store, self.context, planned)
+        if planned is None:
+            outcome = "unplanned"
+        elif plan["decision"] is planned["decision"]:
+            outcome = "planned"
+        else:
+            outcome = "replanned"
+        _stats[outcome] += 1
+        reply = await run_turn(plan, self.call_sid, self.from_number, self.session, self.store, self.context)
+        # End of speech to reply, per outcome: relay_turn_planned, relay_turn_unplanned, ...
+        record_stage(f"relay_turn_{outcome}", time.perf_counter() - start)
+        return reply
+
+    def on_interrupt(self, message: Dict[str, Any]):
+        logger.debug("Caller interrupted after {}ms: {}", message.get("durationUntilInterruptMs"),
+                     message.get("utteranceUntilInterrupt"))
+
+    async def close(self):
+        if self.recording and self.call_sid:
+            await run_blocking(self._save_recording)
+
+    def _save_recording(self):
+        path = Path(RECORD_DIR) / f"{self.call_sid}.jsonl"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            for entry in self.recording:
+                f.write(json.dumps(entry) + "\n")
+
+
+def get_streaming_stats() -> Dict[str, Any]:
+    """
+    Relay connections and turns; "planned" turns reused the decision worked
+    out on a partial transcript, "replanned" ones had to decide again.
+    """
+    return {"voice_mode": VOICE_MODE, "relay_url": relay_url(), **_stats}
@@ -0,0 +1,194 @@
+import re
+from typing import Callable, Dict, List, Optional
+from xml.sax.saxutils import escape
+from twilio.twiml.voice_response import VoiceResponse
+from core import prompt_manager
+
+GATHER_ACTION = "/webhooks/gather"
+HOLD_MUSIC_URL = "http://twimlets.com/holdmusic?Bucket=com.twilio.music.classical"
+
+# Greeting bytes are cached per store location; bound it for large franchises
+MAX_CACHED_GREETINGS = 10000
+
+_SLOT_RE = re.compile(r"__SLOT_([a-z_]+)__")
+
+
+def _slot(name: str) -> str:
+    return f"__SLOT_{name}__"
+
+
+def _say(response: VoiceResponse, text: str):
+    response.say(text, voice="alice", language="en-US")
+
+
+class TwimlTemplate:
+    """
+    A TwiML document serialized once with VoiceResponse, split around its
+    slot markers. Rendering only escapes and splices the dynamic values, and
+    documents without slots are returned as the same pre-encoded bytes.
+    """
+
+    def __init__(self, build: Callable[[VoiceResponse], None]):
+        response = VoiceResponse()
+        build(response)
+        pieces = _SLOT_RE.split(str(response))
+        # Even indexes are literal XML, odd indexes are slot names
+        self.literals: List[bytes] = [piece.encode("utf-8") for piece in pieces[0::2]]
+        self.slots: List[str] = pieces[1::2]
+        self.static: Optional[bytes] = self.literals[0] if not self.slots else None
+
+    def render(self, **values) -> bytes:
+        if self.static is not None:
+            return self.static
+        out = [self.literals[0]]
+        for name, literal in zip(self.slots, self.literals[1:]):
+            out.append(escape(str(values[name]), {'"': "&quot;"}).encode("utf-8"))
+            out.append(literal)
+        return b"".join(out)
+
+
+def _greeting(r):
+    _say(r, prompt_manager.get_greeting(_slot("name"), _slot("location")))
+    r.gather(input="speech", action=GATHER_ACTION, method="POST", speech_timeout="5")
+
+
+def _relay_greeting(r):
+    # Twilio speaks the greeting, then streams the caller's speech to the websocket
+    r.connect().conversation_relay(
+        url=_slot("url"),
+        welcome_greeting=prompt_manager.get_greeting(_slot("name"), _slot("location")),
+        partial_prompts=True,
+        language="en-US",
+    )
+
+
+def _repeat(r):
+    _say(r, prompt_manager.get_repeat_prompt())
+
+
+def _sms_sent(r):
+    _say(r, prompt_manager.get_sms_sent_confirmation())
+
+
+def _with_pause(build):
+    # FSM responses end with a short pause to keep the call alive
+    def wrapped(r):
+        build(r)
+        r.pause(length=1)
+    return wrapped
+
+
+def _price_found(r):
+    _say(r, prompt_manager.get_pricing_found(_slot("price")))
+
+
+def _transfer_script(r):
+    # Multi-part Customer-Facing Script (Part 1 & 3) using prompt_manager
+    _say(r, prompt_manager.get_transfer_justification())
+    r.pause(length=1)
+    _say(r, prompt_manager.get_transfer_context_assurance())
+    _say(r, prompt_manager.get_transfer_instruction())
+    _say(r, prompt_manager.get_transfer_connecting())
+
+
+def _transfer_failed(r):
+    _transfer_script(r)
+    _say(r, prompt_manager.get_transfer_failed())
+    r.gather(input="speech", action=GATHER_ACTION, method="POST", speech_timeout="3")
+
+
+def _booking_offer(r, next_opening=None):
+    _say(r, prompt_manager.get_booking_offer(next_opening))
+    # Listen for the "Yes"
+    r.gather(input="speech", action=GATHER_ACTION, method="POST", speech_timeout="3")
+
+
+def _staff_busy(r):
+    _say(r, prompt_manager.get_staff_busy_offer())
+    r.gather(input="speech", action=GATHER_ACTION, method="POST", speech_timeout="3")
+
+
+def _clarify_model(r):
+    _say(r, prompt_manager.get_model_clarification(_slot("model")))
+    r.gather(input="speech", action=GATHER_ACTION, method="POST", speech_timeout="3")
+
+
+def _transfer_reroute(r):
+    # Sent over REST when staff don't answer, so the gather URL must be absolute
+    _say(r, prompt_manager.get_transfer_failed())
+    r.gather(input="speech", action=_slot("action"), method="POST", speech_timeout="3")
+
+
+def _transfer_hold(r):
+    # The conference's end tells staff availability that the store's line is free again
+    r.dial().conference(_slot("conference"), wait_url=HOLD_MUSIC_URL,
+                        status_callback=_slot("callback"), status_callback_event="end")
+
+
+def _staff_briefing(r):
+    r.say(_slot("briefing"), voice="alice")
+    r.dial().conference(_slot("conference"))
+
+
+TEMPLATES: Dict[str, TwimlTemplate] = {
+    "greeting": TwimlTemplate(_greeting),
+    "relay_greeting": TwimlTemplate(_relay_greeting),
+    "repeat": TwimlTemplate(_repeat),
+    "sms_sent": TwimlTemplate(_sms_sent),
+    "transfer_reroute": TwimlTemplate(_transfer_reroute),
+    "transfer_hold": TwimlTemplate(_transfer_hold),
+    "staff_briefing": TwimlTemplate(_staff_briefing),
+    "price_found": TwimlTemplate(_with_pause(_price_found)),
+    "warm_transfer": TwimlTemplate(_with_pause(_transfer_script)),
+    "warm_transfer_failed": TwimlTemplate(_with_pause(_transfer_failed)),
+    "offer_booking_sms": TwimlTemplate(_with_pause(_booking_offer)),
+    "staff_busy": TwimlTemplate(_with_pause(_staff_busy)),
+    "offer_booking_sms_reopen": TwimlTemplate(_with_pause(lambda r: _booking_offer(r, _slot("opening")))),
+    "clarify_model": TwimlTemplate(_with_pause(_clarify_model)),
+    "price_not_found": TwimlTemplate(_with_pause(lambda r: _say(r, prompt_manager.get_pricing_not_found()))),
+    "pricing_restricted": TwimlTemplate(_with_pause(lambda r: _say(r, prompt_manager.get_pricing_restricted()))),
+    "fallback": TwimlTemplate(_with_pause(lambda r: _say(r, prompt_manager.get_fallback_message()))),
+}
+
+_greetings: Dict[tuple, bytes] = {}
+
+
+def render(shape: str, **values) -> bytes:
+    """
+    Renders a precompiled response shape to UTF-8 TwiML bytes.
+    """
+    return TEMPLATES[shape].render(**values)
+
+
+def render_greeting(store: dict) -> bytes:
+    key = (store.get("name"), store.get("location"))
+    cached = _greetings.get(key)
+    if cached is None:
+        cached = TEMPLATES["greeting"].render(name=key[0], location=key[1])
+        if len(_greetings) >= MAX_CACHED_GREETINGS:
+            _greetings.clear()
+        _greetings[key] = cached
+    return cached
+
+
+def render_relay_greeting(store: dict, url: str) -> bytes:
+    """
+    ConversationRelay TwiML connecting the call to the streaming websocket.
+    """
+    return render("relay_greeting", url=url, name=store.get("name"), location=store.get("location"))
+
+
+def render_fsm_response(response_type: str, payload: dict) -> bytes:
+    """
+    TwiML for a turn's reply (a start_fsm response type, or sms_sent /
+    warm_transfer_failed); unknown response types get the fallback.
+    """
+    if response_type == "price_found":
+        return render("price_found", price=payload.get("price"))
+    if response_type == "offer_booking_sms" and payload.get("next_opening"):
+        return render("offer_booking_sms_reopen", opening=payload["next_opening"])
+    if response_type == "clarify_model":
+        return render("clarify_model", model=payload.get("model"))
+    if response_type in TEMPLATES:
+        return render(response_type)
+    return render("fallback")
@@ -0,0 +1,340 @@
+import json
+import os
+import sys
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional
+
+from loguru import logger
+from utils.cluster import per_worker_path
+
+# Paths
+BASE_DIR = Path(__file__).resolve().parents[1]
+# Each api.workers worker aggregates only the calls it handled
+SNAPSHOT_FILE = per_worker_path(BASE_DIR / "data" / "logs" / "analytics_snapshot.json")
+
+# Calls whose funnel stages are remembered so repeat turns are only counted once
+MAX_TRACKED_CALLS = int(os.getenv("ANALYTICS_MAX_TRACKED_CALLS", "100000"))
+
+# Window name -> (bucket width in seconds, number of buckets in the ring)
+WINDOWS = {
+    "hour": (60, 60),          # last hour, per-minute buckets
+    "day": (3600, 24),         # last 24 hours, per-hour buckets
+    "month": (86400, 30),      # last 30 days, per-day buckets
+}
+
+ALL_STORES = "*"
+
+# Conversion funnel, in order; each stage is counted at most once per call
+FUNNEL_STAGES = (
+    "call",
+    "pricing",
+    "price_quoted",
+    "sms_offered",
+    "sms_sent",
+    "transfer_attempted",
+    "transfer_answered",
+    "transfer_failed",
+)
+
+# Responses produced by the FSM itself (as opposed to SMS/transfer follow-ups)
+FSM_RESPONSE_TYPES = (
+    "price_found",
+    "price_not_found",
+    "pricing_restricted",
+    "offer_booking_sms",
+    "clarify_model",
+    "warm_transfer",
+    "unknown",
+)
+
+
+def _event_timestamp(event: Dict[str, Any]) -> float:
+    created_at = event.get("created_at")
+    if not created_at:
+        return datetime.now(timezone.utc).timestamp()
+    moment = datetime.fromisoformat(created_at)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)  # build_call_event stores naive UTC
+    return moment.timestamp()
+
+
+def _event_stages(event: Dict[str, Any]) -> List[str]:
+    """
+    Funnel stages a single event shows the call has reached.
+    """
+    response_type = event.get("response_type")
+    stages = ["call"]
+    if event.get("intent") == "pricing" and response_type in FSM_RESPONSE_TYPES:
+        stages.append("pricing")
+    if event.get("pricing_found"):
+        stages.append("price_quoted")
+    if response_type == "offer_booking_sms":
+        stages.append("sms_offered")
+    if response_type == "sms_sent":
+        stages.append("sms_sent")
+    if response_type == "warm_transfer_initiated":
+        stages.append("transfer_attempted")
+    elif response_type == "warm_transfer_answered":
+        stages.append("transfer_answered")
+    elif response_type == "warm_transfer_failed":
+        stages.append("transfer_failed")
+    return stages
+
+
+class _RollingWindow:
+    """
+    Fixed ring of time buckets with running totals.
+
+    Each bucket holds per-store counters; when the ring wraps, the expired
+    bucket is subtracted from the totals, so reading the whole window is a
+    dict lookup rather than a sum over buckets.
+    """
+
+    def __init__(self, bucket_seconds: int, size: int):
+        self.bucket_seconds = bucket_seconds
+        self.size = size
+        self.buckets: List[Dict[str, Counter]] = [{} for _ in range(size)]
+        self.stamps: List[int] = [-1] * size
+        self.totals: Dict[str, Counter] = {}
+        self.head = -1  # newest bucket index seen
+
+    def _expire(self, slot: int):
+        for store_id, counts in self.buckets[slot].items():
+            total = self.totals[store_id]
+            total.subtract(counts)
+            for key in counts:
+                if total[key] <= 0:
+                    del total[key]
+        self.buckets[slot] = {}
+        self.stamps[slot] = -1
+
+    def advance(self, now: float):
+        """
+        Moves the head to now, expiring buckets that fell out of the window.
+        """
+        index = int(now // self.bucket_seconds)
+        if index <= self.head:
+            return
+        start = max(self.head + 1, index - self.size + 1)
+        for expired in range(start, index + 1):
+            slot = expired % self.size
+            if self.stamps[slot] != -1:
+                self._expire(slot)
+        self.head = index
+
+    def add(self, ts: float, store_ids: Iterable[str], keys: Iterable[str]):
+        index = int(ts // self.bucket_seconds)
+        self.advance(ts)
+        if index <= self.head - self.size:
+            return  # older than the window
+        slot = index % self.size
+        self.stamps[slot] = index
+        bucket = self.buckets[slot]
+        keys = list(keys)
+        for store_id in store_ids:
+            counts = bucket.setdefault(store_id, Counter())
+            total = self.totals.setdefault(store_id, Counter())
+            for key in keys:
+                counts[key] += 1
+                total[key] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "head": self.head,
+            "stamps": self.stamps,
+            "buckets": [{store_id: dict(counts) for store_id, counts in bucket.items()} for bucket in self.buckets],
+        }
+
+    def load(self, data: Dict[str, Any]):
+        if len(data["stamps"]) != self.size:
+            return  # window resized since the snapshot; start empty
+        self.head = data["head"]
+        self.stamps = data["stamps"]
+        self.buckets = [{store_id: Counter(counts) for store_id, counts in bucket.items()} for bucket in data["buckets"]]
+        self.totals = {}
+        for bucket in self.buckets:
+            for store_id, counts in bucket.items():
+                self.totals.setdefault(store_id, Counter()).update(counts)
+
+
+class AnalyticsTracker:
+    """
+    Incremental call analytics fed by log_call_event.
+
+    Every event updates rolling counters per store (and for all stores) over
+    the last hour, day and 30 days: event counts by intent and response
+    type, plus a per-call conversion funnel. Summaries are read from running
+    totals, so serving them does not depend on how many events were logged.
+    """
+
+    def __init__(self, max_tracked_calls: int = MAX_TRACKED_CALLS):
+        self.max_tracked_calls = max_tracked_calls
+        self.windows = {name: _RollingWindow(*spec) for name, spec in WINDOWS.items()}
+        self.events_recorded = 0
+        self._calls: "OrderedDict[str, set]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _new_stages(self, call_sid: Optional[str], stages: List[str]) -> List[str]:
+        if not call_sid:
+            return stages
+        seen = self._calls.get(call_sid)
+        if seen is None:
+            seen = self._calls[call_sid] = set()
+            if len(self._calls) > self.max_tracked_calls:
+                self._calls.popitem(last=False)
+        else:
+            self._calls.move_to_end(call_sid)
+        new = [stage for stage in stages if stage not in seen]
+        seen.update(new)
+        return new
+
+    def record(self, event: Dict[str, Any]):
+        """
+        Folds one stored call event into every window.
+        """
+        ts = _event_timestamp(event)
+        store_ids = (ALL_STORES, event.get("store_id") or "default")
+        with self._lock:
+            keys = [f"intent:{event.get('intent')}", f"response:{event.get('response_type')}"]
+            keys.extend(f"stage:{stage}" for stage in self._new_stages(event.get("call_sid"), _event_stages(event)))
+            for window in self.windows.values():
+                window.add(ts, store_ids, keys)
+            self.events_recorded += 1
+
+    def summary(self, store_id: Optional[str] = None, window: str = "day", now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Counts, funnel and rates for one store (or all stores) over a window.
+        """
+        if window not in self.windows:
+            raise ValueError(f"Unknown window {window!r}; expected one of {', '.join(WINDOWS)}")
+        rolling = self.windows[window]
+        with self._lock:
+            rolling.advance(datetime.now(timezone.utc).timestamp() if now is None else now)
+            totals = dict(rolling.totals.get(store_id or ALL_STORES, {}))
+
+        intents, responses, funnel = {}, {}, {stage: 0 for stage in FUNNEL_STAGES}
+        for key, count in totals.items():
+            kind, name = key.split(":", 1)
+            if kind == "intent":
+                intents[name] = count
+            elif kind == "response":
+                responses[name] = count
+            else:
+                funnel[name] = count
+
+        resolved = funnel["transfer_answered"] + funnel["transfer_failed"]
+        pricing = funnel["pricing"]
+        return {
+            "store_id": store_id or ALL_STORES,
+            "window": window,
+            "events": sum(intents.values()),
+            "intents": intents,
+            "response_types": responses,
+            "funnel": funnel,
+            "rates": {
+                "price_quoted": _ratio(funnel["price_quoted"], pricing),
+                "sms_offered": _ratio(funnel["sms_offered"], pricing),
+                "sms_conversion": _ratio(funnel["sms_sent"], funnel["sms_offered"]),
+                "transfer_attempted": _ratio(funnel["transfer_attempted"], funnel["call"]),
+                "transfer_success": _ratio(funnel["transfer_answered"], resolved),
+            },
+        }
+
+    def stores(self) -> List[str]:
+        with self._lock:
+            return sorted(store_id for store_id in self.windows["month"].totals if store_id != ALL_STORES)
+
+    # Snapshots
+
+    def save(self, path: Path = SNAPSHOT_FILE):
+        with self._lock:
+            data = {
+                "events_recorded": self.events_recorded,
+                "windows": {name: window.to_dict() for name, window in self.windows.items()},
+            }
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def load(self, path: Path = SNAPSHOT_FILE) -> bool:
+        path = Path(path)
+        if not path.exists():
+            return False
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable analytics snapshot {path}: {e}")
+            return False
+        with self._lock:
+            self.events_recorded = data.get("events_recorded", 0)
+            for name, window_data in data.get("windows", {}).items():
+                if name in self.windows:
+                    self.windows[name].load(window_data)
+        return True
+
+
+def _ratio(numerator: int, denominator: int) -> Optional[float]:
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def rebuild(events: Iterable[Dict[str, Any]]) -> AnalyticsTracker:
+    """
+    Builds a fresh tracker from historical events in one streaming pass.
+    """
+    tracker = AnalyticsTracker()
+    for event in events:
+        tracker.record(event)
+    return tracker
+
+
+_tracker: Optional[AnalyticsTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_analytics_tracker() -> AnalyticsTracker:
+    """
+    Returns the process-wide tracker, resuming from the last snapshot.
+    """
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                tracker = AnalyticsTracker()
+                tracker.load()
+                _tracker = tracker
+    return _tracker
+
+
+def save_analytics_snapshot():
+    """
+    Persists the rolling aggregates so a restart resumes them (on app shutdown).
+    """
+    if _tracker is not None:
+        _tracker.save()
+
+
+def record_event(event: Dict[str, Any]):
+    try:
+        get_analytics_tracker().record(event)
+    except Exception as e:
+        # Analytics must never break call handling
+        logger.error(f"Analytics tracker failed to record event: {e}")
+
+
+if __name__ == "__main__":
+    # Usage: python -m database.analytics_tracker rebuild
+    if len(sys.argv) >= 2 and sys.argv[1] == "rebuild":
+        from database.repository import get_event_repository
+
+        tracker = rebuild(get_event_repository().iter_events())
+        tracker.save()
+        print(f"Rebuilt analytics from {tracker.events_recorded} events into {SNAPSHOT_FILE}")
+    else:
+        print("Usage: python -m database.analytics_tracker rebuild")
@@ -1,19 +1,13 @@
-import json
-import os
-from datetime import datetime
-from pathlib import Path
-
-# Path for the logs file
-BASE_DIR = Path(__file__).resolve().parents[1]
-LOGS_DIR = BASE_DIR / "data" / "logs"
-LOGS_FILE = LOGS_DIR / "call_events.json"
-
-# Ensure data/logs directory exists
-LOGS_DIR.mkdir(parents=True, exist_ok=True)
+from database.models import build_call_event
+from database.repository import get_event_repository
+from database.analytics_tracker import record_event
+from utils.logger import log_sampled
+from utils.metrics import timed
 
+@timed("log_call_event")
 def log_call_event(data: dict):
     """
-    Logs a call event to a JSON file.
+    Logs a call event to the append-only event store.
     Expected data fields:
     - call_sid
     - store_id
@@ -22,30 +16,15 @@ def log_call_event(data: dict):
     - pricing_found (bool)
     - sms_sent (bool)
     - transfer_attempted (bool)
+    - rule_ids (restriction rules matched by the FSM)
     """
-    event = {
-        "call_sid": data.get("call_sid"),
-        "store_id": data.get("store_id"),
-        "intent": data.get("intent"),
-        "response_type": data.get("response_type"),
-        "pricing_found": data.get("pricing_found", False),
-        "sms_sent": data.get("sms_sent", False),
-        "transfer_attempted": data.get("transfer_attempted", False),
-        "created_at": datetime.utcnow().isoformat()
-    }
+    event = build_call_event(data)
+
+    # Every event is already on disk; only a sample is echoed to the debug log
+    log_sampled("DEBUG", "Call event: {}", event)
 
-    print(f"DEBUG LOG: {json.dumps(event, indent=2)}")
+    # Buffered; the repository flushes batches to disk in the background
+    get_event_repository().append(event)
 
-    # Persistence to JSON file
-    logs = []
-    if LOGS_FILE.exists():
-        try:
-            with open(LOGS_FILE, "r") as f:
-                logs = json.load(f)
-        except:
-            logs = []
-    
-    logs.append(event)
-    
-    with open(LOGS_FILE, "w") as f:
-        json.dump(logs, f, indent=4)
+    # Rolling per-store aggregates served by /analytics
+    record_event(event)
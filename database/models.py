@@ -0,0 +1,35 @@
+from datetime import datetime
+from typing import Dict, Any
+
+# Fields persisted for every call event, in the order they are written
+CALL_EVENT_FIELDS = (
+    "call_sid",
+    "store_id",
+    "intent",
+    "response_type",
+    "pricing_found",
+    "sms_sent",
+    "transfer_attempted",
+    "rule_ids",
+    "created_at",
+)
+
+# Boolean flags default to False when the caller omits them
+CALL_EVENT_FLAGS = ("pricing_found", "sms_sent", "transfer_attempted")
+
+
+def build_call_event(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalizes raw event data into the stored call event shape.
+    """
+    event = {}
+    for field in CALL_EVENT_FIELDS:
+        if field in CALL_EVENT_FLAGS:
+            event[field] = data.get(field, False)
+        else:
+            event[field] = data.get(field)
+
+    if not event["created_at"]:
+        event["created_at"] = datetime.utcnow().isoformat()
+
+    return event
@@ -0,0 +1,392 @@
+import atexit
+import heapq
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+from loguru import logger
+
+from database.models import build_call_event
+from utils.cluster import WORKER_ID
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking is available
+    fcntl = None
+
+# Paths
+BASE_DIR = Path(__file__).resolve().parents[1]
+LOGS_DIR = BASE_DIR / "data" / "logs"
+EVENTS_DIR = Path(os.getenv("EVENT_STORE_DIR", str(LOGS_DIR / "events")))
+# Supervised workers each write their own segments here; see merge_worker_segments
+WORKERS_DIR = EVENTS_DIR / "workers"
+LEGACY_LOGS_FILE = LOGS_DIR / "call_events.json"
+
+ACTIVE_SEGMENT = "active.jsonl"
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+# Tuning (overridable via environment)
+SEGMENT_MAX_BYTES = int(os.getenv("EVENT_STORE_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+FLUSH_INTERVAL = float(os.getenv("EVENT_STORE_FLUSH_INTERVAL", "0.5"))
+FLUSH_BATCH_SIZE = int(os.getenv("EVENT_STORE_FLUSH_BATCH_SIZE", "500"))
+FSYNC_ON_FLUSH = os.getenv("EVENT_STORE_FSYNC", "false").lower() == "true"
+
+
+class CallEventRepository:
+    """
+    Append-only call event store backed by segmented JSONL files.
+
+    Events are buffered in memory and written in batches by a background
+    flusher thread. Each batch is a single O_APPEND write to the active
+    segment, so concurrent workers never overwrite each other's events.
+    When the active segment grows past SEGMENT_MAX_BYTES it is sealed by an
+    atomic rename to the next numbered segment.
+    """
+
+    def __init__(
+        self,
+        events_dir: Path = EVENTS_DIR,
+        segment_max_bytes: int = SEGMENT_MAX_BYTES,
+        flush_interval: float = FLUSH_INTERVAL,
+        batch_size: int = FLUSH_BATCH_SIZE,
+        fsync: bool = FSYNC_ON_FLUSH,
+        seal_on_close: bool = False,
+    ):
+        self.events_dir = Path(events_dir)
+        self.segment_max_bytes = segment_max_bytes
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.seal_on_close = seal_on_close
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+
+    @property
+    def active_path(self) -> Path:
+        return self.events_dir / ACTIVE_SEGMENT
+
+    @property
+    def lock_path(self) -> Path:
+        return self.events_dir / ".lock"
+
+    def append(self, event: Dict[str, Any]):
+        """
+        Queues an event for the next batch flush. Never touches the disk.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Event repository is closed")
+            self._buffer.append(event)
+            if self._flusher is None:
+                self._start_flusher()
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self):
+        """
+        Writes all buffered events to the active segment.
+        """
+        with self._cond:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._write_batch(batch)
+
+    def close(self):
+        """
+        Stops the flusher and persists anything still buffered.
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        with self._write_lock:
+            if self.seal_on_close and self.active_path.exists() and os.path.getsize(self.active_path):
+                # Hand the finished segment to merge_worker_segments
+                with _FileLock(self.lock_path):
+                    self._ensure_active_fd()
+                    self._rotate()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _start_flusher(self):
+        self._flusher = threading.Thread(target=self._flush_loop, name="call-event-flusher", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Call event flush failed: {e}")
+            if closed:
+                return
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        payload = "".join(json.dumps(event, separators=(",", ":")) + "\n" for event in batch).encode("utf-8")
+
+        with self._write_lock:
+            self.events_dir.mkdir(parents=True, exist_ok=True)
+            with _FileLock(self.lock_path):
+                fd = self._ensure_active_fd()
+                os.write(fd, payload)
+                if self.fsync:
+                    os.fsync(fd)
+                if os.fstat(fd).st_size >= self.segment_max_bytes:
+                    self._rotate()
+
+    def _ensure_active_fd(self) -> int:
+        """
+        Returns an fd for the current active segment, reopening it if another
+        worker has rotated the file out from under us.
+        """
+        if self._fd is not None:
+            try:
+                current = os.stat(self.active_path)
+                opened = os.fstat(self._fd)
+                if (current.st_ino, current.st_dev) == (opened.st_ino, opened.st_dev):
+                    return self._fd
+            except FileNotFoundError:
+                pass
+            os.close(self._fd)
+            self._fd = None
+
+        self._fd = os.open(self.active_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        _truncate_partial_tail(self.active_path, self._fd)
+        return self._fd
+
+    def _rotate(self):
+        """
+        Seals the active segment. The rename is atomic, so a crash leaves
+        either the old active file or a sealed segment, never half of each.
+        """
+        sealed = self.events_dir / f"{SEGMENT_PREFIX}{self._next_segment_number():06d}{SEGMENT_SUFFIX}"
+        if self.fsync:
+            os.fsync(self._fd)
+        os.rename(self.active_path, sealed)
+        os.close(self._fd)
+        self._fd = None
+        logger.info(f"Sealed call event segment {sealed.name}")
+
+    def _next_segment_number(self) -> int:
+        numbers = [_segment_number(p) for p in self.sealed_segments()]
+        return max(numbers, default=0) + 1
+
+    def sealed_segments(self) -> List[Path]:
+        if not self.events_dir.exists():
+            return []
+        segments = self.events_dir.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")
+        return sorted(segments, key=_segment_number)
+
+    def segments(self) -> List[Path]:
+        """
+        All segment files in write order, active segment last.
+        """
+        segments = self.sealed_segments()
+        if self.active_path.exists():
+            segments.append(self.active_path)
+        return segments
+
+    def iter_events(self) -> Iterator[Dict[str, Any]]:
+        """
+        Streams persisted events one at a time without loading whole files.
+        """
+        for segment in self.segments():
+            yield from _iter_segment(segment)
+
+    def migrate_legacy_json(self, legacy_file: Path = LEGACY_LOGS_FILE) -> int:
+        """
+        Imports the old single-array call_events.json into segments and
+        renames it to call_events.json.migrated so it is not imported twice.
+        """
+        legacy_file = Path(legacy_file)
+        if not legacy_file.exists():
+            return 0
+
+        with open(legacy_file, "r") as f:
+            legacy_events = json.load(f)
+
+        batch = [build_call_event(event) for event in legacy_events]
+        for start in range(0, len(batch), self.batch_size):
+            self._write_batch(batch[start:start + self.batch_size])
+
+        legacy_file.rename(legacy_file.with_name(legacy_file.name + ".migrated"))
+        logger.success(f"Migrated {len(batch)} events from {legacy_file.name}")
+        return len(batch)
+
+
+def merge_worker_segments(events_dir: Path = EVENTS_DIR, include_active: bool = False) -> int:
+    """
+    Folds the per-worker segments written under api.workers into the main
+    event store, interleaved by created_at, and deletes them once written.
+    Workers seal their active segment on shutdown; include_active also takes
+    active segments left by crashed workers and must only be used while no
+    workers are running. Returns the number of events merged.
+    """
+    workers_dir = Path(events_dir) / WORKERS_DIR.name
+    if not workers_dir.is_dir():
+        return 0
+
+    segments: List[Path] = []
+    streams = []
+    for worker_dir in sorted(p for p in workers_dir.iterdir() if p.is_dir()):
+        worker_repository = CallEventRepository(events_dir=worker_dir)
+        worker_segments = worker_repository.segments() if include_active else worker_repository.sealed_segments()
+        if worker_segments:
+            segments.extend(worker_segments)
+            # Each worker's segments are already in write order
+            streams.append(event for segment in worker_segments for event in _iter_segment(segment))
+
+    repository = CallEventRepository(events_dir=events_dir)
+    merged = 0
+    batch: List[Dict[str, Any]] = []
+    for event in heapq.merge(*streams, key=lambda event: event.get("created_at") or ""):
+        batch.append(event)
+        if len(batch) >= repository.batch_size:
+            repository._write_batch(batch)
+            merged += len(batch)
+            batch = []
+    if batch:
+        repository._write_batch(batch)
+        merged += len(batch)
+    repository.close()
+
+    for segment in segments:
+        segment.unlink()
+    if merged:
+        logger.info(f"Merged {merged} events from {len(segments)} worker segments")
+    return merged
+
+
+def _iter_segment(segment: Path) -> Iterator[Dict[str, Any]]:
+    with open(segment, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                # Torn tail from an interrupted write
+                break
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping corrupt event line in {segment.name}")
+
+
+class _FileLock:
+    """
+    Cross-process advisory lock around segment writes and rotation.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+def _segment_number(path: Path) -> int:
+    return int(path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+def _truncate_partial_tail(path: Path, fd: int):
+    """
+    Drops a torn last line left behind by a crash mid-write. The file is
+    scanned backwards in 64KB blocks until the last complete line is found,
+    so a torn line longer than one block never takes intact events with it.
+    """
+    size = os.fstat(fd).st_size
+    if size == 0:
+        return
+    block = 64 * 1024
+    keep = 0
+    with open(path, "rb") as f:
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        end = size
+        while end > 0:
+            start = max(0, end - block)
+            f.seek(start)
+            last_newline = f.read(end - start).rfind(b"\n")
+            if last_newline >= 0:
+                keep = start + last_newline + 1
+                break
+            end = start
+    os.ftruncate(fd, keep)
+    logger.warning(f"Truncated torn tail of {path.name} ({size - keep} bytes)")
+
+
+_repository: Optional[CallEventRepository] = None
+_repository_lock = threading.Lock()
+
+
+def get_event_repository() -> CallEventRepository:
+    """
+    Returns the process-wide event repository, creating it on first use.
+    A worker supervised by api.workers gets its own segment directory, so
+    workers never contend for the segment lock.
+    """
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                if WORKER_ID is not None:
+                    _repository = CallEventRepository(events_dir=WORKERS_DIR / f"worker-{WORKER_ID}", seal_on_close=True)
+                else:
+                    _repository = CallEventRepository()
+    return _repository
+
+
+def close_event_repository():
+    """
+    Flushes and closes the process-wide repository (on app shutdown/exit).
+    """
+    global _repository
+    with _repository_lock:
+        if _repository is not None:
+            _repository.close()
+            _repository = None
+
+
+atexit.register(close_event_repository)
+
+
+if __name__ == "__main__":
+    # Usage: python -m database.repository migrate [path/to/call_events.json]
+    #        python -m database.repository merge-workers [--include-active]
+    if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
+        source = Path(sys.argv[2]) if len(sys.argv) > 2 else LEGACY_LOGS_FILE
+        repository = get_event_repository()
+        count = repository.migrate_legacy_json(source)
+        close_event_repository()
+        print(f"Migrated {count} events into {repository.events_dir}")
+    elif len(sys.argv) >= 2 and sys.argv[1] == "merge-workers":
+        count = merge_worker_segments(include_active="--include-active" in sys.argv)
+        print(f"Merged {count} worker events into {EVENTS_DIR}")
+    else:
+        print("Usage: python -m database.repository migrate [legacy_json_path] | merge-workers [--include-active]")
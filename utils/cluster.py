@@ -0,0 +1,140 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+# Paths
+BASE_DIR = Path(__file__).resolve().parents[1]
+RUN_DIR = BASE_DIR / "data" / "run"
+
+# Set by api.workers for each worker process it supervises
+WORKER_ID = os.getenv("WORKER_ID")
+SNAPSHOT_FILE = Path(os.getenv("CONFIG_SNAPSHOT_FILE", str(RUN_DIR / "config_snapshot.bin")))
+SNAPSHOT_ENABLED = os.getenv("CONFIG_SNAPSHOT", "false").lower() == "true"
+
+# magic, version, length of the JSON section index that follows
+_MAGIC = b"CFGSNAP1"
+_HEADER = struct.Struct("<8sQI")
+
+
+def per_worker_path(path: Path) -> Path:
+    """
+    Gives each supervised worker its own copy of a per-process file:
+    data/logs/x.json -> data/logs/x.worker-2.json. Unchanged outside api.workers.
+    """
+    path = Path(path)
+    if WORKER_ID is None:
+        return path
+    return path.with_name(f"{path.stem}.worker-{WORKER_ID}{path.suffix}")
+
+
+def write_snapshot(sections: Dict[str, Any], path: Path = SNAPSHOT_FILE) -> int:
+    """
+    Publishes read-only config as one file: a fixed header, a JSON index of
+    section offsets, then each section as compact JSON. The file is replaced
+    atomically, so workers still mapping the previous version keep reading
+    it until they remap. Returns the new version number.
+    """
+    path = Path(path)
+    version = snapshot_version(path) + 1
+
+    payloads = {name: json.dumps(value, separators=(",", ":")).encode("utf-8") for name, value in sections.items()}
+    index, offset = {}, 0
+    for name, payload in payloads.items():
+        index[name] = [offset, len(payload)]
+        offset += len(payload)
+    index_bytes = json.dumps(index, separators=(",", ":")).encode("utf-8")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, version, len(index_bytes)))
+        f.write(index_bytes)
+        for payload in payloads.values():
+            f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return version
+
+
+def snapshot_version(path: Path = SNAPSHOT_FILE) -> int:
+    try:
+        with open(path, "rb") as f:
+            magic, version, _ = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return 0
+    return version if magic == _MAGIC else 0
+
+
+class ConfigSnapshot:
+    """
+    A published snapshot mapped read-only into this process.
+
+    Every worker maps the same file, so the bytes live once in the page
+    cache; a worker only decodes the sections it actually uses, once per
+    version.
+    """
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity: Tuple[int, int] = (stat.st_ino, stat.st_mtime_ns)
+
+        magic, self.version, index_length = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a config snapshot")
+        index_end = _HEADER.size + index_length
+        self._index: Dict[str, List[int]] = json.loads(self._map[_HEADER.size:index_end])
+        self._data_start = index_end
+        self._sections: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def section(self, name: str, default: Any = None) -> Any:
+        with self._lock:
+            if name not in self._sections:
+                if name not in self._index:
+                    return default
+                offset, length = self._index[name]
+                start = self._data_start + offset
+                self._sections[name] = json.loads(self._map[start:start + length])
+            return self._sections[name]
+
+
+_snapshot: Optional[ConfigSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def get_config_snapshot() -> Optional[ConfigSnapshot]:
+    """
+    The latest published snapshot, or None when this process reads config
+    files directly (the default outside api.workers). Callers only ask when
+    reloading, so the file is stat-ed on every call.
+    """
+    global _snapshot
+    if not SNAPSHOT_ENABLED:
+        return None
+    with _snapshot_lock:
+        try:
+            stat = os.stat(SNAPSHOT_FILE)
+        except FileNotFoundError:
+            logger.error(f"Config snapshot {SNAPSHOT_FILE} is missing; keeping the last one mapped")
+            return _snapshot
+        if _snapshot is None or _snapshot.identity != (stat.st_ino, stat.st_mtime_ns):
+            # The previous mapping is released once nothing references it
+            _snapshot = ConfigSnapshot(SNAPSHOT_FILE)
+        return _snapshot
+
+
+def config_sources(*paths: Path) -> List[Path]:
+    """
+    Files a config loader should watch: its own sources, or just the
+    snapshot when the supervisor publishes config for it.
+    """
+    return [SNAPSHOT_FILE] if SNAPSHOT_ENABLED else list(paths)
@@ -0,0 +1,167 @@
+"""
+Sync/async boundary for the webhook handlers.
+
+Handlers run on the event loop and should not block it: Twilio and session
+I/O are awaited natively, and the known blocking operations (call warmup,
+/admin/reload, spool appends) go through run_blocking, which runs them on a
+dedicated, bounded thread pool so a burst of them cannot starve the
+default executor or pile up threads. A config file edited on disk is still
+rebuilt by whichever turn first notices it, on the loop.
+
+With ASYNC_DEBUG=true a watchdog thread pings the event loop and logs the
+loop thread's stack whenever a ping waits longer than
+ASYNC_BLOCKING_THRESHOLD_MS, which points straight at the blocking call.
+"""
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Optional, TypeVar
+import anyio
+from anyio import to_thread
+from loguru import logger
+from utils.metrics import record_stage
+
+T = TypeVar("T")
+
+# Tuning (overridable via environment)
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "16"))
+ASYNC_DEBUG = os.getenv("ASYNC_DEBUG", "false").lower() == "true"
+BLOCKING_THRESHOLD_MS = float(os.getenv("ASYNC_BLOCKING_THRESHOLD_MS", "100"))
+
+_limiter: Optional[anyio.CapacityLimiter] = None
+_limiter_loop = None
+
+
+def _get_limiter() -> anyio.CapacityLimiter:
+    # A limiter belongs to the event loop that created it
+    global _limiter, _limiter_loop
+    loop = asyncio.get_running_loop()
+    if _limiter is None or _limiter_loop is not loop:
+        _limiter = anyio.CapacityLimiter(BLOCKING_POOL_SIZE)
+        _limiter_loop = loop
+    return _limiter
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Runs a blocking callable on the bounded pool and awaits its result.
+    The caller's context variables (CallSid log context, request metrics)
+    carry over into the worker thread.
+    """
+    if kwargs:
+        func = functools.partial(func, **kwargs)
+    return await to_thread.run_sync(func, *args, limiter=_get_limiter())
+
+
+async def warm_blocking_pool():
+    """
+    Creates the pool's limiter and first thread at startup, so the first
+    request does not pay for anyio's backend import on the event loop.
+    """
+    await run_blocking(lambda: None)
+
+
+def blocking_pool_stats() -> Dict[str, Any]:
+    limiter = _limiter
+    if limiter is None:
+        return {"size": BLOCKING_POOL_SIZE, "in_use": 0, "waiting": 0}
+    stats = limiter.statistics()
+    return {"size": BLOCKING_POOL_SIZE, "in_use": stats.borrowed_tokens, "waiting": stats.tasks_waiting}
+
+
+class BlockingCallDetector:
+    """
+    Watchdog for the event loop. Every interval it schedules a no-op on the
+    loop; if that no-op has not run within the threshold, something is
+    holding the loop, and the loop thread's current stack is logged.
+    Each stall is reported once, with its full duration.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, threshold_ms: float = BLOCKING_THRESHOLD_MS):
+        self.loop = loop
+        self.threshold = threshold_ms / 1000
+        self.interval = max(self.threshold / 2, 0.01)
+        self.detections = 0
+        self.max_blocked_ms = 0.0
+        self._loop_thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        Must be called from the loop's own thread.
+        """
+        self._loop_thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="event-loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            answered = threading.Event()
+            sent = time.perf_counter()
+            try:
+                self.loop.call_soon_threadsafe(answered.set)
+            except RuntimeError:
+                return  # loop closed
+            if answered.wait(self.threshold):
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>\n"
+            while not answered.wait(self.interval):
+                if self._stop.is_set() or self.loop.is_closed():
+                    return
+            blocked_ms = (time.perf_counter() - sent) * 1000
+            self.detections += 1
+            self.max_blocked_ms = max(self.max_blocked_ms, blocked_ms)
+            record_stage("event_loop_blocked", blocked_ms / 1000)
+            logger.warning(
+                f"Event loop blocked for {blocked_ms:.0f}ms (threshold {self.threshold * 1000:.0f}ms); "
+                f"loop thread was at:\n{stack}"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "detections": self.detections,
+            "max_blocked_ms": round(self.max_blocked_ms, 1),
+        }
+
+
+_detector: Optional[BlockingCallDetector] = None
+
+
+def start_blocking_detector(threshold_ms: float = BLOCKING_THRESHOLD_MS, force: bool = False) -> Optional[BlockingCallDetector]:
+    """
+    Starts the watchdog on the running loop when ASYNC_DEBUG is set (or
+    when forced, e.g. by a benchmark).
+    """
+    global _detector
+    if not (ASYNC_DEBUG or force):
+        return None
+    stop_blocking_detector()
+    _detector = BlockingCallDetector(asyncio.get_running_loop(), threshold_ms)
+    _detector.start()
+    logger.info(f"Blocking-call detector on: reporting event loop stalls over {threshold_ms:.0f}ms")
+    return _detector
+
+
+def stop_blocking_detector():
+    global _detector
+    if _detector is not None:
+        _detector.stop()
+        _detector = None
+
+
+def get_concurrency_stats() -> Dict[str, Any]:
+    return {
+        "blocking_pool": blocking_pool_stats(),
+        "blocking_detector": _detector.stats() if _detector is not None else None,
+    }
@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Dict, Optional
+
+# Minimum seconds between mtime checks on the hot path
+DEFAULT_CHECK_INTERVAL = float(os.getenv("CONFIG_CHECK_INTERVAL", "2.0"))
+
+_config_version = 0
+_version_lock = threading.Lock()
+
+
+def get_config_version() -> int:
+    """
+    Monotonic counter bumped whenever any cached config is reloaded.
+    """
+    return _config_version
+
+
+def bump_config_version() -> int:
+    global _config_version
+    with _version_lock:
+        _config_version += 1
+        return _config_version
+
+
+class FileWatcher:
+    """
+    Detects changes to a set of files by mtime, stat-ing them at most once
+    per check_interval so callers can poll it on every request.
+    """
+
+    def __init__(self, paths: Iterable[Path], check_interval: float = DEFAULT_CHECK_INTERVAL):
+        self.paths = [Path(p) for p in paths]
+        self.check_interval = check_interval
+        self._mtimes = self._snapshot()
+        self._next_check = time.monotonic() + check_interval
+
+    def _snapshot(self) -> Dict[Path, Optional[int]]:
+        mtimes = {}
+        for path in self.paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def changed(self) -> bool:
+        """
+        True once per modification (including files appearing or disappearing).
+        """
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+
+        current = self._snapshot()
+        if current == self._mtimes:
+            return False
+        self._mtimes = current
+        return True
+
+    def reset(self):
+        """
+        Records the current mtimes as seen, e.g. after a forced reload.
+        """
+        self._mtimes = self._snapshot()
+        self._next_check = time.monotonic() + self.check_interval
@@ -0,0 +1,255 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+from loguru import logger
+from utils.metrics import register_collector, label_request
+
+# Tuning (overridable via environment)
+IDEMPOTENCY_ENABLED = os.getenv("WEBHOOK_IDEMPOTENCY", "true").lower() == "true"
+# How long a finished reply is replayed to retries of the same request
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("WEBHOOK_IDEMPOTENCY_TTL_SECONDS", "300"))
+# ...or, for requests without Twilio's token, keyed on the form alone; kept short
+# because a caller can say the same thing twice ("yes", then "yes" again)
+IDEMPOTENCY_FORM_TTL_SECONDS = int(os.getenv("WEBHOOK_IDEMPOTENCY_FORM_TTL_SECONDS", "30"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("WEBHOOK_IDEMPOTENCY_MAX_ENTRIES", "20000"))
+# How long a retry waits on another worker's copy of the request (Twilio gives up after 15s)
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("WEBHOOK_IDEMPOTENCY_WAIT_SECONDS", "15"))
+# Shared replies across workers; defaults to the session backend
+IDEMPOTENCY_BACKEND_URL = os.getenv("WEBHOOK_IDEMPOTENCY_BACKEND_URL", os.getenv("SESSION_BACKEND_URL"))
+
+# Twilio sends the same token on every retry of a webhook request
+IDEMPOTENCY_HEADER = "I-Twilio-Idempotency-Token"
+
+_POLL_SECONDS = 0.05
+
+
+class MemoryReplyBackend:
+    """
+    Per-process finished replies: a bounded LRU with per-entry expiry.
+    Requests still running are tracked by WebhookDedup itself.
+    """
+
+    def __init__(self, max_entries: int = IDEMPOTENCY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        # Only this process can be handling the request
+        return True
+
+    async def put(self, key: str, content: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, content)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def release(self, key: str):
+        pass
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisReplyBackend:
+    """
+    Replies shared by every worker. A request being handled holds an empty
+    marker (SET NX, expiring after the wait window) until its reply
+    replaces it. Requires the optional `redis` package; when Redis is
+    unreachable, requests are simply handled as if they were new.
+    """
+
+    def __init__(self, url: str, prefix: str = "webhook_reply:"):
+        import redis.asyncio  # optional dependency
+        self._client = redis.asyncio.Redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            return (await self._client.get(self.prefix + key)) or None
+        except Exception as e:
+            logger.warning(f"Webhook reply lookup failed: {e}")
+            return None
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        try:
+            return bool(await self._client.set(self.prefix + key, b"", nx=True, ex=max(int(ttl), 1)))
+        except Exception as e:
+            logger.warning(f"Webhook reply claim failed: {e}")
+            return True
+
+    async def put(self, key: str, content: bytes, ttl: int):
+        try:
+            await self._client.set(self.prefix + key, content, ex=ttl)
+        except Exception as e:
+            logger.warning(f"Webhook reply store failed: {e}")
+
+    async def release(self, key: str):
+        try:
+            await self._client.delete(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Webhook reply release failed: {e}")
+
+
+def webhook_key(path: str, headers, form_data) -> str:
+    """
+    CallSid plus a fingerprint of the request: Twilio's idempotency token
+    when it sends one, else a hash of the form (identical on a retry).
+    """
+    fingerprint = headers.get(IDEMPOTENCY_HEADER)
+    if not fingerprint:
+        digest = hashlib.sha256()
+        for name, value in sorted(form_data.multi_items()):
+            digest.update(f"{name}={value}\n".encode("utf-8"))
+        fingerprint = digest.hexdigest()[:32]
+    return f"{path}:{form_data.get('CallSid', '')}:{fingerprint}"
+
+
+class WebhookDedup:
+    """
+    Runs each webhook request once. A retry arriving while the original
+    is still being handled waits for its reply, one arriving afterwards
+    gets the stored TwiML bytes, so a Twilio timeout never sends the
+    booking SMS or dials staff a second time.
+    """
+
+    def __init__(self, backend, ttl: int = IDEMPOTENCY_TTL_SECONDS, wait: float = IDEMPOTENCY_WAIT_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self.wait = wait
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"handled": 0, "replayed": 0, "joined": 0, "failed": 0}
+
+    async def run(self, key: str, handle: Callable[[], Awaitable[bytes]], ttl: Optional[int] = None) -> bytes:
+        future = self._inflight.get(key)
+        if future is not None:
+            # The same worker is still handling the original
+            self.stats["joined"] += 1
+            label_request(response_type="duplicate")
+            logger.info(f"Retry of in-flight webhook {key}; waiting for its reply")
+            return await asyncio.shield(future)
+
+        # Registered before any await, so a retry landing meanwhile joins this one
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            content = await self.backend.get(key)
+            outcome = "replayed"
+            if content is None and not await self.backend.claim(key, self.wait):
+                # Another worker has the original
+                content = await self._wait_for_other_worker(key)
+                outcome = "joined"
+            if content is not None:
+                self.stats[outcome] += 1
+                label_request(response_type="duplicate")
+                logger.info(f"Retry of webhook {key} answered with the original's reply ({outcome})")
+            else:
+                content = await handle()
+                self.stats["handled"] += 1
+                await self.backend.put(key, content, ttl or self.ttl)
+        except BaseException as e:
+            # Retries waiting on this request fail with it; the next one starts afresh
+            self.stats["failed"] += 1
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                future.exception()  # retrieved, even if no retry was waiting
+            else:
+                future.cancel()
+            await self.backend.release(key)
+            raise
+        else:
+            future.set_result(content)
+            return content
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _wait_for_other_worker(self, key: str) -> Optional[bytes]:
+        deadline = time.monotonic() + self.wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(_POLL_SECONDS)
+            content = await self.backend.get(key)
+            if content is not None:
+                return content
+        logger.warning(f"Webhook {key} never finished on the worker that claimed it; handling the retry")
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        backend = self.backend
+        return {
+            **self.stats,
+            "in_flight": len(self._inflight),
+            "backend": "memory" if isinstance(backend, MemoryReplyBackend) else "redis",
+            "entries": len(backend) if isinstance(backend, MemoryReplyBackend) else None,
+            "ttl_seconds": self.ttl,
+        }
+
+
+def _create_backend():
+    if IDEMPOTENCY_BACKEND_URL:
+        try:
+            return RedisReplyBackend(IDEMPOTENCY_BACKEND_URL)
+        except Exception as e:
+            logger.error(f"Webhook reply backend {IDEMPOTENCY_BACKEND_URL} unavailable, using in-memory replies: {e}")
+    return MemoryReplyBackend()
+
+
+_dedup = None
+_dedup_lock = threading.Lock()
+
+
+def get_webhook_dedup() -> Optional[WebhookDedup]:
+    global _dedup
+    if not IDEMPOTENCY_ENABLED:
+        return None
+    if _dedup is None:
+        with _dedup_lock:
+            if _dedup is None:
+                _dedup = WebhookDedup(_create_backend())
+    return _dedup
+
+
+async def idempotent_reply(request, form_data, handle: Callable[[], Awaitable[bytes]]) -> bytes:
+    """
+    The TwiML for a webhook request, handling it only if this exact request
+    (same CallSid and fingerprint) has not been seen within the TTL.
+    """
+    dedup = get_webhook_dedup()
+    if dedup is None:
+        return await handle()
+    ttl = None if request.headers.get(IDEMPOTENCY_HEADER) else IDEMPOTENCY_FORM_TTL_SECONDS
+    return await dedup.run(webhook_key(request.url.path, request.headers, form_data), handle, ttl)
+
+
+def _render_metrics() -> List[str]:
+    if _dedup is None:
+        return []
+    summary = _dedup.summary()
+    lines = []
+    for name, help_text in (
+        ("handled", "Webhook requests handled for the first time."),
+        ("replayed", "Webhook retries answered with the stored reply."),
+        ("joined", "Webhook retries that waited for the original request."),
+    ):
+        lines += [
+            f"# HELP webhook_idempotency_{name}_total {help_text}",
+            f"# TYPE webhook_idempotency_{name}_total counter",
+            f"webhook_idempotency_{name}_total {summary[name]}",
+        ]
+    return lines
+
+
+register_collector(_render_metrics)
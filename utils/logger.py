@@ -0,0 +1,119 @@
+import json
+import os
+import random
+import sys
+import traceback
+from contextvars import ContextVar
+from typing import Dict, Optional
+from loguru import logger
+
+# Tuning (overridable via environment)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # "text" or "json" (one JSON object per line)
+LOG_ENQUEUE = os.getenv("LOG_ENQUEUE", "true").lower() == "true"
+# Fraction of high-volume debug events (e.g. every call event) actually emitted
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+
+TEXT_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "{extra[call_sid]} {extra[store_id]} | <cyan>{name}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+)
+
+# Per-request call context; asyncio tasks and threadpool calls each get their own copy
+_call_context: ContextVar[Dict[str, str]] = ContextVar("call_context", default={})
+
+_configured = False
+_min_level_no = logger.level(LOG_LEVEL).no
+_level_nos: Dict[str, int] = {}
+
+
+def _add_call_context(record):
+    context = _call_context.get()
+    extra = record["extra"]
+    extra.setdefault("call_sid", context.get("call_sid", "-"))
+    extra.setdefault("store_id", context.get("store_id", "-"))
+
+
+def _json_format(record) -> str:
+    # Compact one-line JSON; loguru's serialize=True dumps the whole record
+    payload = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "call_sid": record["extra"]["call_sid"],
+        "store_id": record["extra"]["store_id"],
+        "logger": f"{record['name']}:{record['line']}",
+        "message": record["message"],
+    }
+    if record["exception"] is not None:
+        payload["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    record["extra"]["_json"] = json.dumps(payload, default=str)
+    return "{extra[_json]}\n"
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, enqueue: bool = LOG_ENQUEUE, sink=None):
+    """
+    Replaces loguru's default synchronous stderr sink with one that is
+    queue-backed (records are written by a background thread, so request
+    handlers never block on the terminal or log pipe) and tagged with the
+    current CallSid/store_id. Safe to call again to change settings.
+    """
+    global _configured, _min_level_no
+    logger.remove()
+    logger.configure(patcher=_add_call_context)
+    logger.add(
+        sink or sys.stderr,
+        level=level,
+        enqueue=enqueue,
+        format=_json_format if fmt == "json" else TEXT_FORMAT,
+        backtrace=False,
+        diagnose=False,
+    )
+    _min_level_no = logger.level(level).no
+    _configured = True
+
+
+def shutdown_logging():
+    """
+    Drains queued records before the process exits.
+    """
+    if _configured:
+        logger.complete()
+        logger.remove()
+
+
+def set_call_context(call_sid: Optional[str] = None, store_id: Optional[str] = None):
+    """
+    Tags every log line for the rest of this request with the call's identifiers.
+    """
+    context = dict(_call_context.get())
+    if call_sid:
+        context["call_sid"] = call_sid
+    if store_id:
+        context["store_id"] = store_id
+    _call_context.set(context)
+
+
+def get_call_context() -> Dict[str, str]:
+    return _call_context.get()
+
+
+def is_enabled(level: str) -> bool:
+    """
+    Cheap level check for callers that would otherwise build an expensive message.
+    """
+    level_no = _level_nos.get(level)
+    if level_no is None:
+        level_no = _level_nos[level] = logger.level(level).no
+    return level_no >= _min_level_no
+
+
+def log_sampled(level: str, message: str, *args, rate: float = None, **kwargs):
+    """
+    Logs only a random fraction of calls; for events too frequent to log every time.
+    Messages use loguru's brace style so arguments are only formatted if emitted.
+    """
+    if rate is None:
+        rate = LOG_SAMPLE_RATE
+    if rate <= 0 or not is_enabled(level) or (rate < 1 and random.random() >= rate):
+        return
+    logger.opt(depth=1).log(level, message, *args, **kwargs)
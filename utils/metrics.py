@@ -0,0 +1,252 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
+from utils.logger import get_call_context
+
+# Latency buckets in seconds; Twilio gives webhooks about 15s, most stages take milliseconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Request header that asks for a Server-Timing breakdown on the response
+TRACE_HEADER = os.getenv("METRICS_TRACE_HEADER", "X-Trace-Timing").lower().encode("latin-1")
+# Add Server-Timing to every response, not just traced ones
+TRACE_ALL = os.getenv("METRICS_TRACE_ALL", "false").lower() == "true"
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram keyed by label values, in the shape
+    Prometheus expects.
+    """
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, labels: Tuple[str, ...]):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], List[Any]]:
+        with self._lock:
+            return {labels: [list(series[0]), series[1], series[2]] for labels, series in self._series.items()}
+
+    def quantile(self, counts: List[int], total: int, q: float) -> Optional[float]:
+        """
+        Estimates a quantile by linear interpolation inside its bucket.
+        """
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total_seconds, total) in sorted(self.snapshot().items()):
+            label_text = ",".join(f'{name}="{_escape_label(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label_text},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total_seconds}")
+            lines.append(f"{self.name}_count{{{label_text}}} {total}")
+        return lines
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Webhook and API request latency.",
+    ("method", "path", "status", "store_id", "response_type"),
+)
+STAGE_DURATION = Histogram(
+    "stage_duration_seconds",
+    "Time spent in each instrumented stage of request handling.",
+    ("stage", "store_id"),
+)
+
+# Stage timings of the request being handled, for the Server-Timing header
+_request_trace: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_trace", default=None)
+
+
+def _store_label() -> str:
+    return get_call_context().get("store_id", "unknown")
+
+
+def record_stage(stage: str, seconds: float):
+    STAGE_DURATION.observe(seconds, (stage, _store_label()))
+    trace = _request_trace.get()
+    if trace is not None:
+        trace["stages"].append((stage, seconds))
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Times a block of code as one stage: `with stage("parse_form"): ...`
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    """
+    Decorator that records each call of a (sync or async) function as a stage.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    record_stage(name, time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_stage(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def label_request(**labels: str):
+    """
+    Attaches labels (store_id, response_type) to the current request's metrics.
+    """
+    trace = _request_trace.get()
+    if trace is not None:
+        trace["labels"].update(labels)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request. The handler labels the
+    request with its store and response type; a request carrying the trace
+    header (or every request, with METRICS_TRACE_ALL) gets a Server-Timing
+    response header with the per-stage breakdown.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trace = {"stages": [], "labels": {}}
+        token = _request_trace.set(trace)
+        wants_trace = TRACE_ALL or any(name == TRACE_HEADER for name, _ in scope.get("headers", ()))
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if wants_trace:
+                    timing = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in trace["stages"]]
+                    timing.append(f"total;dur={(time.perf_counter() - start) * 1000:.2f}")
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", ", ".join(timing).encode("latin-1"))
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_trace.reset(token)
+            # Label by route template so path parameters don't explode cardinality
+            template = getattr(scope.get("route"), "path", None)
+            if template is None:
+                path = "unmatched"
+            else:
+                path = template if "{" in template else scope["path"]
+            labels = trace["labels"]
+            REQUEST_DURATION.observe(time.perf_counter() - start, (
+                scope["method"],
+                path,
+                str(status["code"]),
+                labels.get("store_id", "none"),
+                labels.get("response_type", "none"),
+            ))
+
+
+# Other modules' metrics, each rendered as Prometheus text lines
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def register_collector(render: Callable[[], List[str]]):
+    """
+    Adds a callable whose lines are appended to the /metrics output.
+    """
+    _collectors.append(render)
+
+
+def render_prometheus() -> str:
+    lines = REQUEST_DURATION.render() + STAGE_DURATION.render()
+    for render in _collectors:
+        lines += render()
+    return "\n".join(lines) + "\n"
+
+
+def latency_summary() -> Dict[str, Any]:
+    """
+    p50/p90/p99 estimates (milliseconds) per request route and per stage.
+    """
+    summary = {}
+    for histogram, key_fields in ((REQUEST_DURATION, ("method", "path")), (STAGE_DURATION, ("stage",))):
+        grouped: Dict[str, List[Any]] = {}
+        for labels, (counts, total_seconds, total) in histogram.snapshot().items():
+            named = dict(zip(histogram.label_names, labels))
+            key = " ".join(named[field] for field in key_fields)
+            entry = grouped.setdefault(key, [[0] * len(counts), 0.0, 0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total_seconds
+            entry[2] += total
+        summary[histogram.name] = {
+            key: {
+                "count": total,
+                "mean_ms": round(total_seconds / total * 1000, 3) if total else None,
+                **{
+                    f"p{int(q * 100)}_ms": round(histogram.quantile(counts, total, q) * 1000, 3)
+                    for q in (0.5, 0.9, 0.99)
+                },
+            }
+            for key, (counts, total_seconds, total) in sorted(grouped.items())
+        }
+    return summary
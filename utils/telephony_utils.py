@@ -0,0 +1,30 @@
+import re
+
+# Country code assumed for national numbers without one (NANP)
+DEFAULT_COUNTRY_CODE = "1"
+
+_NON_DIGITS = re.compile(r"\D")
+
+def normalize_phone_number(number: str) -> str:
+    """
+    Normalizes a phone number to E.164 so differently formatted DIDs compare equal.
+    "(757) 837-0990", "757-837-0990" and "+1 757 837 0990" all become "+17578370990".
+    Numbers that cannot be qualified are returned as bare digits.
+    """
+    if not number:
+        return ""
+
+    number = number.strip()
+    digits = _NON_DIGITS.sub("", number)
+    if not digits:
+        return number
+
+    if number.startswith("+"):
+        return f"+{digits}"
+    if digits.startswith("00"):
+        return f"+{digits[2:]}"
+    if len(digits) == 10 and DEFAULT_COUNTRY_CODE == "1":
+        return f"+1{digits}"
+    if len(digits) == 11 and digits.startswith(DEFAULT_COUNTRY_CODE):
+        return f"+{digits}"
+    return digits
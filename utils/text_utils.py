@@ -0,0 +1,169 @@
+import re
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+# Words, numbers with an optional decimal part ("12.9") and ordinals ("3rd")
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+UNITS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11,
+    "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16,
+    "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+TENS = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90}
+ORDINALS = {
+    "first": "1st", "second": "2nd", "third": "3rd", "fourth": "4th", "fifth": "5th",
+    "sixth": "6th", "seventh": "7th", "eighth": "8th", "ninth": "9th", "tenth": "10th",
+}
+
+# Speech recognition often splits brand names into separate words
+COMPOUND_WORDS = {
+    ("i", "phone"): "iphone",
+    ("i", "pad"): "ipad",
+    ("play", "station"): "playstation",
+    ("joy", "con"): "joycon",
+    ("mac", "book"): "macbook",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases and splits text into word/number tokens, dropping punctuation.
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
+def normalize_tokens(tokens: Sequence[str]) -> List[str]:
+    """
+    Canonicalizes spoken forms so they line up with catalog names:
+    number words become digits ("thirteen" -> "13", "twenty one" -> "21",
+    "twelve point nine" -> "12.9"), ordinals become "3rd" style and split
+    brand names are joined ("i phone" -> "iphone").
+    """
+    out: List[str] = []
+    i = 0
+    n = len(tokens)
+    while i < n:
+        token = tokens[i]
+        pair = (token, tokens[i + 1]) if i + 1 < n else None
+
+        if pair in COMPOUND_WORDS:
+            out.append(COMPOUND_WORDS[pair])
+            i += 2
+            continue
+
+        if token in ORDINALS:
+            out.append(ORDINALS[token])
+            i += 1
+            continue
+
+        if token in TENS or token in UNITS:
+            value = TENS.get(token, UNITS.get(token))
+            i += 1
+            if token in TENS and i < n and tokens[i] in UNITS and 0 < UNITS[tokens[i]] < 10:
+                value += UNITS[tokens[i]]
+                i += 1
+            number = str(value)
+            if i + 1 < n and tokens[i] == "point" and (tokens[i + 1] in UNITS or tokens[i + 1].isdigit()):
+                decimal = tokens[i + 1]
+                number = f"{number}.{UNITS.get(decimal, decimal)}"
+                i += 2
+            out.append(number)
+            continue
+
+        out.append(token)
+        i += 1
+    return out
+
+
+def normalize_text(text: str) -> List[str]:
+    return normalize_tokens(tokenize(text))
+
+
+_END = object()
+
+
+class PhraseMatcher:
+    """
+    Token trie over many phrases. Matching walks the trie from each token
+    position, so the cost is linear in transcript length times the longest
+    phrase, independent of how many phrases are registered.
+    """
+
+    def __init__(self):
+        self._root: Dict[Any, Any] = {}
+        self.max_length = 0
+        self.size = 0
+
+    def add(self, phrase_tokens: Sequence[str], value: Any):
+        if not phrase_tokens:
+            return
+        node = self._root
+        for token in phrase_tokens:
+            node = node.setdefault(token, {})
+        if _END not in node:
+            node[_END] = []
+            self.size += 1
+        if value not in node[_END]:
+            node[_END].append(value)
+        self.max_length = max(self.max_length, len(phrase_tokens))
+
+    def add_phrases(self, phrases: Iterable[Tuple[Sequence[str], Any]]):
+        for phrase_tokens, value in phrases:
+            self.add(phrase_tokens, value)
+
+    def _matches_at(self, tokens: Sequence[str], start: int):
+        node = self._root
+        for end in range(start, len(tokens)):
+            node = node.get(tokens[end])
+            if node is None:
+                return
+            if _END in node:
+                yield end + 1, node[_END]
+
+    def find_all(self, tokens: Sequence[str]) -> List[Tuple[int, int, Any]]:
+        """
+        Every (start, end, value) match, overlapping ones included.
+        """
+        matches = []
+        for start in range(len(tokens)):
+            for end, values in self._matches_at(tokens, start):
+                for value in values:
+                    matches.append((start, end, value))
+        return matches
+
+    def matched_values(self, tokens: Sequence[str]) -> set:
+        """
+        Set of values of every phrase found anywhere in tokens.
+        """
+        found = set()
+        root = self._root
+        n = len(tokens)
+        for start in range(n):
+            node = root.get(tokens[start])
+            end = start + 1
+            while node is not None:
+                if _END in node:
+                    found.update(node[_END])
+                if end == n:
+                    break
+                node = node.get(tokens[end])
+                end += 1
+        return found
+
+    def find_longest(self, tokens: Sequence[str]) -> List[Tuple[int, int, List[Any]]]:
+        """
+        Non-overlapping leftmost-longest matches as (start, end, values).
+        """
+        matches = []
+        start = 0
+        while start < len(tokens):
+            best = None
+            for end, values in self._matches_at(tokens, start):
+                best = (start, end, values)
+            if best:
+                matches.append(best)
+                start = best[1]
+            else:
+                start += 1
+        return matches
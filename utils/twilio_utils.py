@@ -1,43 +1,232 @@
+import asyncio
 import os
+import threading
+import time
+from contextlib import asynccontextmanager
 from loguru import logger
 from twilio.rest import Client
+# Client imports the API resources lazily on first use, which would stall the
+# event loop for the first request; import them with this module instead
+import twilio.rest.api.v2010.account.call  # noqa: F401
+import twilio.rest.api.v2010.account.message  # noqa: F401
 from typing import Dict, Any, Optional
+from utils.metrics import stage
+
+try:
+    from aiohttp import ClientSession, TCPConnector
+    from twilio.http.async_http_client import AsyncTwilioHttpClient
+except ImportError:  # the async transport needs aiohttp
+    AsyncTwilioHttpClient = None
+
+# Public URL Twilio uses to reach this server (for status callbacks and REST-issued TwiML)
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "").rstrip("/")
+
+# Optional REST API override, e.g. a local fake Twilio server for load tests
+TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL")
+
+# Connection pool and per-account limits (overridable via environment)
+# Connections the async transport keeps open; webhook handlers share it, so it
+# bounds how many Twilio requests are in flight per worker
+ASYNC_HTTP_POOL_SIZE = int(os.getenv("TWILIO_ASYNC_HTTP_POOL_SIZE", "200"))
+HTTP_TIMEOUT = float(os.getenv("TWILIO_HTTP_TIMEOUT", "10"))
+MAX_CONCURRENCY_PER_ACCOUNT = int(os.getenv("TWILIO_MAX_CONCURRENCY_PER_ACCOUNT", "10"))
+CREDENTIALS_TTL = float(os.getenv("TWILIO_CREDENTIALS_TTL", "30"))
+
+def get_callback_url(path: str) -> Optional[str]:
+    """
+    Builds an absolute webhook URL for Twilio callbacks.
+    Returns None if PUBLIC_BASE_URL is not configured.
+    """
+    if not PUBLIC_BASE_URL:
+        return None
+    return f"{PUBLIC_BASE_URL}{path}"
+
+
+class _Account:
+    """
+    Cached credentials, client and concurrency limit for one env_prefix.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.creds: Dict[str, Optional[str]] = {}
+        self.creds_checked_at = 0.0
+        self.async_client: Optional[Client] = None
+        self.async_client_key = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.semaphore_loop = None
+        self.metrics_lock = threading.Lock()
+        self.metrics = {
+            "clients_created": 0,
+            "credential_rotations": 0,
+            "requests": 0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+            "waited": 0,
+            "wait_seconds": 0.0,
+        }
+
+
+_accounts: Dict[str, _Account] = {}
+_accounts_lock = threading.Lock()
+_async_http_client = None
+_async_http_loop = None
+
+
+def _get_account(prefix: str) -> _Account:
+    account = _accounts.get(prefix)
+    if account is None:
+        with _accounts_lock:
+            account = _accounts.setdefault(prefix, _Account(prefix))
+    return account
+
+
+def _get_async_http_client():
+    """
+    Shared aiohttp-based transport for the running event loop.
+    """
+    global _async_http_client, _async_http_loop
+    if AsyncTwilioHttpClient is None:
+        raise RuntimeError("aiohttp is not installed")
+
+    loop = asyncio.get_running_loop()
+    if _async_http_client is None or _async_http_loop is not loop:
+        http_client = AsyncTwilioHttpClient(pool_connections=False, timeout=HTTP_TIMEOUT)
+        # aiohttp's default pool stops at 100 connections
+        http_client.session = ClientSession(connector=TCPConnector(limit=ASYNC_HTTP_POOL_SIZE))
+        _async_http_client = http_client
+        _async_http_loop = loop
+    return _async_http_client
+
 
 def get_twilio_credentials(store: Dict[str, Any]) -> Dict[str, Optional[str]]:
     """
     Resolves Twilio credentials from environment variables based on store's env_prefix.
+    Values are cached for CREDENTIALS_TTL seconds so rotations are picked up
+    without reading the environment on every request.
     """
     prefix = store.get("env_prefix")
     if not prefix:
         logger.error(f"Store {store.get('name')} missing env_prefix.")
         return {}
 
-    account_sid = os.getenv(f"{prefix}_TWILIO_ACCOUNT_SID")
-    auth_token = os.getenv(f"{prefix}_TWILIO_AUTH_TOKEN")
-    from_number = os.getenv(f"{prefix}_TWILIO_FROM_NUMBER")
+    account = _get_account(prefix)
+    now = time.monotonic()
+    if now - account.creds_checked_at < CREDENTIALS_TTL:
+        return account.creds
 
-    return {
-        "account_sid": account_sid,
-        "auth_token": auth_token,
-        "from_number": from_number
+    account.creds = {
+        "account_sid": os.getenv(f"{prefix}_TWILIO_ACCOUNT_SID"),
+        "auth_token": os.getenv(f"{prefix}_TWILIO_AUTH_TOKEN"),
+        "from_number": os.getenv(f"{prefix}_TWILIO_FROM_NUMBER")
     }
+    account.creds_checked_at = now
+    return account.creds
 
-def get_twilio_client(store: Dict[str, Any]) -> Optional[Client]:
+
+def _build_client(account_sid: str, auth_token: str, http_client) -> Client:
+    client = Client(account_sid, auth_token, http_client=http_client)
+    if TWILIO_API_BASE_URL:
+        client.api.base_url = TWILIO_API_BASE_URL
+    return client
+
+
+def get_async_twilio_client(store: Dict[str, Any]) -> Optional[Client]:
     """
-    Creates and returns a Twilio Client for the specific store.
+    Returns the shared Twilio Client for the store's account, backed by
+    Twilio's aiohttp transport so callers can use the *_async resource
+    methods. It is rebuilt whenever the account's credentials change.
+    Must be called from inside the running event loop.
     Returns None if credentials are missing.
     """
     creds = get_twilio_credentials(store)
-    
     account_sid = creds.get("account_sid")
     auth_token = creds.get("auth_token")
-
     if not account_sid or not auth_token:
         logger.error(f"Missing Twilio credentials for store: {store.get('name')} (Prefix: {store.get('env_prefix')})")
         return None
 
     try:
-        return Client(account_sid, auth_token)
+        http_client = _get_async_http_client()
     except Exception as e:
-        logger.error(f"Failed to initialize Twilio Client for {store.get('name')}: {e}")
+        logger.error(f"Async Twilio transport unavailable: {e}")
         return None
+
+    account = _get_account(store["env_prefix"])
+    key = (account_sid, auth_token, id(http_client))
+    if account.async_client is None or account.async_client_key != key:
+        if account.async_client is not None and account.async_client_key[:2] != key[:2]:
+            account.metrics["credential_rotations"] += 1
+            logger.info(f"Twilio credentials rotated for {account.prefix}; rebuilding client")
+        account.async_client = _build_client(account_sid, auth_token, http_client)
+        account.async_client_key = key
+        account.metrics["clients_created"] += 1
+    return account.async_client
+
+
+def _account_semaphore(account: _Account) -> asyncio.Semaphore:
+    # Semaphores belong to the event loop they were first used on
+    loop = asyncio.get_running_loop()
+    if account.semaphore is None or account.semaphore_loop is not loop:
+        account.semaphore = asyncio.Semaphore(MAX_CONCURRENCY_PER_ACCOUNT)
+        account.semaphore_loop = loop
+    return account.semaphore
+
+
+@asynccontextmanager
+async def account_slot(store: Dict[str, Any]):
+    """
+    Holds one of the account's concurrent request slots for the duration of
+    a Twilio REST call, waiting (without blocking the event loop) while the
+    account is at its limit.
+    """
+    account = _get_account(store.get("env_prefix") or "default")
+    metrics = account.metrics
+    semaphore = _account_semaphore(account)
+
+    waited = None
+    if semaphore.locked():
+        started = time.perf_counter()
+        await semaphore.acquire()
+        waited = time.perf_counter() - started
+    else:
+        await semaphore.acquire()
+
+    with account.metrics_lock:
+        if waited is not None:
+            metrics["waited"] += 1
+            metrics["wait_seconds"] += waited
+        metrics["requests"] += 1
+        metrics["in_flight"] += 1
+        metrics["peak_in_flight"] = max(metrics["peak_in_flight"], metrics["in_flight"])
+    try:
+        with stage("twilio_api"):
+            yield
+    finally:
+        with account.metrics_lock:
+            metrics["in_flight"] -= 1
+        semaphore.release()
+
+
+def get_twilio_pool_metrics() -> Dict[str, Any]:
+    """
+    Per-account client and concurrency stats plus shared pool settings.
+    """
+    return {
+        "async_pool_size": ASYNC_HTTP_POOL_SIZE,
+        "max_concurrency_per_account": MAX_CONCURRENCY_PER_ACCOUNT,
+        "accounts": {
+            prefix: dict(account.metrics, utilization=account.metrics["in_flight"] / MAX_CONCURRENCY_PER_ACCOUNT)
+            for prefix, account in list(_accounts.items())
+        },
+    }
+
+
+async def close_twilio_clients():
+    """
+    Closes the shared HTTP transport on shutdown.
+    """
+    global _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.close()
+        _async_http_client = None
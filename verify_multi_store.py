@@ -0,0 +1,262 @@
+"""
+Multi-store load test for the voice webhooks.
+
+Replays synthetic call flows (a /webhooks/voice greeting followed by one or
+more /webhooks/gather turns) against a real uvicorn instance of the app, for
+every DID in data/stores/stores.json. Twilio's REST API is replaced by the
+in-process fake in benchmarks/fake_twilio.py, which can add latency, return
+busy/no-answer staff legs and fail SMS sends; its status callbacks come back
+over HTTP like the real thing.
+
+Reports throughput, p50/p95/p99 latency per endpoint, event-log growth and
+transfer/SMS outcomes, and writes them as JSON (default:
+benchmarks/results/multi_store-<timestamp>-<commit>.json) so runs can be
+compared across commits.
+
+Usage: python verify_multi_store.py [--calls 300] [--concurrency 25] [--hours mixed] ...
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.fake_twilio import FakeTwilio
+
+BASE_DIR = Path(__file__).resolve().parent
+STORES_FILE = BASE_DIR / "data" / "stores" / "stores.json"
+RESULTS_DIR = BASE_DIR / "benchmarks" / "results"
+
+# Each flow is the list of gather transcripts spoken after the greeting
+FLOWS = {
+    "price_lookup": ["How much to fix an iPhone 13 screen?"],
+    "price_follow_up": ["My iPhone fourteen is broken", "the battery"],
+    "tablet_price": ["What does a battery for an iPad 6 cost"],
+    "restricted_device": ["How much for a MacBook screen repair?"],
+    "technician": ["Can I talk to a technician please"],
+    "water_damage": ["I dropped my phone in the pool, it has water damage"],
+    "booking_consent": ["How much is a screen repair for a Switch", "Yes please send it"],
+    "silence_then_price": ["", "PS5 HDMI port replacement price"],
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=300, help="number of call flows to run")
+    parser.add_argument("--concurrency", type=int, default=25, help="flows in flight at once")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Twilio REST latency (s)")
+    parser.add_argument("--answer-delay", type=float, default=1.0, help="seconds before a staff leg resolves")
+    parser.add_argument("--busy-rate", type=float, default=0.15, help="fraction of staff legs that are busy")
+    parser.add_argument("--no-answer-rate", type=float, default=0.15, help="fraction of staff legs not answered")
+    parser.add_argument("--sms-failure-rate", type=float, default=0.1, help="fraction of SMS sends that 503")
+    parser.add_argument("--hours", choices=("mixed", "open", "closed", "real"), default="mixed",
+                        help="store hours: mixed = alternate stores open/closed; real = actual schedules")
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="max seconds to wait for transfers/SMS")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="results JSON path")
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def at(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": at(0.50),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.glob("*") if p.is_file())
+
+
+args = parse_args()
+random.seed(args.seed)
+with open(STORES_FILE, "r") as f:
+    STORES = json.load(f)
+
+answered_rate = max(0.0, 1.0 - args.busy_rate - args.no_answer_rate)
+fake = FakeTwilio(
+    latency=args.latency,
+    answer_delay=args.answer_delay,
+    call_outcome={"in-progress": answered_rate, "busy": args.busy_rate, "no-answer": args.no_answer_rate},
+    sms_failure_rate=args.sms_failure_rate,
+).start()
+
+# Must be set before the app modules read them
+app_port = free_port()
+os.environ["PUBLIC_BASE_URL"] = f"http://127.0.0.1:{app_port}"
+os.environ["TWILIO_API_BASE_URL"] = fake.base_url
+os.environ.setdefault("OUTBOUND_SMS_BACKOFF_BASE", "0.2")
+os.environ.setdefault("OUTBOUND_SMS_PER_SENDER_MPS", "50")
+for index, store in enumerate(STORES):
+    prefix = store["env_prefix"]
+    os.environ[f"{prefix}_TWILIO_ACCOUNT_SID"] = f"AC{index:032d}"
+    os.environ[f"{prefix}_TWILIO_AUTH_TOKEN"] = "fake-token"
+    os.environ[f"{prefix}_TWILIO_FROM_NUMBER"] = store["sms_number"]
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+import actions.notification_service as notification_service  # noqa: E402
+import business_logic.hours_validator as hours_validator  # noqa: E402
+import database.repository as repository  # noqa: E402
+from actions.transfer_service import get_pending_transfer_count  # noqa: E402
+from api.main import app  # noqa: E402
+from utils.logger import setup_logging  # noqa: E402
+from utils.metrics import latency_summary  # noqa: E402
+from utils.twilio_utils import get_twilio_pool_metrics  # noqa: E402
+
+# Busy/no-answer transfers log warnings by design; keep the report readable
+setup_logging(level="ERROR")
+
+# Keep load-test events and spooled SMS out of data/
+scratch = Path(tempfile.mkdtemp(prefix="multi_store_"))
+repository._repository = repository.CallEventRepository(events_dir=scratch / "events")
+notification_service._queue = notification_service.OutboundSmsQueue(spool_file=scratch / "outbound_sms.jsonl")
+
+if args.hours != "real":
+    open_stores = {
+        store["store_id"] for index, store in enumerate(STORES)
+        if args.hours == "open" or (args.hours == "mixed" and index % 2 == 0)
+    }
+    hours_validator.StoreSchedule.is_open = lambda schedule, now=None: schedule.store_id in open_stores
+
+
+async def run_flows():
+    latencies = {"/webhooks/voice": [], "/webhooks/gather": []}
+    statuses = {}
+    flows_run = {name: 0 for name in FLOWS}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", timeout=30) as client:
+        async def post(path, data):
+            start = time.perf_counter()
+            response = await client.post(path, data=data)
+            latencies[path].append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def one_call(i):
+            store = STORES[i % len(STORES)]
+            flow = random.choice(list(FLOWS))
+            flows_run[flow] += 1
+            call = {"CallSid": f"CA{i:032d}", "Called": store["did"], "From": f"+1555{i:07d}"}
+            async with semaphore:
+                await post("/webhooks/voice", call)
+                for transcript in FLOWS[flow]:
+                    await post("/webhooks/gather", dict(call, SpeechResult=transcript))
+                # Twilio reports the hang-up, which closes the call session
+                await client.post("/webhooks/status/call", data={"CallSid": call["CallSid"], "CallStatus": "completed"})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_call(i) for i in range(args.calls)))
+        wall = time.perf_counter() - start
+
+        # Let staff legs resolve and queued SMS finish before counting outcomes
+        queue = notification_service.get_outbound_queue()
+        deadline = time.time() + args.drain_timeout
+        while (get_pending_transfer_count() or queue.pending_count()) and time.time() < deadline:
+            await asyncio.sleep(0.1)
+        drained = not (get_pending_transfer_count() or queue.pending_count())
+
+    return latencies, statuses, flows_run, wall, drained
+
+
+def main():
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=app_port, log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    events_dir = scratch / "events"
+    try:
+        latencies, statuses, flows_run, wall, drained = asyncio.run(run_flows())
+    finally:
+        server.should_exit = True
+        fake.stop()
+
+    event_repository = repository.get_event_repository()
+    event_repository.flush()
+    event_count = sum(1 for _ in event_repository.iter_events())
+    requests_total = sum(len(samples) for samples in latencies.values())
+    queue = notification_service.get_outbound_queue()
+    sms_statuses = {}
+    for job in queue.jobs.values():
+        sms_statuses[job["status"]] = sms_statuses.get(job["status"], 0) + 1
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        "stores": len(STORES),
+        "flows": flows_run,
+        "wall_seconds": round(wall, 3),
+        "throughput": {
+            "calls_per_second": round(args.calls / wall, 2),
+            "requests_per_second": round(requests_total / wall, 2),
+        },
+        "latency": {path: percentiles(samples) for path, samples in latencies.items()},
+        "http_statuses": statuses,
+        "stages": latency_summary()["stage_duration_seconds"],
+        "event_log": {
+            "events": event_count,
+            "bytes": dir_size(events_dir),
+            "bytes_per_call": round(dir_size(events_dir) / args.calls, 1),
+            "segments": len(event_repository.segments()),
+        },
+        "transfers": {"still_pending": get_pending_transfer_count()},
+        "sms": sms_statuses,
+        "drained": drained,
+        "fake_twilio_requests": fake.request_counts,
+        "twilio_pool": get_twilio_pool_metrics(),
+    }
+    repository.close_event_repository()
+
+    output = args.output or RESULTS_DIR / f"multi_store-{datetime.now():%Y%m%d-%H%M%S}-{results['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{args.calls} calls across {len(STORES)} stores in {wall:.2f}s "
+          f"({results['throughput']['calls_per_second']} calls/s, {results['throughput']['requests_per_second']} req/s)")
+    for path, stats in results["latency"].items():
+        print(f"  {path:<18} p50 {stats['p50_ms']:7.2f}ms  p95 {stats['p95_ms']:7.2f}ms  p99 {stats['p99_ms']:7.2f}ms")
+    print(f"  event log: {event_count} events, {results['event_log']['bytes']} bytes "
+          f"({results['event_log']['bytes_per_call']} bytes/call)")
+    print(f"  sms: {sms_statuses}  transfers pending: {get_pending_transfer_count()}  drained: {drained}")
+    print(f"Results written to {output}")
+    return 0 if statuses.keys() <= {200, 204} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())